@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
+import asyncio
 import copy
+import logging
 import os
-from typing import Dict, List, Optional, Union
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 import yaml
 
@@ -13,15 +16,43 @@ if len(res) > 0:
     sys.path.append(src_dir + "/src")
 
 try:
+    from data.async_data_collector import AsyncDataCollector
+    from data.converter import get_converter
+    from data.crawl_journal import CrawlJournal
+    from data.crawl_tree import add_edges, get_child, save_tree
     from data.data_collector import AbstractDataCollector, SimpleDataCollector
-    from data.data_saver import SimpleDataSaver
+    from data.data_saver import SimpleDataSaver, StreamingDataSaver, ThreadedDataSaver
+    from data.distributed import TaskQueue, get_worker_id, run_worker, wait_for_tasks
+    from data.fetcher import Fetcher, SessionFetcher
+    from data.html_tree import BasicTree
+    from data.manifest import MANIFEST_FILE, PageManifest
+    from data.metrics import CrawlMetrics, MetricsReporter, serve_metrics
+    from data.page_parser import ParsePipeline
+    from data.politeness import AbstractScheduler, AdaptiveScheduler
+    from data.rate_limiter import HostRateLimiter
+    from data.response_cache import CachedFetcher, ResponseCache
+    from data.url_filter import SeenSet
 
     from .data.extract_data import identity_fn, sieve_fn
 except ImportError:
     raise
 
+logger: logging.Logger = logging.getLogger(__name__)
 
-def collect_data(inputs: Dict[str, str], saver: SimpleDataSaver, filename: str) -> None:
+
+def collect_data(
+    inputs: Dict[str, str],
+    saver: SimpleDataSaver,
+    filename: str,
+    fetcher: Optional[Fetcher] = None,
+    sleep_time: float = 1,
+    journal: Optional[CrawlJournal] = None,
+    traversal: str = "recursive",
+    max_frontier: Optional[int] = None,
+    seen: Optional[SeenSet] = None,
+    scheduler: Optional[AbstractScheduler] = None,
+    tree: Optional[BasicTree] = None,
+) -> None:
     """
     It takes a dictionary of inputs, a data saver, and a filename, and then it
     creates a data collector, resets it, digs recursively, and saves the data
@@ -30,17 +61,179 @@ def collect_data(inputs: Dict[str, str], saver: SimpleDataSaver, filename: str)
         inputs (Dict[str, str]): A dictionary of parameters.
         saver (SimpleDataSaver): SimpleDataSaver
         filename (str): The name of the file to save the data to.
+        fetcher (Optional[Fetcher]): The fetcher shared by all the pages.
+        sleep_time (float): The time to wait after each page. Defaults to 1
+        journal (Optional[CrawlJournal]): The journal of the crawl. The file
+            is skipped if it is done, and resumed if it has a checkpoint.
+        traversal (str): "recursive", or the order of `dig_iteratively`, which
+            starts an unfinished file again. Defaults to recursive
+        max_frontier (Optional[int]): The soft limit of the frontier of
+            `dig_iteratively`.
+        seen (Optional[SeenSet]): The URLs fetched or queued by all the pages,
+            which are skipped. If None, no page is skipped.
+        scheduler (Optional[AbstractScheduler]): The pacing shared by all the
+            pages. If None, `sleep_time` is slept after every request.
+        tree (Optional[BasicTree]): The node under which the pages and outputs
+            are recorded. If None, they are not recorded. The edges are
+            journaled, and those of a done file are added from the journal.
     """
+    if (journal is not None) and journal.is_done(filename):
+        if tree is not None:
+            add_edges(tree, journal.get_edges(filename))
+        return
+    recursive: bool = traversal == "recursive"
+
     data_collector: AbstractDataCollector = SimpleDataCollector(
         start_url=inputs["url"],
         output_style=inputs["style"],
         rf_words=inputs["rf_words"],
+        nfkc=inputs.get("nfkc", False),
+        kanji_only=inputs.get("kanji_only", False),
         saver=saver,
+        fetcher=fetcher,
+        sleep_time=sleep_time,
+        journal=journal if recursive else None,
+        journal_unit=filename,
+        parser=inputs.get("parser", "html.parser"),
+        seen=seen,
+        scheduler=scheduler,
+        tree=tree,
     )
 
     data_collector.reset()
-    data_collector.dig_recursively(inputs["selectors"])
-    data_collector.save(filename=filename)
+    data_collector.open_stream(filename)
+    if recursive:
+        if (journal is not None) and (journal.get_state(filename) is not None):
+            data_collector.restore(journal.get_state(filename))
+        data_collector.dig_recursively(inputs["selectors"])
+    else:
+        data_collector.dig_iteratively(
+            inputs["selectors"], order=traversal, max_frontier=max_frontier
+        )
+    # the file may be written later by a threaded saver, and the page is done
+    # only then
+    data_collector.save(
+        filename=filename,
+        callback=(
+            partial(journal.mark_done, filename, edges=data_collector.pop_edges())
+            if journal is not None
+            else None
+        ),
+    )
+
+
+async def collect_data_async(
+    inputs: Dict[str, str],
+    saver: SimpleDataSaver,
+    filename: str,
+    rate_limiter: Optional[HostRateLimiter],
+    fetcher: Optional[Fetcher] = None,
+    journal: Optional[CrawlJournal] = None,
+    pipeline: Optional[ParsePipeline] = None,
+    seen: Optional[SeenSet] = None,
+) -> None:
+    """
+    It is the same as `collect_data`, but digs with an `AsyncDataCollector`
+    sharing `rate_limiter` with the other pages.
+
+    Args:
+        inputs (Dict[str, str]): A dictionary of parameters.
+        saver (SimpleDataSaver): SimpleDataSaver
+        filename (str): The name of the file to save the data to.
+        rate_limiter (Optional[HostRateLimiter]): The limiter shared by all the
+            pages. If None, the pages are not paced.
+        fetcher (Optional[Fetcher]): The fetcher shared by all the pages.
+        journal (Optional[CrawlJournal]): The journal of the crawl. Only whole
+            files are journaled, since the pages of a file are dug at once.
+        pipeline (Optional[ParsePipeline]): The parser processes shared by all
+            the pages.
+        seen (Optional[SeenSet]): The URLs fetched or queued by all the pages.
+    """
+    if (journal is not None) and journal.is_done(filename):
+        return
+
+    data_collector: AsyncDataCollector = AsyncDataCollector(
+        start_url=inputs["url"],
+        output_style=inputs["style"],
+        rf_words=inputs["rf_words"],
+        nfkc=inputs.get("nfkc", False),
+        kanji_only=inputs.get("kanji_only", False),
+        saver=saver,
+        fetcher=fetcher,
+        sleep_time=0,
+        rate_limiter=rate_limiter,
+        pipeline=pipeline,
+        parser=inputs.get("parser", "html.parser"),
+        seen=seen,
+    )
+
+    data_collector.reset()
+    data_collector.open_stream(filename)
+    await data_collector.dig_async(inputs["selectors"])
+    # the file may be written later by a threaded saver, and the page is done
+    # only then
+    data_collector.save(
+        filename=filename,
+        callback=partial(journal.mark_done, filename) if journal is not None else None,
+    )
+
+
+async def collect_pages_async(
+    pages: List[Tuple[Dict[str, str], str]],
+    saver: SimpleDataSaver,
+    max_concurrency: int = 8,
+    sleep_time: float = 1,
+    fetcher: Optional[Fetcher] = None,
+    journal: Optional[CrawlJournal] = None,
+    parse_workers: int = 0,
+    seen: Optional[SeenSet] = None,
+) -> None:
+    """
+    It collects many pages concurrently while each host is requested at most
+    once per `sleep_time` seconds.
+
+    Args:
+        pages (List[Tuple[Dict[str, str], str]]): Pairs of inputs and filename.
+        saver (SimpleDataSaver): SimpleDataSaver
+        max_concurrency (int): The number of pages collected at once.
+            Defaults to 8
+        sleep_time (float): The interval between requests to a host. If 0, the
+            requests are not paced. Defaults to 1
+        fetcher (Optional[Fetcher]): The fetcher shared by all the pages.
+        journal (Optional[CrawlJournal]): The journal of the crawl.
+        parse_workers (int): The number of parser processes. If 0, pages are
+            parsed in the event loop. Defaults to 0
+        seen (Optional[SeenSet]): The URLs fetched or queued by all the pages.
+    """
+    rate_limiter: Optional[HostRateLimiter] = None
+    if sleep_time > 0:
+        rate_limiter = HostRateLimiter(rate=1 / sleep_time)
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(max_concurrency)
+    pipeline: Optional[ParsePipeline] = None
+    if parse_workers > 0:
+        pipeline = ParsePipeline(max_workers=parse_workers)
+        await pipeline.start()
+
+    async def _collect(inputs: Dict[str, str], filename: str) -> None:
+        async with semaphore:
+            await collect_data_async(
+                inputs,
+                saver,
+                filename,
+                rate_limiter,
+                fetcher,
+                journal,
+                pipeline,
+                seen,
+            )
+
+    try:
+        await asyncio.gather(
+            *(_collect(inputs, filename) for inputs, filename in pages)
+        )
+    finally:
+        if pipeline is not None:
+            await pipeline.close()
 
 
 def get_page_info(kana_url: str) -> List[str]:
@@ -65,14 +258,354 @@ def main() -> None:
         default="../data/",
         help=("If you save output in a DataCollector, you must set this argument."),
     )
+    parser.add_argument(
+        "--mode",
+        type=str,
+        default="local",
+        choices=["local", "coordinator", "worker"],
+        help=(
+            "The coordinator puts the kana pages into the task queue, and the "
+            "workers collect them."
+        ),
+    )
+    parser.add_argument(
+        "--queue",
+        type=str,
+        default=None,
+        help=("The task queue file. Defaults to tasks.sqlite under --savedir."),
+    )
+    parser.add_argument(
+        "--lease_time",
+        type=float,
+        default=300.0,
+        help=("The seconds after which a task of a dead worker is issued again."),
+    )
+    parser.add_argument(
+        "--worker_id",
+        type=str,
+        default=None,
+        help=("The id of the worker. Defaults to the host name and the pid."),
+    )
+    parser.add_argument(
+        "--collector",
+        type=str,
+        default="simple",
+        choices=["simple", "async"],
+        help=("The async collector requests many kana pages at once."),
+    )
+    parser.add_argument(
+        "--traversal",
+        type=str,
+        default="recursive",
+        choices=["recursive", "dfs", "bfs"],
+        help=("The traversal of the pages by the simple collector."),
+    )
+    parser.add_argument(
+        "--max_frontier",
+        type=int,
+        default=None,
+        help=("The soft limit of the pages kept by the dfs and bfs traversals."),
+    )
+    parser.add_argument(
+        "--dedupe",
+        action="store_true",
+        help=("When you set --dedupe, a page linked from many pages is dug once."),
+    )
+    parser.add_argument(
+        "--politeness",
+        type=str,
+        default="fixed",
+        choices=["fixed", "adaptive"],
+        help=(
+            "The adaptive politeness of the simple collector follows robots.txt, "
+            "Retry-After and the response times instead of sleeping 1 s."
+        ),
+    )
+    parser.add_argument(
+        "--min_delay",
+        type=float,
+        default=0.5,
+        help=("The lower bound of the adaptive delay between requests."),
+    )
+    parser.add_argument(
+        "--max_delay",
+        type=float,
+        default=30.0,
+        help=("The upper bound of the adaptive delay between requests."),
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help=("The number of kana pages collected at once by the async collector."),
+    )
+    parser.add_argument(
+        "--parse_workers",
+        type=int,
+        default=0,
+        help=("The number of parser processes of the async collector."),
+    )
+    parser.add_argument(
+        "--pool_size",
+        type=int,
+        default=10,
+        help=("The number of keep-alive connections kept per host."),
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=30.0,
+        help=("The read timeout of every request in seconds."),
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help=("The number of retries on 5xx responses and connection errors."),
+    )
+    parser.add_argument(
+        "--cache_size",
+        type=int,
+        default=1024,
+        help=("The size cap in MiB of the HTTP cache under --savedir."),
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help=("When you set --no_cache, every page is downloaded again."),
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help=("When you set --offline, pages are read only from the HTTP cache."),
+    )
+    parser.add_argument(
+        "--parser",
+        type=str,
+        default=None,
+        choices=["html.parser", "lxml", "lexbor"],
+        help=("The parser backend. It overrides `parser` in the selector files."),
+    )
+    # the streamed files are written by the crawl itself
+    saving = parser.add_mutually_exclusive_group()
+    saving.add_argument(
+        "--stream",
+        action="store_true",
+        help=("When you set --stream, outputs are saved while they are collected."),
+    )
+    parser.add_argument(
+        "--stream_format",
+        type=str,
+        default="yaml",
+        choices=["yaml", "jsonl"],
+        help=("The format of the files saved with --stream."),
+    )
+    parser.add_argument(
+        "--flush_every",
+        type=int,
+        default=100,
+        help=("The number of outputs between flushes with --stream."),
+    )
+    saving.add_argument(
+        "--save_workers",
+        type=int,
+        default=0,
+        help=(
+            "The number of threads writing the files. If 0, they are written "
+            "by the crawl itself."
+        ),
+    )
+    parser.add_argument(
+        "--record_tree",
+        action="store_true",
+        help=(
+            "When you set --record_tree, the site, kana, pages and jukugo are "
+            "saved as a tree to crawl_tree.bin under --savedir."
+        ),
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=("When you set --resume, the crawl continues from its journal."),
+    )
+    parser.add_argument(
+        "--log_level",
+        type=str,
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help=("The level of the logs. Every output is logged with DEBUG."),
+    )
+    parser.add_argument(
+        "--progress_interval",
+        type=float,
+        default=10.0,
+        help=("The seconds between the progress lines and metrics file updates."),
+    )
+    parser.add_argument(
+        "--metrics_file",
+        type=str,
+        default=None,
+        help=("The JSON metrics file. Defaults to metrics.json under --savedir."),
+    )
+    parser.add_argument(
+        "--prometheus_port",
+        type=int,
+        default=None,
+        help=("When you set it, the metrics are served at localhost:<port>/metrics."),
+    )
     args = parser.parse_args()
+    logging.basicConfig(
+        level=args.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+    )
+
+    if args.offline and args.no_cache:
+        raise TypeError("--offline cannot be set together with --no_cache.")
+    if args.record_tree and (args.collector == "async"):
+        raise TypeError("--record_tree cannot be set with the async collector.")
+    if (args.politeness == "adaptive") and (args.collector == "async"):
+        # the async collector does not send its requests through a scheduler
+        raise TypeError("--politeness adaptive cannot be set with the async collector.")
+
+    metrics: CrawlMetrics = CrawlMetrics()
+    os.makedirs(args.savedir, exist_ok=True)
+    reporter: MetricsReporter = MetricsReporter(
+        metrics,
+        interval=args.progress_interval,
+        filename=args.metrics_file or os.path.join(args.savedir, "metrics.json"),
+    )
+    reporter.start()
+    if args.prometheus_port is not None:
+        serve_metrics(metrics, args.prometheus_port)
+
+    fetcher: Union[SessionFetcher, CachedFetcher] = SessionFetcher(
+        pool_size=max(args.pool_size, args.concurrency),
+        timeout=(5.0, args.timeout),
+        retries=args.retries,
+        metrics=metrics,
+    )
+    if not args.no_cache:
+        cache: ResponseCache = ResponseCache(
+            os.path.join(args.savedir, ".cache", "http"),
+            max_bytes=args.cache_size << 20,
+        )
+        fetcher = CachedFetcher(cache, fetcher=fetcher, offline=args.offline)
+    # no request is sent in the offline mode, so there is nothing to wait for
+    sleep_time: float = 0 if args.offline else 1
+    seen: Optional[SeenSet] = SeenSet() if args.dedupe else None
+    scheduler: Optional[AbstractScheduler] = None
+    if args.politeness == "adaptive":
+        scheduler = AdaptiveScheduler(
+            delay=sleep_time,
+            min_delay=args.min_delay,
+            max_delay=args.max_delay,
+            metrics=metrics,
+        )
+        scheduler.attach(fetcher)
+    worker_id: str = args.worker_id or get_worker_id()
+    journal_file: str = "crawl_journal.jsonl"
+    tree_file: str = os.path.join(args.savedir, "crawl_tree.bin")
+    manifest_file: str = MANIFEST_FILE
+    if args.mode == "worker":
+        journal_file = f"crawl_journal.{worker_id}.jsonl"
+        tree_file = os.path.join(args.savedir, f"crawl_tree.{worker_id}.bin")
+        manifest_file = f"manifest.{worker_id}.json"
+    journal: CrawlJournal = CrawlJournal(
+        os.path.join(args.savedir, journal_file), resume=args.resume
+    )
+    queue: Optional[TaskQueue] = None
+    if args.mode != "local":
+        queue = TaskQueue(
+            args.queue or os.path.join(args.savedir, "tasks.sqlite"),
+            lease_time=args.lease_time,
+        )
+        if args.mode == "coordinator":
+            # the workers wait until the pages of this crawl are added
+            queue.seal(False)
 
     kanji_file: str = f"{args.inputs}/selectors/jukugo_url.yml"
     with open(kanji_file, "r") as f:
         kanji_inputs: Dict[str, Union[str, List[str]]] = yaml.safe_load(f)
+    if args.parser is not None:
+        kanji_inputs.update(parser=args.parser)
+
+    # `converter` in a selector file replaces the default converter
+    index_fn: Callable[..., Any] = get_converter(kanji_inputs, default=sieve_fn)
+    # the files of the former crawls stay on disk, so their hashes are kept
+    manifest: PageManifest = PageManifest(os.path.join(args.savedir, manifest_file))
+    saver: SimpleDataSaver = SimpleDataSaver(
+        savedir=args.savedir, fn=index_fn, metrics=metrics, manifest=manifest
+    )
+    if args.save_workers > 0:
+        saver = ThreadedDataSaver(
+            savedir=args.savedir,
+            fn=index_fn,
+            max_workers=args.save_workers,
+            metrics=metrics,
+            manifest=manifest,
+        )
+    if args.stream:
+        saver = StreamingDataSaver(
+            savedir=args.savedir,
+            fn=index_fn,
+            file_format=args.stream_format,
+            flush_every=args.flush_every,
+            metrics=metrics,
+            manifest=manifest,
+        )
 
-    saver: SimpleDataSaver = SimpleDataSaver(savedir=args.savedir, fn=sieve_fn)
-    collect_data(kanji_inputs, saver, filename="hiragana.yml")
+    tree: Optional[BasicTree] = None
+    if args.record_tree:
+        # a resumed tree is rebuilt from the edges in the journal
+        tree = BasicTree(kanji_inputs["url"])
+
+    if args.mode == "worker":
+
+        def _collect(page_inputs: Dict[str, Any], save_file: str) -> None:
+            saver.change_converter(fn=get_converter(page_inputs, default=identity_fn))
+            collect_data(
+                page_inputs,
+                saver,
+                filename=save_file,
+                fetcher=fetcher,
+                sleep_time=sleep_time,
+                journal=journal,
+                traversal=args.traversal,
+                max_frontier=args.max_frontier,
+                seen=seen,
+                scheduler=scheduler,
+                tree=(
+                    get_child(tree, os.path.dirname(save_file))
+                    if tree is not None
+                    else None
+                ),
+            )
+            # the task is completed in the queue only once its file is written
+            saver.flush()
+
+        num_done: int = run_worker(queue, _collect, worker=worker_id)
+        logger.info(f"{worker_id} collected {num_done} pages.")
+        saver.close()
+        if tree is not None:
+            save_tree(tree, tree_file)
+        queue.close()
+        journal.close()
+        fetcher.close()
+        reporter.stop()
+        return
+
+    collect_data(
+        kanji_inputs,
+        saver,
+        filename="hiragana.yml",
+        fetcher=fetcher,
+        sleep_time=sleep_time,
+        journal=journal,
+        traversal=args.traversal,
+        max_frontier=args.max_frontier,
+        seen=seen,
+        scheduler=scheduler,
+        tree=tree,
+    )
 
     jukugo_file: str = f"{args.inputs}/selectors/kanji_url.yml"
     with open(jukugo_file, "r") as f:
@@ -83,19 +616,66 @@ def main() -> None:
         hiragana: List[str] = yaml.safe_load(f)
 
     kana_inputs: Dict[str, Union[str, List[str]]] = copy.deepcopy(jukugo_inputs)
+    if args.parser is not None:
+        kana_inputs.update(parser=args.parser)
     url_base: Optional[str] = None
     kana_dir: Optional[str] = None
     num_pages: Optional[str] = None
-    saver.change_converter(fn=identity_fn)
+    saver.change_converter(fn=get_converter(kana_inputs, default=identity_fn))
+    pages: List[Tuple[Dict[str, Union[str, List[str]]], str]] = []
 
     for kana in hiragana:
         url_base, [kana_dir, num_pages] = get_page_info(kana)
 
         for page in range(1, int(num_pages) + 1):
             kana_url: str = os.path.join(url_base, kana_dir, str(page))
-            kana_inputs.update(url=kana_url)
             save_file: str = os.path.join(kana_dir, str(page)) + ".yml"
-            collect_data(kana_inputs, saver, filename=save_file)
+            pages.append(({**kana_inputs, "url": kana_url}, save_file))
+
+    if args.mode == "coordinator":
+        queue.add_tasks(pages)
+        queue.seal()
+        wait_for_tasks(queue)
+        queue.close()
+    elif args.collector == "async":
+        asyncio.run(
+            collect_pages_async(
+                pages,
+                saver,
+                max_concurrency=args.concurrency,
+                sleep_time=sleep_time,
+                fetcher=fetcher,
+                journal=journal,
+                parse_workers=args.parse_workers,
+                seen=seen,
+            )
+        )
+    else:
+        for page_inputs, save_file in pages:
+            collect_data(
+                page_inputs,
+                saver,
+                filename=save_file,
+                fetcher=fetcher,
+                sleep_time=sleep_time,
+                journal=journal,
+                traversal=args.traversal,
+                max_frontier=args.max_frontier,
+                seen=seen,
+                scheduler=scheduler,
+                tree=(
+                    get_child(tree, os.path.dirname(save_file))
+                    if tree is not None
+                    else None
+                ),
+            )
+
+    saver.close()
+    if tree is not None:
+        save_tree(tree, tree_file)
+    journal.close()
+    fetcher.close()
+    reporter.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+src_dir, *res = os.getcwd().split("/src")
+
+if len(res) > 0:
+    import sys
+
+    sys.path.append(src_dir + "/src")
+
+try:
+    from data.data_collector import AbstractDataCollector
+    from data.page_parser import ParsePipeline, parse_outputs
+    from data.rate_limiter import HostRateLimiter
+    from data.save_html_from_url import get_html
+    from data.text_normalizer import TextNormalizer
+except ImportError:
+    raise
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+# It crawls the same tree as SimpleDataCollector, but with many pages in flight
+class AsyncDataCollector(AbstractDataCollector):
+    def __init__(
+        self,
+        *args: Tuple[str],
+        rf_words: List[str] = ["▲", "△", "〈", "〉"],
+        nfkc: bool = False,
+        kanji_only: bool = False,
+        sleep_time: float = 1,
+        max_concurrency: int = 8,
+        rate_limiter: Optional[HostRateLimiter] = None,
+        pipeline: Optional[ParsePipeline] = None,
+        parser: str = "html.parser",
+        **kwargs: Dict[str, str],
+    ) -> None:
+        """
+        `__init__` takes the same arguments as `SimpleDataCollector`, but the
+        `sleep_time` is enforced per host by a token bucket instead of a global
+        sleep after every page.
+
+        Args:
+            rf_words (List[str]): A list of words to be removed from the text.
+            nfkc (bool): If True, the words are normalized by NFKC.
+                Defaults to False
+            kanji_only (bool): If True, the words with anything but kanji are
+                dropped. Defaults to False
+            sleep_time (float): The minimum interval between two requests to
+                the same host. Defaults to 1
+            max_concurrency (int): The maximum number of requests in flight.
+                Defaults to 8
+            rate_limiter (Optional[HostRateLimiter]): A limiter shared with
+                other collectors. If None, a new one is made from `sleep_time`
+                unless it is 0.
+            pipeline (Optional[ParsePipeline]): A started pipeline of parser
+                processes. If None, pages are parsed in the event loop.
+            parser (str): The parser backend. Defaults to "html.parser"
+            *args: Variable length argument list.
+            **kwargs: Arbitrary keyword arguments.
+        """
+        super().__init__(*args, **kwargs)
+        self.normalizer: TextNormalizer = TextNormalizer(
+            rf_words, nfkc=nfkc, kanji_only=kanji_only
+        )
+        self.max_concurrency: int = max_concurrency
+
+        if (rate_limiter is None) and (sleep_time > 0):
+            rate_limiter = HostRateLimiter(rate=1 / sleep_time)
+        self.rate_limiter: Optional[HostRateLimiter] = rate_limiter
+        self.pipeline: Optional[ParsePipeline] = pipeline
+        self.parser: str = parser
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight: int = 0
+
+    async def _fetch(self, url: str) -> str:
+        """
+        > It waits for the rate limiter and a free slot, and then gets the HTML
+        in a worker thread
+
+        Args:
+            url (str): The URL to be requested.
+
+        Returns:
+            The HTML text.
+        """
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire(url)
+
+        async with self._semaphore:
+            self._in_flight += 1
+            self.metrics.set_gauge("in_flight", self._in_flight)
+            try:
+                with self.metrics.timer("fetch"):
+                    return await asyncio.to_thread(get_html, url, self.fetcher)
+            finally:
+                self._in_flight -= 1
+                self.metrics.incr("pages")
+
+    async def _extract_outputs(self, url: str, selector: str) -> List[str]:
+        """
+        > It gets the page of `url` and returns the outputs of all the elements
+        matching `selector`
+
+        Args:
+            url (str): The URL of the page.
+            selector (str): The CSS selector to use to extract the elements.
+
+        Returns:
+            A list of outputs in document order.
+        """
+        text: str = await self._fetch(url)
+        args: Tuple[Any, ...] = (
+            text,
+            selector,
+            url,
+            self.output_style,
+            self.normalizer,
+            self.parser,
+        )
+
+        # the selection is done by the parser, so "parse" includes it
+        with self.metrics.timer("parse"):
+            if self.pipeline is None:
+                return parse_outputs(*args)
+            self.metrics.set_gauge("parse_queue", self.pipeline.queue.qsize())
+            return await self.pipeline.parse(*args)
+
+    async def _dig(self, url: str, depth: int, selectors: List[str]) -> List[str]:
+        """
+        It extracts the outputs of `url` at `depth` and digs all the children
+        concurrently. The outputs are merged in the pre-order of
+        `SimpleDataCollector.dig_recursively`.
+
+        Args:
+            url (str): The URL of the page.
+            depth (int): The depth of the page, starting from 1.
+            selectors (List[str]): List[str]
+
+        Returns:
+            The outputs of the page and its descendants.
+        """
+        selector: str = selectors[depth - 1]
+        outputs: List[str] = await self._extract_outputs(url, selector)
+
+        if depth == len(selectors):
+            return outputs
+
+        exist_next: bool = selector.endswith("a[href]")
+        if exist_next:
+            outputs = [output for output in outputs if self._is_new_url(output)]
+        children: List[List[str]] = await asyncio.gather(
+            *(
+                self._dig(output if exist_next else url, depth + 1, selectors)
+                for output in outputs
+            )
+        )
+
+        merged: List[str] = []
+        for output, child in zip(outputs, children):
+            merged.append(output)
+            merged.extend(child)
+        return merged
+
+    async def dig_async(self, selectors: List[str]) -> None:
+        """
+        It digs all the selectors from the current url and pushes the outputs
+
+        Args:
+            selectors (List[str]): List[str]
+        """
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        outputs: List[str] = await self._dig(
+            self.current_url, self.depth + 1, selectors
+        )
+
+        for output in outputs:
+            self._emit(output)
+            logger.debug(output)
+
+    def dig_recursively(self, selectors: List[str]) -> None:
+        """
+        It runs `dig_async` in a new event loop
+
+        Args:
+            selectors (List[str]): List[str]
+        """
+        asyncio.run(self.dig_async(selectors))
+
+
+def test():
+    """
+    > The function `test()` serves a small site from localhost and checks that
+    > `AsyncDataCollector` gives the same outputs as `SimpleDataCollector`.
+    """
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from data.data_collector import SimpleDataCollector
+
+    pages: Dict[str, str] = {"/": ""}
+    for i in range(3):
+        pages["/"] += f'<div class="kana"><a href="/kana/{i}">{i}</a></div>'
+        pages[f"/kana/{i}"] = "".join(
+            f'<li class="word"><a href="/kana/{i}/{j}">〈{i}〉{j}</a></li>'
+            for j in range(4)
+        )
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            body: bytes = pages.get(self.path, "").encode("utf-8")
+            self.send_response(200 if self.path in pages else 404)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server: ThreadingHTTPServer = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    start_url: str = f"http://127.0.0.1:{server.server_address[1]}"
+    selectors: List[str] = ["div.kana a[href]", "li.word a"]
+
+    try:
+        results: List[List[str]] = []
+        for collector_cls in (SimpleDataCollector, AsyncDataCollector):
+            collector: AbstractDataCollector = collector_cls(
+                start_url=start_url, output_style="word", sleep_time=0
+            )
+            collector.reset()
+            collector.dig_recursively(selectors)
+            results.append(collector.outputs)
+
+        async def _dig_with_pipeline() -> List[str]:
+            async with ParsePipeline(max_workers=2, queue_size=2) as pipeline:
+                collector: AsyncDataCollector = AsyncDataCollector(
+                    start_url=start_url,
+                    output_style="word",
+                    sleep_time=0,
+                    pipeline=pipeline,
+                )
+                collector.reset()
+                await collector.dig_async(selectors)
+            return collector.outputs
+
+        results.append(asyncio.run(_dig_with_pipeline()))
+    finally:
+        server.shutdown()
+
+    if not (results[0] == results[1] == results[2]):
+        raise AssertionError(f"outputs must be the same. But {results}")
+
+    print("Test has be run successfully.")
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+import glob
+import os
+import time
+from typing import Dict, List, Union
+
+import yaml
+
+src_dir, *res = os.getcwd().split("/src")
+
+if len(res) > 0:
+    import sys
+
+    sys.path.append(src_dir + "/src")
+
+try:
+    from data.parser_backend import (
+        AbstractParserBackend,
+        available_backends,
+        get_backend,
+    )
+except ImportError:
+    raise
+
+
+def extract_all(
+    backend: AbstractParserBackend, text: str, selectors: List[str]
+) -> List[str]:
+    """
+    It parses a page and extracts the hrefs or the texts of every selector
+
+    Args:
+        backend (AbstractParserBackend): The parser backend.
+        text (str): The HTML text of the page.
+        selectors (List[str]): The CSS selectors.
+
+    Returns:
+        A list of extracted strings.
+    """
+    document = backend.parse(text)
+    outputs: List[str] = []
+
+    for selector in selectors:
+        for element in backend.select(document, selector):
+            if selector.endswith("a[href]"):
+                outputs.append(backend.get_href(element))
+            else:
+                outputs.append(backend.get_text(element))
+    return outputs
+
+
+def bench_backend(
+    name: str, texts: List[str], selectors: List[str], repeat: int = 3
+) -> Dict[str, float]:
+    """
+    It measures the time to parse and select all the pages with a backend
+
+    Args:
+        name (str): The name of the parser backend.
+        texts (List[str]): The HTML texts of the pages.
+        selectors (List[str]): The CSS selectors.
+        repeat (int): The number of repetitions. The best one is reported.
+            Defaults to 3
+
+    Returns:
+        A dictionary of the best seconds, milliseconds per page and pages per
+        second.
+    """
+    backend: AbstractParserBackend = get_backend(name)
+    best: float = float("inf")
+
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        for text in texts:
+            extract_all(backend, text, selectors)
+        best = min(best, time.perf_counter() - start)
+
+    return {
+        "seconds": best,
+        "ms_per_page": 1000 * best / len(texts),
+        "pages_per_second": len(texts) / best,
+    }
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--html_dir",
+        type=str,
+        default="../data/html/",
+        help=("Set a directory of HTML files saved by save_html_from_url."),
+    )
+    parser.add_argument(
+        "--selector_file",
+        type=str,
+        default="../data/selectors/kanji_url.yml",
+        help=("Set a file name including selectors to be benchmarked."),
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help=("Set the number of repetitions for every backend."),
+    )
+    args = parser.parse_args()
+
+    with open(args.selector_file, "r") as f:
+        inputs: Dict[str, Union[str, List[str]]] = yaml.safe_load(f)
+
+    texts: List[str] = []
+    for filename in sorted(
+        glob.glob(os.path.join(args.html_dir, "**", "*.html"), recursive=True)
+    ):
+        with open(filename, "r", encoding="utf-8") as f:
+            texts.append(f.read())
+
+    if len(texts) == 0:
+        raise FileNotFoundError(f"No HTML file is found in {args.html_dir}.")
+
+    names: List[str] = available_backends()
+    expected: List[List[str]] = [
+        extract_all(get_backend("html.parser"), text, inputs["selectors"])
+        for text in texts
+    ]
+
+    print(f"{len(texts)} pages, selectors: {inputs['selectors']}")
+    for name in names:
+        result: Dict[str, float] = bench_backend(
+            name, texts, inputs["selectors"], repeat=args.repeat
+        )
+        same: bool = expected == [
+            extract_all(get_backend(name), text, inputs["selectors"]) for text in texts
+        ]
+        print(
+            f"{name:>12}: {result['ms_per_page']:8.3f} ms/page "
+            f"{result['pages_per_second']:9.1f} pages/s "
+            f"{'same' if same else 'DIFFERENT'} outputs as html.parser"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import yaml
+
+src_dir, *res = os.getcwd().split("/src")
+
+if len(res) > 0:
+    import sys
+
+    sys.path.append(src_dir + "/src")
+
+try:
+    from data.data_collector import SimpleDataCollector
+    from data.data_saver import SimpleDataSaver
+    from data.extract_data import identity_fn
+    from data.fetcher import SessionFetcher
+    from data.metrics import CrawlMetrics
+    from data.save_html_from_url import save_html_from_url
+except ImportError:
+    raise
+
+INDEX_FILE: str = "index.json"
+
+
+class SnapshotFetcher:
+    def __init__(self, fixture_dir: str, fetcher: Optional[SessionFetcher] = None):
+        """
+        It saves every page it fetches into `fixture_dir` with
+        `save_html_from_url`, and remembers the file of each URL.
+
+        Args:
+            fixture_dir (str): The directory of the fixtures.
+            fetcher (Optional[SessionFetcher]): The fetcher for the network.
+        """
+        self.fixture_dir: str = fixture_dir
+        self.fetcher: SessionFetcher = fetcher or SessionFetcher()
+        self.pages: Dict[str, str] = {}
+        os.makedirs(os.path.join(fixture_dir, "pages"), exist_ok=True)
+
+    def __call__(self, url: str) -> str:
+        filename: Optional[str] = self.pages.get(url)
+
+        if filename is None:
+            digest: str = hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+            filename = os.path.join("pages", f"{digest}.html")
+            save_html_from_url(
+                url,
+                output=os.path.join(self.fixture_dir, filename),
+                fetcher=self.fetcher,
+            )
+            self.pages[url] = filename
+
+        with open(os.path.join(self.fixture_dir, filename), "r", encoding="utf-8") as f:
+            return f.read()
+
+
+class FixtureFetcher:
+    def __init__(self, fixture_dir: str, latency: float = 0.0) -> None:
+        """
+        It answers the pages from the fixtures instead of the network. All the
+        pages are read into memory first, so the disk is not measured.
+
+        Args:
+            fixture_dir (str): The directory of the fixtures.
+            latency (float): The seconds added to every page to stand in for
+                the network. Defaults to 0
+        """
+        with open(os.path.join(fixture_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+            index: Dict[str, Any] = json.load(f)
+
+        self.latency: float = latency
+        self.pages: Dict[str, str] = {}
+        for url, filename in index["pages"].items():
+            with open(os.path.join(fixture_dir, filename), "r", encoding="utf-8") as f:
+                self.pages[url] = f.read()
+
+    def __call__(self, url: str) -> str:
+        text: Optional[str] = self.pages.get(url)
+
+        if text is None:
+            raise LookupError(f"{url} is not in the fixtures.")
+        if self.latency > 0:
+            time.sleep(self.latency)
+        return text
+
+
+def get_units(inputs_dir: str, num_pages: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    > It returns the index of the kanji and `num_pages` kana pages sampled at
+    random, with the inputs of collect_jukugo
+
+    Args:
+        inputs_dir (str): The directory of `selectors` and `urls`.
+        num_pages (int): The number of kana pages.
+        seed (int): The seed of the sampling. Defaults to 0
+
+    Returns:
+        The units, each with its inputs and its filename.
+    """
+    with open(f"{inputs_dir}/selectors/jukugo_url.yml", "r", encoding="utf-8") as f:
+        kanji_inputs: Dict[str, Union[str, List[str]]] = yaml.safe_load(f)
+    with open(f"{inputs_dir}/selectors/kanji_url.yml", "r", encoding="utf-8") as f:
+        kana_inputs: Dict[str, Union[str, List[str]]] = yaml.safe_load(f)
+    with open(f"{inputs_dir}/urls/hiragana.yml", "r", encoding="utf-8") as f:
+        hiragana: List[str] = yaml.safe_load(f)
+
+    pages: List[Tuple[str, str]] = []
+    for kana in hiragana:
+        split_kana: List[str] = kana.split("/")
+        url_base: str = "/".join(split_kana[:-2])
+        kana_dir, num_kana_pages = split_kana[-2:]
+
+        for page in range(1, int(num_kana_pages) + 1):
+            pages.append(
+                (
+                    os.path.join(url_base, kana_dir, str(page)),
+                    os.path.join(kana_dir, str(page)) + ".yml",
+                )
+            )
+    pages = random.Random(seed).sample(pages, min(num_pages, len(pages)))
+
+    units: List[Dict[str, Any]] = [{"inputs": kanji_inputs, "filename": "hiragana.yml"}]
+    for url, filename in sorted(pages):
+        units.append({"inputs": {**kana_inputs, "url": url}, "filename": filename})
+    return units
+
+
+def snapshot(
+    units: List[Dict[str, Any]],
+    fixture_dir: str,
+    fetcher: Optional[SessionFetcher] = None,
+    sleep_time: float = 1,
+) -> Dict[str, Any]:
+    """
+    It crawls the units once and saves every page fetched on the way
+
+    Args:
+        units (List[Dict[str, Any]]): The units returned by `get_units`.
+        fixture_dir (str): The directory of the fixtures.
+        fetcher (Optional[SessionFetcher]): The fetcher for the network.
+        sleep_time (float): The time to wait after each page. Defaults to 1
+
+    Returns:
+        The index of the fixtures.
+    """
+    snapshot_fetcher: SnapshotFetcher = SnapshotFetcher(fixture_dir, fetcher=fetcher)
+
+    for unit in units:
+        inputs: Dict[str, Any] = unit["inputs"]
+        collector: SimpleDataCollector = SimpleDataCollector(
+            start_url=inputs["url"],
+            output_style=inputs["style"],
+            rf_words=inputs["rf_words"],
+            fetcher=snapshot_fetcher,
+            sleep_time=sleep_time,
+        )
+        collector.reset()
+        collector.dig_recursively(inputs["selectors"])
+
+    index: Dict[str, Any] = {"units": units, "pages": snapshot_fetcher.pages}
+    with open(os.path.join(fixture_dir, INDEX_FILE), "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    return index
+
+
+def _collect_units(
+    units: List[Dict[str, Any]],
+    fetcher: FixtureFetcher,
+    metrics: CrawlMetrics,
+    repeat: int,
+    parser: str,
+) -> None:
+    """
+    It collects the units `repeat` times into a temporary directory
+
+    Args:
+        units (List[Dict[str, Any]]): The units of the fixtures.
+        fetcher (FixtureFetcher): The fetcher of the fixtures.
+        metrics (CrawlMetrics): The metrics of the phases.
+        repeat (int): The number of runs.
+        parser (str): The parser backend.
+    """
+    with tempfile.TemporaryDirectory() as savedir:
+        saver: SimpleDataSaver = SimpleDataSaver(
+            savedir=savedir, fn=identity_fn, metrics=metrics
+        )
+        for _ in range(repeat):
+            for unit in units:
+                inputs: Dict[str, Any] = unit["inputs"]
+                collector: SimpleDataCollector = SimpleDataCollector(
+                    start_url=inputs["url"],
+                    output_style=inputs["style"],
+                    rf_words=inputs["rf_words"],
+                    saver=saver,
+                    fetcher=fetcher,
+                    sleep_time=0,
+                    parser=parser,
+                )
+                collector.reset()
+                collector.dig_recursively(inputs["selectors"])
+                collector.save(filename=unit["filename"])
+
+
+def replay(
+    fixture_dir: str,
+    repeat: int = 3,
+    parser: str = "html.parser",
+    latency: float = 0.0,
+) -> Dict[str, Any]:
+    """
+    It collects the units of the fixtures `repeat` times without sleeping,
+    and measures every phase of the pipeline. The peak memory is taken from
+    one more run out of the timing, as tracing the allocations slows it down.
+
+    Args:
+        fixture_dir (str): The directory of the fixtures.
+        repeat (int): The number of runs. Defaults to 3
+        parser (str): The parser backend. Defaults to "html.parser"
+        latency (float): The seconds added to every page. Defaults to 0
+
+    Returns:
+        The throughput, the latency percentiles of the phases and the peak
+        memory.
+    """
+    fetcher: FixtureFetcher = FixtureFetcher(fixture_dir, latency=latency)
+    with open(os.path.join(fixture_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+        units: List[Dict[str, Any]] = json.load(f)["units"]
+
+    metrics: CrawlMetrics = CrawlMetrics(window=1 << 20)
+    start: float = time.perf_counter()
+    _collect_units(units, fetcher, metrics, repeat, parser)
+    seconds: float = time.perf_counter() - start
+
+    fetcher.latency = 0.0
+    tracemalloc.start()
+    _collect_units(units, fetcher, CrawlMetrics(), 1, parser)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    snapshot: Dict[str, Any] = metrics.snapshot()
+    timers: Dict[str, Dict[str, float]] = snapshot["timers"]
+    timers.pop("sleep", None)
+    return {
+        "parser": parser,
+        "repeat": repeat,
+        "pages": snapshot["counters"].get("pages", 0),
+        "outputs": snapshot["counters"].get("outputs", 0),
+        "seconds": seconds,
+        "pages_per_second": snapshot["counters"].get("pages", 0) / seconds,
+        "peak_memory_bytes": peak,
+        "phases": timers,
+    }
+
+
+def get_environment() -> Dict[str, Optional[str]]:
+    """
+    > It returns the commit and the Python of the run, so that the results of
+    two commits can be compared
+
+    Returns:
+        The commit hash, or None out of a git repository, and the versions.
+    """
+    commit: Optional[str] = None
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        pass
+
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--mode",
+        type=str,
+        default="replay",
+        choices=["snapshot", "replay"],
+        help=("The snapshot saves the fixtures, and the replay measures them."),
+    )
+    parser.add_argument(
+        "--inputs",
+        type=str,
+        default="../data/",
+        help=("Set the directory of the selectors and urls of collect_jukugo."),
+    )
+    parser.add_argument(
+        "--fixtures",
+        type=str,
+        default="../data/fixtures/",
+        help=("Set the directory of the saved pages."),
+    )
+    parser.add_argument(
+        "--num_pages",
+        type=int,
+        default=20,
+        help=("Set the number of kana pages sampled for the snapshot."),
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help=("Set the number of runs of the replay."),
+    )
+    parser.add_argument(
+        "--parser",
+        type=str,
+        default="html.parser",
+        choices=["html.parser", "lxml", "lexbor"],
+        help=("Set the parser backend of the replay."),
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help=("Set the seconds added to every page by the replay."),
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help=("Set a JSON file to which the results of the replay are written."),
+    )
+    args = parser.parse_args()
+
+    if args.mode == "snapshot":
+        index: Dict[str, Any] = snapshot(
+            get_units(args.inputs, args.num_pages), args.fixtures
+        )
+        print(f"{len(index['pages'])} pages -> {args.fixtures}")
+        return
+
+    results: Dict[str, Any] = replay(
+        args.fixtures, repeat=args.repeat, parser=args.parser, latency=args.latency
+    )
+    results.update(get_environment())
+
+    print(
+        f"{results['pages']:.0f} pages in {results['seconds']:.3f} s "
+        f"({results['pages_per_second']:.1f} pages/s), "
+        f"peak {results['peak_memory_bytes'] / (1 << 20):.1f} MiB"
+    )
+    for phase, summary in results["phases"].items():
+        print(
+            f"  {phase:<6}: p50 {1000 * summary['p50']:8.3f} ms, "
+            f"p95 {1000 * summary['p95']:8.3f} ms, "
+            f"p99 {1000 * summary['p99']:8.3f} ms, "
+            f"total {summary['total']:8.3f} s"
+        )
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
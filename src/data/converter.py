@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+import re
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple, Union
+
+import yaml
+
+Stage = Callable[[List[Any]], List[Any]]
+StageConfig = Union[str, Dict[str, Any]]
+
+
+def filter_stage(pattern: str, invert: bool = False) -> Stage:
+    """
+    > It returns a stage keeping the outputs in which `pattern` is found
+
+    Args:
+        pattern (str): The regular expression, compiled once.
+        invert (bool): If True, the matching outputs are dropped instead.
+            Defaults to False
+
+    Returns:
+        The stage.
+    """
+    regex: Pattern = re.compile(pattern)
+
+    def _filter(output: List[str]) -> List[str]:
+        if invert:
+            return [out for out in output if regex.search(out) is None]
+        # `filter` calls the bound method for the whole batch without a
+        # Python frame per output
+        return list(filter(regex.search, output))
+
+    _filter.per_item = True
+    return _filter
+
+
+def map_stage(pattern: str, repl: str = "") -> Stage:
+    """
+    > It returns a stage replacing `pattern` by `repl` in every output
+
+    Args:
+        pattern (str): The regular expression, compiled once.
+        repl (str): The replacement, which may refer to the groups.
+            Defaults to ""
+
+    Returns:
+        The stage.
+    """
+    regex: Pattern = re.compile(pattern)
+
+    def _map(output: List[str]) -> List[str]:
+        return [regex.sub(repl, out) for out in output]
+
+    _map.per_item = True
+    return _map
+
+
+def dedupe_stage() -> Stage:
+    """
+    > It returns a stage removing the repeated outputs, keeping the first of
+    them in place
+
+    Returns:
+        The stage.
+    """
+
+    def _dedupe(output: List[Any]) -> List[Any]:
+        return list(dict.fromkeys(output))
+
+    return _dedupe
+
+
+def sort_stage(reverse: bool = False) -> Stage:
+    """
+    > It returns a stage sorting the outputs
+
+    Args:
+        reverse (bool): If True, they are sorted in descending order.
+            Defaults to False
+
+    Returns:
+        The stage.
+    """
+
+    def _sort(output: List[Any]) -> List[Any]:
+        return sorted(output, reverse=reverse)
+
+    return _sort
+
+
+def is_per_item(stage: Stage) -> bool:
+    """
+    > It returns `True` if the stage treats every output on its own, so that it
+    can be run on the outputs one by one. The stages which need the whole list,
+    such as "dedupe" and "sort", and the unknown stages return `False`.
+    """
+    return getattr(stage, "per_item", False)
+
+
+STAGES: Dict[str, Callable[..., Stage]] = {
+    "filter": filter_stage,
+    "map": map_stage,
+    "dedupe": dedupe_stage,
+    "sort": sort_stage,
+}
+
+
+def build_stage(config: StageConfig) -> Stage:
+    """
+    > It returns the stage of one entry of a converter config. An entry is the
+    name of a stage, or a mapping from the name to its arguments, which are a
+    mapping of keyword arguments or the first argument alone.
+
+    Args:
+        config (StageConfig): e.g. "dedupe", {"filter": "/[0-9]+$"} or
+            {"map": {"pattern": "^https?://", "repl": ""}}
+
+    Returns:
+        The stage.
+    """
+    if isinstance(config, str):
+        name, args = config, {}
+    elif isinstance(config, dict) and (len(config) == 1):
+        [(name, args)] = config.items()
+    else:
+        raise ValueError(f"stage; {config} must be a name or a mapping of one name.")
+
+    if name not in STAGES:
+        raise ValueError(f"stage; {name} must be one of {', '.join(STAGES)}.")
+
+    if isinstance(args, dict):
+        return STAGES[name](**args)
+    if args is None:
+        return STAGES[name]()
+    return STAGES[name](args)
+
+
+class ConverterPipeline:
+    def __init__(self, stages: List[Stage]) -> None:
+        """
+        A converter of a saver which runs its stages one after another over
+        the whole outputs of a file.
+
+        Args:
+            stages (List[Stage]): The stages, each taking and returning a list.
+        """
+        self.stages: List[Stage] = stages
+
+    @classmethod
+    def from_config(cls, config: List[StageConfig]) -> "ConverterPipeline":
+        """
+        > It returns the pipeline of a list of stage entries
+
+        Args:
+            config (List[StageConfig]): The entries, as in `build_stage`.
+
+        Returns:
+            The pipeline.
+        """
+        return cls([build_stage(stage) for stage in config])
+
+    @classmethod
+    def from_yaml(cls, filename: str) -> "ConverterPipeline":
+        """
+        > It returns the pipeline of a YAML file holding a list of stage entries
+
+        Args:
+            filename (str): The YAML file.
+
+        Returns:
+            The pipeline.
+        """
+        with open(filename, "r") as f:
+            return cls.from_config(yaml.safe_load(f) or [])
+
+    def split(self) -> Tuple["ConverterPipeline", "ConverterPipeline"]:
+        """
+        > It splits the pipeline before its first stage needing the whole list,
+        so that a stream runs the head per output and the tail when it is
+        closed
+
+        Returns:
+            The per-output head and the rest of the pipeline.
+        """
+        index: int = 0
+
+        while (index < len(self.stages)) and is_per_item(self.stages[index]):
+            index += 1
+        return (
+            ConverterPipeline(self.stages[:index]),
+            ConverterPipeline(self.stages[index:]),
+        )
+
+    def __call__(self, output: List[Any]) -> List[Any]:
+        output = list(output)
+
+        for stage in self.stages:
+            output = stage(output)
+        return output
+
+
+def get_converter(
+    inputs: Dict[str, Any], default: Callable[..., Any]
+) -> Callable[..., Any]:
+    """
+    > It returns the converter set by `converter` in the inputs of a page, which
+    is a list of stage entries or the path of a YAML file holding one
+
+    Args:
+        inputs (Dict[str, Any]): The inputs of a page.
+        default (Callable[..., Any]): The converter used without `converter`.
+
+    Returns:
+        The converter.
+    """
+    config: Optional[Union[str, List[StageConfig]]] = inputs.get("converter")
+
+    if config is None:
+        return default
+    if isinstance(config, str):
+        return ConverterPipeline.from_yaml(config)
+    return ConverterPipeline.from_config(config)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Set
+
+
+class CrawlJournal:
+    def __init__(self, path: str, resume: bool = False) -> None:
+        """
+        An append-only journal of the crawl. Every record is one JSON line
+        which is flushed and fsynced before the crawl goes on, so a crash can
+        leave at most one torn line at the end, which is dropped on load.
+
+        Args:
+            path (str): The path of the journal file.
+            resume (bool): If True, the existing journal is loaded and appended
+                to. Otherwise, a new journal is started. Defaults to False
+        """
+        self.path: str = path
+        self.done: Set[str] = set()
+        self.partial: Dict[str, Dict[str, Any]] = {}
+        self.edges: Dict[str, List[List[Any]]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if resume and os.path.exists(path):
+            self._load()
+
+        self._file = open(path, "a" if resume else "w", encoding="utf-8")
+        self._sync()
+
+    def _load(self) -> None:
+        """
+        It replays the journal and cuts off a torn line left by a crash
+        """
+        valid_size: int = 0
+
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record: Dict[str, Any] = json.loads(line)
+                except ValueError:
+                    break
+                self._apply(record)
+                valid_size += len(line)
+
+        if valid_size < os.path.getsize(self.path):
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_size)
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        """
+        It applies one record to the in-memory state
+
+        Args:
+            record (Dict[str, Any]): A record of the journal.
+        """
+        unit: str = record["unit"]
+
+        if record["type"] == "done":
+            self.done.add(unit)
+            state: Optional[Dict[str, Any]] = self.partial.pop(unit, None)
+            edges: List[List[Any]] = (state or {}).get("edges", [])
+            edges = edges + record.get("edges", [])
+            if len(edges) > 0:
+                self.edges[unit] = edges
+        elif record["type"] == "checkpoint":
+            state = self.partial.setdefault(unit, {"outputs": [], "edges": []})
+            state["outputs"].extend(record["outputs"])
+            state["edges"].extend(record.get("edges", []))
+            state["urls"] = record["urls"]
+            state["cursor"] = record["cursor"]
+
+    def _sync(self) -> None:
+        """
+        It makes everything written so far durable
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        """
+        It appends one record and applies it
+
+        Args:
+            record (Dict[str, Any]): A record of the journal.
+        """
+        # the saver threads mark the units done while the crawl checkpoints
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._sync()
+            self._apply(record)
+
+    def is_done(self, unit: str) -> bool:
+        """
+        > It returns `True` if `unit` has been saved
+
+        Args:
+            unit (str): The name of the unit, such as "あ/1.yml".
+
+        Returns:
+            Whether the unit is done.
+        """
+        return unit in self.done
+
+    def get_state(self, unit: str) -> Optional[Dict[str, Any]]:
+        """
+        > It returns the state of the collector at the last checkpoint of `unit`
+
+        Args:
+            unit (str): The name of the unit.
+
+        Returns:
+            A dictionary of "outputs", "edges", "urls" and "cursor", or None.
+        """
+        return self.partial.get(unit)
+
+    def get_edges(self, unit: str) -> List[List[Any]]:
+        """
+        > It returns the edges of the crawl tree recorded by a unit which is done
+
+        Args:
+            unit (str): The name of the unit.
+
+        Returns:
+            The edges, as in `data.crawl_tree.add_edges`.
+        """
+        return self.edges.get(unit, [])
+
+    def checkpoint(
+        self,
+        unit: str,
+        outputs: List[str],
+        urls: List[str],
+        cursor: List[int],
+        edges: Optional[List[List[Any]]] = None,
+    ) -> None:
+        """
+        It records the progress of `unit`
+
+        Args:
+            unit (str): The name of the unit.
+            outputs (List[str]): The outputs since the last checkpoint.
+            urls (List[str]): The url stack of the collector.
+            cursor (List[int]): The index of the next element at each depth.
+            edges (Optional[List[List[Any]]]): The edges of the crawl tree
+                since the last checkpoint, which are journaled with the
+                outputs.
+        """
+        record: Dict[str, Any] = {
+            "type": "checkpoint",
+            "unit": unit,
+            "outputs": outputs,
+            "urls": list(urls),
+            "cursor": list(cursor),
+        }
+        if edges:
+            record["edges"] = edges
+        self._append(record)
+
+    def mark_done(self, unit: str, edges: Optional[List[List[Any]]] = None) -> None:
+        """
+        It records that `unit` has been saved
+
+        Args:
+            unit (str): The name of the unit.
+            edges (Optional[List[List[Any]]]): The edges of the crawl tree
+                since the last checkpoint.
+        """
+        record: Dict[str, Any] = {"type": "done", "unit": unit}
+        if edges:
+            record["edges"] = edges
+        self._append(record)
+
+    def close(self) -> None:
+        """
+        It closes the journal file
+        """
+        self._file.close()
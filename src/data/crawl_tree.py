@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Sequence
+
+src_dir, *res = os.getcwd().split("/src")
+
+if len(res) > 0:
+    sys.path.append(src_dir + "/src")
+
+try:
+    from data.html_tree import BasicTree
+except ImportError:
+    raise
+
+MAGIC: bytes = b"CRAWLTR1"
+# the magic and the number of the nodes
+HEADER: struct.Struct = struct.Struct("<8sQ")
+
+
+def _to_little(values: array) -> bytes:
+    """
+    > It returns the bytes of an array in little endian
+    """
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def save_tree(tree: BasicTree, filename: str) -> int:
+    """
+    It writes a tree as arrays in pre-order: the index of the parent of every
+    node, and the offsets of their names in a block of UTF-8 text. The root has
+    the parent -1, and a node without a name an empty name. The file is
+    written to `filename + ".part"` first and then renamed.
+
+    Args:
+        tree (BasicTree): The root of the tree.
+        filename (str): The tree file.
+
+    Returns:
+        The number of the nodes.
+    """
+    parents: array = array("q")
+    offsets: array = array("Q", [0])
+    names: List[bytes] = []
+    positions: Dict[int, int] = {}
+
+    for node in tree.iter_subtree():
+        positions[id(node)] = len(parents)
+        parents.append(-1 if node is tree else positions[id(node.parent)])
+        name: bytes = (node.name or "").encode("utf-8")
+        names.append(name)
+        offsets.append(offsets[-1] + len(name))
+
+    tmp_filename: str = f"{filename}.part"
+    with open(tmp_filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(parents)))
+        f.write(_to_little(parents))
+        f.write(_to_little(offsets))
+        f.write(b"".join(names))
+    os.replace(tmp_filename, filename)
+    return len(parents)
+
+
+def add_edge(
+    tree: BasicTree,
+    nodes: Dict[str, BasicTree],
+    page_url: str,
+    output: str,
+    is_page: bool = False,
+) -> BasicTree:
+    """
+    > It adds an output as a child of the page it comes from. The nodes of the
+    pages are kept in `nodes` by URL, so no search is needed, and a page not
+    known yet is added under `tree`.
+
+    Args:
+        tree (BasicTree): The node of the crawl.
+        nodes (Dict[str, BasicTree]): The nodes of the pages by URL.
+        page_url (str): The URL of the page of the output.
+        output (str): The output.
+        is_page (bool): If True, the output is the URL of a page whose outputs
+            are added under it. Defaults to False
+
+    Returns:
+        The node of the output.
+    """
+    parent: Optional[BasicTree] = nodes.get(page_url)
+    if parent is None:
+        if tree.name == page_url:
+            parent = tree
+        else:
+            # the start page, or a page whose output was restored
+            parent = BasicTree(page_url)
+            tree.set_child(parent)
+        nodes[page_url] = parent
+
+    node: BasicTree = BasicTree(output)
+    parent.set_child(node)
+    if is_page:
+        nodes.setdefault(output, node)
+    return node
+
+
+def add_edges(tree: BasicTree, edges: List[List[Any]]) -> None:
+    """
+    It adds the edges journaled by a collector, which are the arguments of
+    `add_edge` after `nodes`, so that the tree of a crawl is rebuilt when it
+    is resumed
+
+    Args:
+        tree (BasicTree): The node of the crawl.
+        edges (List[List[Any]]): The page URL, output and is_page of each
+            output in order.
+    """
+    nodes: Dict[str, BasicTree] = {}
+
+    for page_url, output, is_page in edges:
+        add_edge(tree, nodes, page_url, output, is_page)
+
+
+def get_child(tree: BasicTree, name: str) -> BasicTree:
+    """
+    > It returns the child of `tree` named `name`, which is added if missing
+
+    Args:
+        tree (BasicTree): The parent node.
+        name (str): The name of the child.
+
+    Returns:
+        The child.
+    """
+    child: Optional[BasicTree] = tree.find(name)
+
+    if (child is None) or (child.parent is not tree):
+        child = BasicTree(name)
+        tree.set_child(child)
+    return child
+
+
+class CrawlTreeFile:
+    def __init__(self, filename: str) -> None:
+        """
+        A tree saved by `save_tree`, read lazily from a memory map. A node is
+        its index in pre-order. The names and parents are read only when they
+        are asked, the name index is built on the first `find`, and the
+        children on the first `children`.
+
+        Args:
+            filename (str): The tree file.
+        """
+        self.filename: str = filename
+        self._file = open(filename, "rb")
+        self._mmap: mmap.mmap = mmap.mmap(
+            self._file.fileno(), 0, access=mmap.ACCESS_READ
+        )
+
+        magic, size = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a crawl tree file.")
+        self.size: int = size
+
+        start: int = HEADER.size
+        end: int = start + 8 * size
+        self.parents: Sequence[int] = self._read_array("q", start, end)
+        self.offsets: Sequence[int] = self._read_array("Q", end, end + 8 * (size + 1))
+        self._names_start: int = end + 8 * (size + 1)
+        self._index: Optional[Dict[str, int]] = None
+        self._children: Optional[List[List[int]]] = None
+
+    def _read_array(self, typecode: str, start: int, end: int) -> Sequence[int]:
+        """
+        > It returns an array of the file, which is a view of the memory map
+        unless the bytes must be swapped
+        """
+        if sys.byteorder == "big":
+            values: array = array(typecode, self._mmap[start:end])
+            values.byteswap()
+            return values
+        return memoryview(self._mmap)[start:end].cast(typecode)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def name(self, node: int) -> Optional[str]:
+        """
+        > It returns the name of a node
+
+        Args:
+            node (int): The index of the node.
+
+        Returns:
+            The name, or None if the node has no name.
+        """
+        start: int = self._names_start + self.offsets[node]
+        end: int = self._names_start + self.offsets[node + 1]
+        return self._mmap[start:end].decode("utf-8") or None
+
+    def parent(self, node: int) -> Optional[int]:
+        """
+        > It returns the index of the parent of a node, or None for the root
+        """
+        parent: int = self.parents[node]
+        return None if parent < 0 else parent
+
+    def children(self, node: int) -> List[int]:
+        """
+        > It returns the indices of the children of a node in order
+
+        Args:
+            node (int): The index of the node.
+
+        Returns:
+            The children.
+        """
+        if self._children is None:
+            self._children = [[] for _ in range(self.size)]
+            for child, parent in enumerate(self.parents):
+                if parent >= 0:
+                    self._children[parent].append(child)
+        return self._children[node]
+
+    def find(self, name: str) -> Optional[int]:
+        """
+        > It returns the first node in pre-order named `name`
+
+        Args:
+            name (str): The name of the node.
+
+        Returns:
+            The index of the node, or None if no node has the name.
+        """
+        if self._index is None:
+            block: bytes = self._mmap[self._names_start :]
+            self._index = {}
+            for node in range(self.size - 1, -1, -1):
+                start, end = self.offsets[node], self.offsets[node + 1]
+                if end > start:
+                    # the nodes are visited backwards so the first one wins
+                    self._index[block[start:end].decode("utf-8")] = node
+        return self._index.get(name)
+
+    def path(self, node: int) -> List[Optional[str]]:
+        """
+        > It returns the names from the root down to a node, which is the page
+        from which an output has been collected
+
+        Args:
+            node (int): The index of the node.
+
+        Returns:
+            The names of the path.
+        """
+        names: List[Optional[str]] = []
+        current: Optional[int] = node
+
+        while current is not None:
+            names.append(self.name(current))
+            current = self.parent(current)
+        names.reverse()
+        return names
+
+    def load(self) -> BasicTree:
+        """
+        > It builds the whole tree in memory
+
+        Returns:
+            The root of the tree.
+        """
+        nodes: List[BasicTree] = []
+
+        for node in range(self.size):
+            tree: BasicTree = BasicTree(self.name(node))
+            parent: Optional[int] = self.parent(node)
+            if parent is not None:
+                nodes[parent].set_child(tree)
+            nodes.append(tree)
+        return nodes[0] if len(nodes) > 0 else BasicTree()
+
+    def close(self) -> None:
+        for values in (self.parents, self.offsets):
+            if isinstance(values, memoryview):
+                values.release()
+        self._mmap.close()
+        self._file.close()
+
+
+def load_tree(filename: str) -> BasicTree:
+    """
+    > It reads a tree file into a `BasicTree`
+
+    Args:
+        filename (str): The tree file.
+
+    Returns:
+        The root of the tree.
+    """
+    tree_file: CrawlTreeFile = CrawlTreeFile(filename)
+    try:
+        return tree_file.load()
+    finally:
+        tree_file.close()
+
+
+def test():
+    """
+    > The function `test()` records the tree of a crawl of a local site, and
+    > checks that the saved file gives the path of a jukugo from the site
+    > through its kana and page, and that the trees rebuilt from the edges and
+    > from the file are the same as the recorded one.
+    """
+    import tempfile
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from data.data_collector import SimpleDataCollector
+    from data.fetcher import SessionFetcher
+
+    pages: Dict[str, str] = {"/": ""}
+    for i in range(2):
+        pages["/"] += f'<div class="kana"><a href="/{i}">{i}</a></div>'
+        pages[f"/{i}"] = "".join(
+            f'<li class="page"><a href="/{i}/{j}">{j}</a></li>' for j in range(2)
+        )
+        for j in range(2):
+            pages[f"/{i}/{j}"] = "".join(
+                f'<p class="word">〈語〉{i}{j}{k}</p>' for k in range(3)
+            )
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            body: bytes = pages[self.path].encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    def _new_collector(tree: BasicTree) -> SimpleDataCollector:
+        collector: SimpleDataCollector = SimpleDataCollector(
+            start_url=f"{base_url}/",
+            output_style="word",
+            sleep_time=0,
+            fetcher=fetcher,
+            tree=tree,
+        )
+        collector.reset()
+        return collector
+
+    def _read(filename: str) -> bytes:
+        with open(filename, "rb") as f:
+            return f.read()
+
+    server: ThreadingHTTPServer = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url: str = f"http://127.0.0.1:{server.server_address[1]}"
+    fetcher: SessionFetcher = SessionFetcher()
+
+    try:
+        tree: BasicTree = BasicTree(f"{base_url}/")
+        collector: SimpleDataCollector = _new_collector(tree)
+        collector.dig_recursively(["div.kana a[href]", "li.page a[href]", "p.word"])
+    finally:
+        server.shutdown()
+        server.server_close()
+        fetcher.close()
+
+    edges: List[List[Any]] = collector.pop_edges()
+    # the edges are journaled with the outputs, from which a resumed crawl
+    # rebuilds its tree
+    journaled: BasicTree = BasicTree(f"{base_url}/")
+    add_edges(journaled, edges)
+    restored: BasicTree = BasicTree(f"{base_url}/")
+    _new_collector(restored).restore(
+        {"outputs": [], "urls": [], "cursor": [], "edges": edges}
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename: str = os.path.join(tmp_dir, "crawl_tree.bin")
+        size: int = save_tree(tree, filename)
+        test_res: List[bool] = [
+            size == 1 + 2 + 4 + 12,
+            collector.pop_edges() == [],
+            len(edges) == size - 1,
+        ]
+
+        path: List[Optional[str]] = [
+            f"{base_url}/",
+            f"{base_url}/1",
+            f"{base_url}/1/0",
+            "語101",
+        ]
+        tree_file: CrawlTreeFile = CrawlTreeFile(filename)
+        try:
+            node: Optional[int] = tree_file.find("語101")
+            test_res += [
+                len(tree_file) == size,
+                node is not None,
+                tree_file.path(node) == path,
+                [
+                    tree_file.name(child)
+                    for child in tree_file.children(tree_file.parent(node))
+                ]
+                == ["語100", "語101", "語102"],
+                tree_file.find("語999") is None,
+            ]
+        finally:
+            tree_file.close()
+
+        for name, other in (
+            ("journaled", journaled),
+            ("restored", restored),
+            ("loaded", load_tree(filename)),
+        ):
+            other_filename: str = os.path.join(tmp_dir, f"{name}.bin")
+            save_tree(other, other_filename)
+            test_res.append(_read(other_filename) == _read(filename))
+
+        test_res.append(load_tree(filename).find("語101").path() == path)
+
+    if not all(test_res):
+        raise AssertionError(f"all of test must be True. But {test_res}")
+    print("Test has be run successfully.")
+
+
+if __name__ == "__main__":
+    test()
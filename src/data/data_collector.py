@@ -1,11 +1,10 @@
 # -*- coding: utf-8 -*-
+import logging
 import os
-import re
-import time
-from typing import Callable, Dict, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from urllib.parse import urljoin
 
 import yaml
-from bs4 import BeautifulSoup
 from bs4.element import ResultSet, Tag
 
 src_dir, *res = os.getcwd().split("/src")
@@ -16,11 +15,25 @@ if len(res) > 0:
     sys.path.append(src_dir + "/src")
 
 try:
-    from data.data_saver import SimpleDataSaver, sieve_fn
+    from data.converter import ConverterPipeline, get_converter
+    from data.crawl_journal import CrawlJournal
+    from data.crawl_tree import add_edge
+    from data.data_saver import OutputStream, SimpleDataSaver
+    from data.extract_data import sieve_fn
+    from data.fetcher import Fetcher
+    from data.frontier import Frontier, WorkItem
+    from data.html_tree import BasicTree
+    from data.metrics import CrawlMetrics
+    from data.parser_backend import AbstractParserBackend, get_backend
+    from data.politeness import AbstractScheduler, FixedDelayScheduler
     from data.save_html_from_url import get_html
+    from data.text_normalizer import TextNormalizer
+    from data.url_filter import SeenSet, canonicalize_url
 except ImportError:
     raise
 
+logger: logging.Logger = logging.getLogger(__name__)
+
 
 # TODO: 記事にまとめてね！gitとにコミットもしてね！
 class AbstractDataCollector:
@@ -29,6 +42,9 @@ class AbstractDataCollector:
         start_url: str,
         output_style: str = "url",
         saver: Optional[SimpleDataSaver] = None,
+        fetcher: Optional[Fetcher] = None,
+        seen: Optional[SeenSet] = None,
+        metrics: Optional[CrawlMetrics] = None,
     ) -> None:
         """
         `__init__` is a special function that is called when an object is created.
@@ -39,6 +55,12 @@ class AbstractDataCollector:
                 displayed. It can be either "url" or "domain". Defaults to url
             saver (Optional[SimpleDataSaver]): This is the object that will save
             the data.
+            fetcher (Optional[Fetcher]): This is the object that will get
+            the HTML. If None, the shared default fetcher is used.
+            seen (Optional[SeenSet]): The URLs already fetched or queued. It
+            may be shared by many collectors. If None, no page is skipped.
+            metrics (Optional[CrawlMetrics]): The metrics of the crawl. If None,
+            those of the saver are used.
         """
         self.init_url: str = start_url
         self.current_url: str = start_url
@@ -47,6 +69,12 @@ class AbstractDataCollector:
         self.depth: Optional[int] = None
         self.outputs: List[str] = []
         self.saver: SimpleDataSaver = saver
+        self.fetcher: Optional[Fetcher] = fetcher
+        self.stream: Optional[OutputStream] = None
+        self.seen: Optional[SeenSet] = seen
+        if metrics is None:
+            metrics = CrawlMetrics() if saver is None else saver.metrics
+        self.metrics: CrawlMetrics = metrics
 
     def reset(self, init_depth: int = 0) -> None:
         """
@@ -59,8 +87,64 @@ class AbstractDataCollector:
         self.urls = [self.init_url]
         self.depth = init_depth
 
-    def save(self, filename: str) -> None:
-        self.saver(self.outputs, filename=filename)
+    def open_stream(self, filename: str) -> None:
+        """
+        If the saver is streaming, the outputs are written to `filename` as
+        soon as they are pushed, instead of being kept in `self.outputs`.
+
+        Args:
+            filename (str): The name of the file to save the data to.
+        """
+        if (self.saver is not None) and self.saver.streaming:
+            self.stream = self.saver.open(filename)
+
+    def _emit(self, output: str) -> None:
+        """
+        It appends an output to the stream or to `self.outputs`
+
+        Args:
+            output (str): The output of an element.
+        """
+        if self.stream is not None:
+            self.stream.write(output)
+        else:
+            self.outputs.append(output)
+        self.metrics.incr("outputs")
+
+    def _is_new_url(self, url: str) -> bool:
+        """
+        > It marks a URL to be fetched as seen, and returns `True` if it had not
+        been seen before
+
+        Args:
+            url (str): The URL of a page to be fetched.
+
+        Returns:
+            Whether the page must be fetched.
+        """
+        if self.seen is None:
+            return True
+        return self.seen.add(canonicalize_url(url))
+
+    def save(
+        self, filename: str, callback: Optional[Callable[[], None]] = None
+    ) -> None:
+        """
+        It saves the outputs, or closes the stream to which they were written
+
+        Args:
+            filename (str): The name of the file to save the data to.
+            callback (Optional[Callable[[], None]]): The function called once
+                the file is written, which may be later with a threaded saver.
+        """
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None
+            if callback is not None:
+                callback()
+            return
+
+        self.saver(self.outputs, filename=filename, callback=callback)
 
 
 # It takes a URL and a list of selectors, and returns a list of URLs
@@ -69,7 +153,14 @@ class SimpleDataCollector(AbstractDataCollector):
         self,
         *args: Tuple[str],
         rf_words: List[str] = ["▲", "△", "〈", "〉"],
+        nfkc: bool = False,
+        kanji_only: bool = False,
         sleep_time: int = 1,
+        journal: Optional[CrawlJournal] = None,
+        journal_unit: Optional[str] = None,
+        parser: str = "html.parser",
+        scheduler: Optional[AbstractScheduler] = None,
+        tree: Optional[BasicTree] = None,
         **kwargs: Dict[str, str],
     ) -> None:
         """
@@ -78,15 +169,43 @@ class SimpleDataCollector(AbstractDataCollector):
 
         Args:
             rf_words (List[str]): A list of words that indicate the next page.
+            nfkc (bool): If True, the words are normalized by NFKC.
+                Defaults to False
+            kanji_only (bool): If True, the words with anything but kanji are
+                dropped. Defaults to False
             sleep_time (int): The time to wait between each page. Defaults to 1
+            journal (Optional[CrawlJournal]): The journal to which the progress
+                is checkpointed after each subtree.
+            journal_unit (Optional[str]): The name of this crawl in the journal.
+            parser (str): The parser backend, one of "html.parser", "lxml" and
+                "lexbor". Defaults to "html.parser"
+            scheduler (Optional[AbstractScheduler]): The pacing of the requests,
+                which may be shared by many collectors. If None, `sleep_time` is
+                waited between two requests.
+            tree (Optional[BasicTree]): The node under which the pages and the
+                outputs are recorded as they are dug, each output as a child
+                of the page it comes from. If None, nothing is recorded.
             *args: Variable length argument list.
             **kwargs: Arbitrary keyword arguments.
         """
         super().__init__(*args, **kwargs)
-        self.rf_regex: str = "?".join(rf_words) + "?"
-        self.rf_fn: Callable[[str, str, str], str] = re.sub
+        self.normalizer: TextNormalizer = TextNormalizer(
+            rf_words, nfkc=nfkc, kanji_only=kanji_only
+        )
         self.exist_next: bool = False
         self.sleep_time: int = sleep_time
+        self.journal: Optional[CrawlJournal] = journal
+        self.journal_unit: Optional[str] = journal_unit
+        self.cursor: List[int] = []
+        self._resume_cursor: List[int] = []
+        self._unjournaled: List[str] = []
+        self.backend: AbstractParserBackend = get_backend(parser)
+        if scheduler is None:
+            scheduler = FixedDelayScheduler(delay=sleep_time, metrics=self.metrics)
+        self.scheduler: AbstractScheduler = scheduler
+        self.tree: Optional[BasicTree] = tree
+        self._tree_nodes: Dict[str, BasicTree] = {}
+        self._tree_edges: List[List[Any]] = []
 
     @property
     def _depth(self) -> int:
@@ -103,18 +222,20 @@ class SimpleDataCollector(AbstractDataCollector):
             )
         return self.depth
 
-    def _get_next_url(self, element: Tag) -> str:
+    def _get_next_url(self, element: Tag, page_url: Optional[str] = None) -> str:
         """
         It takes a BeautifulSoup element and returns the next url to scrape
 
         Args:
             element (Tag): Tag
+            page_url (Optional[str]): The URL of the page of the element, to
+                which a relative link is resolved. Defaults to the current url
 
         Returns:
             The next url is being returned.
         """
-        address: str = element.get("href")
-        next_url: str = self.init_url + address
+        address: str = self.backend.get_href(element)
+        next_url: str = urljoin(page_url or self.current_url, address)
         return next_url
 
     def reset(self, *args, **kwargs) -> None:
@@ -123,8 +244,85 @@ class SimpleDataCollector(AbstractDataCollector):
         """
         super().reset(*args, **kwargs)
         self.exist_next = False
+        self.cursor = []
+        self._resume_cursor = []
 
-    def _get_words(self, element: Tag) -> str:
+    def restore(self, state: Dict[str, Any]) -> None:
+        """
+        It restores the outputs and the url stack from a checkpoint, so that
+        `dig_recursively` continues from the element after it. With a
+        streaming saver, `open_stream` must be called before it.
+
+        Args:
+            state (Dict[str, Any]): The state returned by `CrawlJournal.get_state`
+        """
+        self.outputs = []
+        for output in state["outputs"]:
+            super()._emit(output)
+        self.urls = list(state["urls"])
+        self._resume_cursor = list(state["cursor"])
+
+        if self.tree is not None:
+            for page_url, output, is_page in state.get("edges", []):
+                add_edge(self.tree, self._tree_nodes, page_url, output, is_page)
+
+    def _checkpoint(self) -> None:
+        """
+        It records the outputs since the last checkpoint and the cursor
+        """
+        if self.journal is None:
+            return
+
+        self.journal.checkpoint(
+            self.journal_unit,
+            self._unjournaled,
+            self.urls,
+            self.cursor,
+            edges=self.pop_edges(),
+        )
+        self._unjournaled = []
+
+    def pop_edges(self) -> List[List[Any]]:
+        """
+        > It returns the edges of the crawl tree recorded since the last
+        checkpoint, which are journaled with the outputs, and forgets them
+
+        Returns:
+            The page URL, output and is_page of each output in order.
+        """
+        edges: List[List[Any]] = self._tree_edges
+        self._tree_edges = []
+        return edges
+
+    def _emit(self, output: str) -> None:
+        """
+        It emits an output and keeps it until the next checkpoint
+
+        Args:
+            output (str): The output of an element.
+        """
+        super()._emit(output)
+
+        if self.journal is not None:
+            self._unjournaled.append(output)
+
+    def _record(self, page_url: str, output: str) -> None:
+        """
+        It records an output as a child of the page it comes from in `tree`,
+        and keeps the edge until it is journaled, so that the tree of a
+        resumed crawl is rebuilt from the journal.
+
+        Args:
+            page_url (str): The URL of the page of the element.
+            output (str): The output of the element.
+        """
+        if self.tree is None:
+            return
+
+        add_edge(self.tree, self._tree_nodes, page_url, output, self.exist_next)
+        self._tree_edges.append([page_url, output, self.exist_next])
+
+    def _get_words(self, element: Tag) -> Optional[str]:
         """
         > The function `_get_words` takes a `Tag` object and returns a string
 
@@ -132,11 +330,37 @@ class SimpleDataCollector(AbstractDataCollector):
             element (Tag): Tag
 
         Returns:
-            The text of the element.
+            The text of the element, or None if it is rejected.
+        """
+        return self.normalizer(self.backend.get_text(element))
+
+    def _get_outputs(
+        self, elements: ResultSet[Tag], selector: str, page_url: Optional[str] = None
+    ) -> List[Optional[str]]:
+        """
+        > It returns the outputs of all the elements of a page at once, so that
+        the words are cleaned in one pass
+
+        Args:
+            elements (ResultSet[Tag]): The elements of the page.
+            selector (str): The CSS selector that was used to find the elements.
+            page_url (Optional[str]): The URL of the page. Defaults to the
+                current url
+
+        Returns:
+            The outputs in document order, with None for the rejected words.
         """
-        return self.rf_fn(self.rf_regex, "", element.text)
+        self._judge_next(selector)
+
+        if (self.output_style == "url") or (self.exist_next):
+            return [self._get_next_url(element, page_url) for element in elements]
+        elif self.output_style == "word":
+            return self.normalizer.normalize_all(
+                [self.backend.get_text(element) for element in elements]
+            )
+        return [""] * len(elements)
 
-    def _get_output(self, element: Tag) -> str:
+    def _get_output(self, element: Tag) -> Optional[str]:
         """
         > The function `_get_output` returns the next url or the words in the
         current page, depending on the value of `self.output_style`
@@ -145,32 +369,31 @@ class SimpleDataCollector(AbstractDataCollector):
             element (Tag): The element that we're currently looking at.
 
         Returns:
-            The output is being returned.
+            The output is being returned. It is None for a rejected word.
         """
-        output: str = ""
         if (self.output_style == "url") or (self.exist_next):
-            output += self._get_next_url(element)
+            return self._get_next_url(element)
         elif self.output_style == "word":
-            output += self._get_words(element)
-        return output
+            return self._get_words(element)
+        return ""
 
-    def _process_html(self, data: BeautifulSoup, selector: str) -> ResultSet[Tag]:
+    def _process_html(self, data: Any, selector: str) -> ResultSet[Tag]:
         """
-        "Return the result of calling the `select` method on the `data`
-        parameter, passing in the `selector` parameter."
+        "Return the elements of the `data` parameter matching the `selector`
+        parameter."
 
-        The `data` parameter is a `BeautifulSoup` object, and the `selector`
-        parameter is a string. The `select` method returns a `ResultSet` object,
-        which is a list of `Tag` objects
+        The `data` parameter is a document parsed by the parser backend, and
+        the `selector` is compiled by the backend only once per run.
 
         Args:
-            data (BeautifulSoup): BeautifulSoup
+            data (Any): The document parsed by `self.backend`.
             selector (str): The CSS selector to use to find the elements.
 
         Returns:
-            A ResultSet object.
+            A list of elements.
         """
-        return data.select(selector)
+        with self.metrics.timer("select"):
+            return self.backend.select(data, selector)
 
     def _judge_next(self, selector: str) -> None:
         """
@@ -181,25 +404,35 @@ class SimpleDataCollector(AbstractDataCollector):
         """
         self.exist_next = selector.endswith("a[href]")
 
-    def _extract_elements(self, selector: str) -> ResultSet[Tag]:
+    def _extract_elements(
+        self, selector: str, url: Optional[str] = None
+    ) -> ResultSet[Tag]:
         """
-        > It takes a selector, gets the HTML from the current URL, creates a
-        BeautifulSoup object, sleeps for a bit, and then returns the result of
-        the `_process_html` function
+        > It takes a selector, gets the HTML from the current URL when the
+        scheduler allows it, parses it with the parser backend, and then returns
+        the result of the `_process_html` function
 
         Args:
             selector (str): The CSS selector to use to extract the elements.
+            url (Optional[str]): The URL of the page. If None, the current URL
+                is used.
 
         Returns:
             A list of tags
         """
-        text: str = get_html(self.current_url)
-        soup: BeautifulSoup = BeautifulSoup(text, "html.parser")
+        url = url or self.current_url
 
-        # whenever after accessing a URL, need to be sleep for at least 1
-        # minute.
-        time.sleep(self.sleep_time)
-        return self._process_html(soup, selector)
+        def _fetch() -> str:
+            with self.metrics.timer("fetch"):
+                return get_html(url, fetcher=self.fetcher)
+
+        # whenever before accessing a URL, need to wait for the interval of its
+        # host since the last access.
+        text: str = self.scheduler.call(url, _fetch)
+        with self.metrics.timer("parse"):
+            document: Any = self.backend.parse(text)
+        self.metrics.incr("pages")
+        return self._process_html(document, selector)
 
     def _update_urls(self) -> None:
         """
@@ -208,7 +441,9 @@ class SimpleDataCollector(AbstractDataCollector):
         if self.exist_next:
             self.current_url = self.urls[-1]
 
-    def _push_output(self, element: Tag, selector: str) -> None:
+    def _push_output(
+        self, element: Tag, selector: str, output: Optional[str] = None
+    ) -> None:
         """
         It takes a selector and an element, and then it pushes the output of the
         selector to the output list.
@@ -216,13 +451,60 @@ class SimpleDataCollector(AbstractDataCollector):
         Args:
             element (Tag): The element that we're currently looking at.
             selector (str): The CSS selector for the element you want to extract.
+            output (Optional[str]): The output of the element, if it has been
+                got by `_get_outputs`.
         """
         self._judge_next(selector)
-        output: str = self._get_output(element)
-        self.outputs.append(output)
+        if output is None:
+            output = self._get_output(element)
+        if output is None:
+            return
+        self._emit(output)
         self.urls.append(output)
         self._update_urls()
-        print(output)
+        self.metrics.set_gauge("url_stack", len(self.urls))
+        logger.debug(output)
+
+    def _resume_output(
+        self, element: Tag, selector: str, page_url: Optional[str] = None
+    ) -> None:
+        """
+        It moves to the next url of an element whose output has been restored
+        from a checkpoint, without pushing the output again.
+
+        Args:
+            element (Tag): The element that we're currently looking at.
+            selector (str): The CSS selector for the element you want to extract.
+            page_url (Optional[str]): The URL of the page of the element.
+        """
+        self._judge_next(selector)
+        if self.exist_next:
+            self.current_url = self._get_next_url(element, page_url)
+
+    def _is_new_element(
+        self,
+        element: Tag,
+        selector: str,
+        selectors: List[str],
+        page_url: Optional[str] = None,
+    ) -> bool:
+        """
+        > It returns `False` if the element links to a page which has been
+        fetched or queued already, so that its subtree is skipped
+
+        Args:
+            element (Tag): The element that we're currently looking at.
+            selector (str): The CSS selector for the element you want to extract.
+            selectors (List[str]): List[str]
+            page_url (Optional[str]): The URL of the page of the element.
+
+        Returns:
+            Whether the element must be pushed.
+        """
+        self._judge_next(selector)
+        if (not self.exist_next) or self.is_bottom(selectors):
+            return True
+        return self._is_new_url(self._get_next_url(element, page_url))
 
     def _push_outputs(self, elements: ResultSet[Tag], selector: str) -> None:
         """
@@ -233,8 +515,12 @@ class SimpleDataCollector(AbstractDataCollector):
             elements (ResultSet[Tag]): The elements to push to the output.
             selector (str): The CSS selector that was used to find the element.
         """
-        for element in elements:
-            self._push_output(element, selector)
+        page_url: str = self.current_url
+
+        for element, output in zip(elements, self._get_outputs(elements, selector)):
+            if output is not None:
+                self._push_output(element, selector, output)
+                self._record(page_url, output)
 
     def get_selector(self, selectors: List[str]) -> str:
         """
@@ -302,24 +588,121 @@ class SimpleDataCollector(AbstractDataCollector):
         """
         It takes a list of selectors, gets the current selector, extracts the
         elements pushes the output, and then recursively calls itself if it's
-        not at the bottom of the tree
+        not at the bottom of the tree. A checkpoint is taken whenever a subtree
+        is finished, and a restored cursor skips the finished elements.
 
         Args:
             selectors (List[str]): List[str]
         """
         self._increase_depth()
         selector: str = self.get_selector(selectors)
+        page_url: str = self.current_url
         elements: ResultSet[Tag] = self._extract_elements(selector)
-
-        for element in elements:
-            self._push_output(element, selector)
+        outputs: List[Optional[str]] = self._get_outputs(elements, selector, page_url)
+
+        start: int = 0
+        resumed: bool = False
+        if len(self._resume_cursor) > 0:
+            start, *self._resume_cursor = self._resume_cursor
+            # the output of the element at `start` is restored only when the
+            # checkpoint was taken inside its subtree
+            resumed = len(self._resume_cursor) > 0
+
+        self.cursor.append(start)
+        for index in range(start, len(elements)):
+            element: Tag = elements[index]
+            self.cursor[-1] = index
+
+            if resumed:
+                self._resume_output(element, selector, page_url)
+                resumed = False
+            elif (outputs[index] is None) or not self._is_new_element(
+                element, selector, selectors, page_url
+            ):
+                continue
+            else:
+                self._push_output(element, selector, outputs[index])
+                self._record(page_url, outputs[index])
 
             if not self.is_bottom(selectors):
                 self.dig_recursively(selectors)
+                self.cursor[-1] = index + 1
+                self._checkpoint()
 
+        self.cursor.pop()
         self._decrease_depth()
         self.urls = self.urls[: self.depth]
 
+    def _expand(self, item: WorkItem, selectors: List[str]) -> List[WorkItem]:
+        """
+        > It gets the page of a work item and returns a work item for each
+        element matching the selector at its depth
+
+        Args:
+            item (WorkItem): The item whose page is extracted.
+            selectors (List[str]): List[str]
+
+        Returns:
+            The work items of the elements, in document order.
+        """
+        selector: str = selectors[item.depth]
+        elements: ResultSet[Tag] = self._extract_elements(selector, url=item.url)
+        outputs: List[Optional[str]] = self._get_outputs(elements, selector, item.url)
+
+        children: List[WorkItem] = []
+        for output in outputs:
+            if output is None:
+                continue
+            # a page without links to the next level is dug again from its own url
+            next_url: str = output if self.exist_next else item.url
+
+            if (
+                self.exist_next
+                and (item.depth + 1 < len(selectors))
+                and not self._is_new_url(next_url)
+            ):
+                continue
+            children.append(WorkItem(next_url, item.depth + 1, output))
+            self._record(item.url, output)
+        return children
+
+    def dig_iteratively(
+        self,
+        selectors: List[str],
+        order: str = "dfs",
+        max_frontier: Optional[int] = None,
+        priority_fn: Optional[Callable[[WorkItem], float]] = None,
+    ) -> None:
+        """
+        It digs the same pages as `dig_recursively` with an explicit frontier
+        instead of the call stack, so the depth of the site is not limited by
+        the recursion limit. Every work item carries its own url and depth.
+        With "dfs", the outputs are in the same order as `dig_recursively`.
+        It is not checkpointed to the journal.
+
+        Args:
+            selectors (List[str]): List[str]
+            order (str): "dfs", "bfs" or "priority". Defaults to "dfs"
+            max_frontier (Optional[int]): The soft limit of the work items kept
+                at once. Beyond it, the deepest items are visited first.
+            priority_fn (Optional[Callable[[WorkItem], float]]): The key of the
+                "priority" order. The smallest one is visited first.
+        """
+        frontier: Frontier = Frontier(
+            order=order, max_size=max_frontier, priority_fn=priority_fn
+        )
+        frontier.push(WorkItem(self.current_url, self._depth))
+
+        while len(frontier) > 0:
+            item: WorkItem = frontier.pop()
+
+            if item.output is not None:
+                self._emit(item.output)
+                logger.debug(item.output)
+            if item.depth < len(selectors):
+                frontier.push_many(self._expand(item, selectors))
+            self.metrics.set_gauge("frontier", len(frontier))
+
     def dig_multiply(self, selectors: List[str]) -> None:
         """
         It digs the specified selectors
@@ -355,7 +738,24 @@ def main() -> None:
         default=None,
         help=("If you save output in a DataCollector, you must set this argument."),
     )
+    parser.add_argument(
+        "--parser",
+        type=str,
+        default=None,
+        choices=["html.parser", "lxml", "lexbor"],
+        help=("Set a parser backend. It overrides `parser` in the selector file."),
+    )
+    parser.add_argument(
+        "--converter",
+        type=str,
+        default=None,
+        help=(
+            "Set a YAML file of the converter stages applied before saving. It "
+            "overrides `converter` in the selector file."
+        ),
+    )
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
 
     if (args.save) and (args.savedir is None):
         raise TypeError(
@@ -367,13 +767,19 @@ def main() -> None:
     with open(args.selector_file, "r") as f:
         inputs: Dict[str, Union[str, List[str]]] = yaml.safe_load(f)
 
-    saver: SimpleDataSaver = SimpleDataSaver(savedir=args.savedir, fn=sieve_fn)
+    converter: Callable[..., Any] = get_converter(inputs, default=sieve_fn)
+    if args.converter is not None:
+        converter = ConverterPipeline.from_yaml(args.converter)
+    saver: SimpleDataSaver = SimpleDataSaver(savedir=args.savedir, fn=converter)
 
     data_collector: AbstractDataCollector = SimpleDataCollector(
         start_url=inputs["url"],
         output_style=inputs["style"],
         rf_words=inputs["rf_words"],
+        nfkc=inputs.get("nfkc", False),
+        kanji_only=inputs.get("kanji_only", False),
         saver=saver,
+        parser=args.parser or inputs.get("parser", "html.parser"),
     )
 
     data_collector.reset()
@@ -381,5 +787,145 @@ def main() -> None:
     data_collector.save(filename="xxx.yml")
 
 
+def _test_pages() -> Dict[str, str]:
+    """
+    > It returns a small site of three levels, from the URL to the HTML
+    """
+    pages: Dict[str, str] = {"http://test": ""}
+
+    for i in range(3):
+        pages["http://test"] += f'<div class="kana"><a href="/{i}">{i}</a></div>'
+        pages[f"http://test/{i}"] = "".join(
+            f'<li class="page"><a href="/{i}/{j}">{j}</a></li>' for j in range(3)
+        )
+        for j in range(3):
+            pages[f"http://test/{i}/{j}"] = "".join(
+                f'<p class="word">〈{i}{j}〉{k}</p>' for k in range(4)
+            )
+    return pages
+
+
+def test():
+    """
+    > The function `test()` digs a small site from memory, and checks that
+    > `dig_iteratively` gives the outputs of `dig_recursively` in pre-order,
+    > and that a crawl killed at any page and resumed from its journal gives
+    > the outputs of an uninterrupted one.
+    """
+    import tempfile
+
+    pages: Dict[str, str] = _test_pages()
+    selectors: List[str] = ["div.kana a[href]", "li.page a[href]", "p.word"]
+    results: Dict[str, List[str]] = {}
+
+    for name, order in (("recursively", None), ("dfs", "dfs"), ("bfs", "bfs")):
+        collector: SimpleDataCollector = SimpleDataCollector(
+            start_url="http://test",
+            output_style="word",
+            sleep_time=0,
+            fetcher=pages.__getitem__,
+        )
+        collector.reset()
+        if order is None:
+            collector.dig_recursively(selectors)
+        else:
+            collector.dig_iteratively(selectors, order=order, max_frontier=4)
+        results[name] = collector.outputs
+
+    test_res: List[bool] = [len(results["recursively"]) == 3 + 9 + 36]
+    test_res.append(results["dfs"] == results["recursively"])
+    test_res.append(sorted(results["bfs"]) == sorted(results["recursively"]))
+
+    # a rejected word is skipped by `_push_output`
+    collector = SimpleDataCollector(
+        start_url="http://test/k",
+        output_style="word",
+        sleep_time=0,
+        kanji_only=True,
+        fetcher={
+            "http://test/k": '<p class="word">あい</p><p class="word">亜鉛</p>'
+        }.__getitem__,
+    )
+    collector.reset()
+    for element in collector._extract_elements("p.word"):
+        collector._push_output(element, "p.word")
+    test_res.append(collector.outputs == ["亜鉛"])
+
+    # the links are resolved against the page they are on
+    relative_pages: Dict[str, str] = {
+        "http://test/a/": '<div class="kana"><a href="b/">b</a></div>',
+        "http://test/a/b/": '<li class="page"><a href="../c">c</a></li>',
+        "http://test/a/c": '<p class="word">〈亜〉鉛</p>',
+    }
+    for order in (None, "dfs"):
+        collector = SimpleDataCollector(
+            start_url="http://test/a/",
+            output_style="word",
+            sleep_time=0,
+            fetcher=relative_pages.__getitem__,
+        )
+        collector.reset()
+        if order is None:
+            collector.dig_recursively(selectors)
+        else:
+            collector.dig_iteratively(selectors, order=order)
+        test_res.append(
+            collector.outputs == ["http://test/a/b/", "http://test/a/c", "亜鉛"]
+        )
+
+    def _fetch_until(fetched: List[str], limit: int) -> Callable[[str], str]:
+        def _fetch(url: str) -> str:
+            if len(fetched) == limit:
+                raise ConnectionError(f"killed before {url}")
+            fetched.append(url)
+            return pages[url]
+
+        return _fetch
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for limit in range(1, len(pages)):
+            path: str = os.path.join(tmp_dir, f"journal.{limit}.jsonl")
+            fetched: List[str] = []
+            journal: CrawlJournal = CrawlJournal(path)
+            collector = SimpleDataCollector(
+                start_url="http://test",
+                output_style="word",
+                sleep_time=0,
+                fetcher=_fetch_until(fetched, limit),
+                journal=journal,
+                journal_unit="test",
+            )
+            collector.reset()
+            try:
+                collector.dig_recursively(selectors)
+                test_res.append(False)
+            except ConnectionError:
+                pass
+            journal.close()
+
+            journal = CrawlJournal(path, resume=True)
+            collector = SimpleDataCollector(
+                start_url="http://test",
+                output_style="word",
+                sleep_time=0,
+                fetcher=_fetch_until(fetched, -1),
+                journal=journal,
+                journal_unit="test",
+            )
+            collector.reset()
+            if journal.get_state("test") is not None:
+                collector.restore(journal.get_state("test"))
+            collector.dig_recursively(selectors)
+            journal.close()
+            test_res.append(collector.outputs == results["recursively"])
+            # only the pages above the killed one are fetched again
+            test_res.append(len(fetched) <= len(pages) + 2)
+
+    if not all(test_res):
+        raise AssertionError(f"all of test must be True. But {test_res}")
+
+    print("Test has be run successfully.")
+
+
 if __name__ == "__main__":
     main()
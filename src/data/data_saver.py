@@ -1,12 +1,43 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import json
 import os
-from typing import Any, Callable, List, Optional
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Set, TextIO
 
 import yaml
 
+try:
+    from yaml import CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeDumper
+
+src_dir, *res = os.getcwd().split("/src")
+
+if len(res) > 0:
+    import sys
+
+    sys.path.append(src_dir + "/src")
+
+try:
+    from data.converter import ConverterPipeline
+    from data.manifest import PageManifest, hash_bytes, new_hash
+    from data.metrics import CrawlMetrics
+except ImportError:
+    raise
+
 
 class SimpleDataSaver:
-    def __init__(self, savedir: str, fn: Callable[..., Any]):
+    streaming: bool = False
+
+    def __init__(
+        self,
+        savedir: str,
+        fn: Callable[..., Any],
+        metrics: Optional[CrawlMetrics] = None,
+        manifest: Optional[PageManifest] = None,
+    ):
         """
         It takes a function and a directory, and returns a function that saves
         the output of the original function to the directory
@@ -14,21 +45,32 @@ class SimpleDataSaver:
         Args:
             savedir (str): The directory to save the file to.
             fn (Callable[..., Any]): The function to be wrapped.
+            metrics (Optional[CrawlMetrics]): The metrics to which the time of
+                the saves is recorded as "save".
+            manifest (Optional[PageManifest]): The manifest to which the
+                content hash of every written file is recorded. It is saved
+                when the saver is closed.
         """
         self.savedir: str = savedir
         self.fn: Callable[..., Any] = fn
+        self.metrics: CrawlMetrics = metrics or CrawlMetrics()
+        self.manifest: Optional[PageManifest] = manifest
+        self._dirs: Set[str] = set()
 
     def _check_dir(self, filename: str) -> None:
         """
-        If the directory of the file doesn't exist, create it
+        If the directory of the file doesn't exist, create it. The directories
+        already created are remembered, so the disk is checked once per
+        directory.
 
         Args:
             filename (str): The name of the file to save the model to.
         """
         save_dir: str = os.path.dirname(filename)
 
-        if not os.path.exists(save_dir):
+        if save_dir not in self._dirs:
             os.makedirs(save_dir, exist_ok=True)
+            self._dirs.add(save_dir)
 
     def get_filename(self, filename: str):
         """
@@ -44,7 +86,46 @@ class SimpleDataSaver:
         self._check_dir(filename=_filename)
         return _filename
 
-    def __call__(self, output: Any, filename: Optional[str] = None) -> None:
+    def _write(
+        self,
+        output: Any,
+        filename: str,
+        callback: Optional[Callable[[], None]] = None,
+        fn: Optional[Callable[..., Any]] = None,
+    ) -> None:
+        """
+        It converts the output and writes it to the file
+
+        Args:
+            output (Any): The output of the function.
+            filename (str): The filename to write to.
+            callback (Optional[Callable[[], None]]): The function called after
+                the file is written.
+            fn (Optional[Callable[..., Any]]): The converter. If None, `fn` of
+                the saver is used.
+        """
+        with self.metrics.timer("save"):
+            _filename: str = self.get_filename(filename)
+            _output: Any = (fn or self.fn)(output)
+            data: bytes = yaml.dump(
+                _output, Dumper=SafeDumper, allow_unicode=True
+            ).encode("utf-8")
+
+            with open(_filename, "wb") as f:
+                f.write(data)
+
+            if self.manifest is not None:
+                self.manifest.record(_filename, hash_bytes(data))
+
+        if callback is not None:
+            callback()
+
+    def __call__(
+        self,
+        output: Any,
+        filename: Optional[str] = None,
+        callback: Optional[Callable[[], None]] = None,
+    ) -> None:
         """
         > This function takes in an output and a filename, and then writes the
         output to the filename
@@ -52,6 +133,8 @@ class SimpleDataSaver:
         Args:
             output (Any): The output of the function.
             filename (Optional[str]): The filename to write to.
+            callback (Optional[Callable[[], None]]): The function called after
+                the file is written, such as marking the page done.
 
         Returns:
             The output of the function is being returned.
@@ -59,11 +142,22 @@ class SimpleDataSaver:
         if filename is None:
             return
 
-        _filename: str = self.get_filename(filename)
-        _output: Any = self.fn(output)
+        self._write(output, filename, callback=callback)
+
+    def flush(self) -> None:
+        """
+        It waits until every file passed to the saver is written
+        """
+        pass
+
+    def close(self) -> None:
+        """
+        It writes the remaining files and the manifest, and releases the saver
+        """
+        self.flush()
 
-        with open(_filename, "w", encoding="utf-8") as f:
-            yaml.safe_dump(_output, f, allow_unicode=True)
+        if self.manifest is not None:
+            self.manifest.save()
 
     def change_converter(self, fn: Callable[..., Any]) -> None:
         """
@@ -76,32 +170,348 @@ class SimpleDataSaver:
         self.fn = fn
 
 
-def sieve_fn(output: List[str]) -> List[str]:
-    """
-    > It returns `True` if the last part of the string is a number, and `False`
-    otherwise
+class ThreadedDataSaver(SimpleDataSaver):
+    def __init__(
+        self,
+        savedir: str,
+        fn: Callable[..., Any],
+        max_workers: int = 4,
+        metrics: Optional[CrawlMetrics] = None,
+        manifest: Optional[PageManifest] = None,
+    ):
+        """
+        It writes the files on a pool of threads, so the crawl does not wait
+        for the disk. `flush` waits for the files passed so far, and raises the
+        first error of their writes.
 
-    Args:
-        output (List[str]): List[str] -> The output of the previous function.
-    """
+        Args:
+            savedir (str): The directory to save the file to.
+            fn (Callable[..., Any]): The converter applied to the outputs.
+            max_workers (int): The number of the writer threads. Defaults to 4
+            metrics (Optional[CrawlMetrics]): The metrics to which the time of
+                the saves is recorded as "save".
+            manifest (Optional[PageManifest]): The manifest of the written
+                files, which is updated from the writer threads.
+        """
+        super().__init__(savedir=savedir, fn=fn, metrics=metrics, manifest=manifest)
+        self.max_workers: int = max_workers
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="saver"
+        )
+        self.futures: List[Future] = []
+        self._lock: threading.Lock = threading.Lock()
+
+    def _check_dir(self, filename: str) -> None:
+        with self._lock:
+            super()._check_dir(filename)
+
+    def __call__(
+        self,
+        output: Any,
+        filename: Optional[str] = None,
+        callback: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        > It queues the output to be written to the filename, and returns
+        without waiting for it
+
+        Args:
+            output (Any): The output of the function.
+            filename (Optional[str]): The filename to write to.
+            callback (Optional[Callable[[], None]]): The function called from
+                the writer thread after the file is written.
+        """
+        if filename is None:
+            return
+
+        # the collector may reuse its outputs and the converter may be changed
+        # once this returns, so both are bound now
+        future: Future = self.executor.submit(
+            self._write, list(output), filename, callback, self.fn
+        )
+        with self._lock:
+            self.futures = [f for f in self.futures if (not f.done()) or f.exception()]
+            self.futures.append(future)
+        self.metrics.set_gauge("save_queue", len(self.futures))
+
+    def flush(self) -> None:
+        with self._lock:
+            futures: List[Future] = self.futures
+            self.futures = []
+
+        for future in futures:
+            future.result()
+        self.metrics.set_gauge("save_queue", 0)
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            self.executor.shutdown(wait=True)
+
+
+class OutputStream:
+    def __init__(
+        self,
+        filename: str,
+        fn: Callable[..., Any],
+        file_format: str = "yaml",
+        flush_every: int = 100,
+        metrics: Optional[CrawlMetrics] = None,
+        manifest: Optional[PageManifest] = None,
+    ) -> None:
+        """
+        It writes outputs one by one to `filename + ".part"`, and renames it to
+        `filename` when it is closed, so a reader never sees a partial file.
+        The content hash is updated with every write, and recorded to the
+        manifest when the file is renamed.
+
+        If the converter is a `ConverterPipeline` with stages needing the whole
+        list, such as "dedupe" and "sort", the outputs are run through the
+        stages before the first of them one by one and kept, and the rest of
+        the pipeline is run over all of them when the stream is closed.
+
+        Args:
+            filename (str): The name of the file to save the outputs to.
+            fn (Callable[..., Any]): The converter applied to each output.
+            file_format (str): "yaml" writes a YAML sequence identical to the
+                one of `SimpleDataSaver`, "jsonl" writes one JSON per line.
+                Defaults to "yaml"
+            flush_every (int): The number of items between flushes.
+                Defaults to 100
+            metrics (Optional[CrawlMetrics]): The metrics to which the time of
+                the writes is recorded as "save".
+            manifest (Optional[PageManifest]): The manifest to which the
+                content hash of the file is recorded when it is closed.
+        """
+        if file_format not in ("yaml", "jsonl"):
+            raise ValueError(f"file_format; {file_format} must be yaml or jsonl.")
+
+        self.filename: str = filename
+        self.fn: Callable[..., Any] = fn
+        self.tail: Optional[ConverterPipeline] = None
+        if isinstance(fn, ConverterPipeline):
+            self.fn, self.tail = fn.split()
+            if len(self.tail.stages) == 0:
+                self.tail = None
+        self.file_format: str = file_format
+        self.flush_every: int = flush_every
+        self.count: int = 0
+        self._pending: List[Any] = []
+        self.metrics: CrawlMetrics = metrics or CrawlMetrics()
+        self.manifest: Optional[PageManifest] = manifest
+        self._hash: hashlib.blake2b = new_hash()
+        self._file: TextIO = open(f"{filename}.part", "w", encoding="utf-8")
+
+    def _dump(self, item: Any) -> str:
+        """
+        > It serializes one item of the sequence
+
+        Args:
+            item (Any): An item of the output.
+
+        Returns:
+            The serialized text.
+        """
+        if self.file_format == "jsonl":
+            return json.dumps(item, ensure_ascii=False) + "\n"
+        return yaml.dump([item], Dumper=SafeDumper, allow_unicode=True)
+
+    def _write_text(self, text: str) -> None:
+        """
+        It appends text to the file and to the content hash
+        """
+        self._file.write(text)
+        self._hash.update(text.encode("utf-8"))
+
+    def _emit(self, item: Any) -> None:
+        """
+        It appends one converted item to the file
+        """
+        self._write_text(self._dump(item))
+        self.count += 1
+
+        if self.count % self.flush_every == 0:
+            self._file.flush()
+
+    def write(self, output: Any) -> None:
+        """
+        It converts one output and appends it to the file, or keeps it for the
+        stages run at `close`
+
+        Args:
+            output (Any): An output of the collector.
+        """
+        with self.metrics.timer("save"):
+            items: List[Any] = self.fn([output])
+
+            if self.tail is not None:
+                self._pending.extend(items)
+                return
+            for item in items:
+                self._emit(item)
+
+    def close(self) -> None:
+        """
+        It makes the file durable and moves it to its final name
+        """
+        with self.metrics.timer("save"):
+            if self.tail is not None:
+                for item in self.tail(self._pending):
+                    self._emit(item)
+                self._pending = []
+
+            if (self.count == 0) and (self.file_format == "yaml"):
+                self._write_text(yaml.dump([], Dumper=SafeDumper, allow_unicode=True))
+
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(f"{self.filename}.part", self.filename)
+
+            if self.manifest is not None:
+                self.manifest.record(self.filename, self._hash.hexdigest())
+
+
+class StreamingDataSaver(SimpleDataSaver):
+    streaming: bool = True
+
+    def __init__(
+        self,
+        savedir: str,
+        fn: Callable[..., Any],
+        file_format: str = "yaml",
+        flush_every: int = 100,
+        metrics: Optional[CrawlMetrics] = None,
+        manifest: Optional[PageManifest] = None,
+    ):
+        """
+        It saves the outputs while they are collected instead of buffering
+        them, so the memory does not grow with the size of the crawl.
 
-    def _is_valid_data(data: str):
+        Args:
+            savedir (str): The directory to save the file to.
+            fn (Callable[..., Any]): The converter applied to each output.
+            file_format (str): "yaml" or "jsonl". With "jsonl", the extension
+                of the filename is replaced by ".jsonl". Defaults to "yaml"
+            flush_every (int): The number of items between flushes.
+                Defaults to 100
+            metrics (Optional[CrawlMetrics]): The metrics to which the time of
+                the writes is recorded as "save".
+            manifest (Optional[PageManifest]): The manifest of the written
+                files. It is saved when the saver is closed.
+        """
+        super().__init__(savedir=savedir, fn=fn, metrics=metrics, manifest=manifest)
+        self.file_format: str = file_format
+        self.flush_every: int = flush_every
+
+    def get_filename(self, filename: str) -> str:
+        """
+        > It returns the path of the file, with the extension of the format
+
+        Args:
+            filename (str): the name of the file to be saved
+
+        Returns:
+            The filename is being returned.
         """
-        > It returns `True` if the last part of the string is a number, and
-        `False` otherwise
+        if self.file_format == "jsonl":
+            filename = os.path.splitext(filename)[0] + ".jsonl"
+        return super().get_filename(filename)
+
+    def open(self, filename: str) -> OutputStream:
+        """
+        > It opens a stream to which the outputs of one file are written
 
         Args:
-            data (str): The data to be validated.
+            filename (str): the name of the file to be saved
 
         Returns:
-            a boolean value.
+            The output stream.
         """
-        return data.split("/")[-1].isdigit()
+        return OutputStream(
+            self.get_filename(filename),
+            fn=self.fn,
+            file_format=self.file_format,
+            flush_every=self.flush_every,
+            metrics=self.metrics,
+            manifest=self.manifest,
+        )
+
+
+def test():
+    """
+    > The function `test()` saves the same outputs through a converter pipeline
+    > with `SimpleDataSaver` and `StreamingDataSaver`, and checks the files and
+    > the manifest of the streamed ones.
+    """
+    import tempfile
+
+    from data.manifest import hash_file
+
+    outputs: List[str] = ["漢字/2", "人間/1", "漢字/2", "x", "大人/3"]
+    pipeline: ConverterPipeline = ConverterPipeline.from_config(
+        [{"filter": r"/\d+$"}, "dedupe", "sort", {"map": "/.*"}]
+    )
+    expected: List[str] = ["人間", "大人", "漢字"]
+    test_res: List[bool] = []
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        saver: SimpleDataSaver = SimpleDataSaver(savedir=tmp_dir, fn=pipeline)
+        saver(outputs, filename="simple.yml")
+
+        manifest_file: str = os.path.join(tmp_dir, "manifest.json")
+        for file_format in ("yaml", "jsonl"):
+            streaming_saver: StreamingDataSaver = StreamingDataSaver(
+                savedir=tmp_dir,
+                fn=pipeline,
+                file_format=file_format,
+                manifest=PageManifest(manifest_file),
+            )
+            stream: OutputStream = streaming_saver.open(f"stream_{file_format}.yml")
+            for output in outputs:
+                stream.write(output)
+            stream.close()
+            streaming_saver.close()
+
+        # the hashes of the streamed files are recorded as they are closed
+        manifest: PageManifest = PageManifest(manifest_file)
+        test_res.append(
+            {filename: entry.digest for filename, entry in manifest.entries.items()}
+            == {
+                filename: hash_file(os.path.join(tmp_dir, filename))
+                for filename in ("stream_yaml.yml", "stream_jsonl.jsonl")
+            }
+        )
+
+        with open(os.path.join(tmp_dir, "simple.yml"), "r", encoding="utf-8") as f:
+            simple: List[str] = yaml.safe_load(f)
+        with open(os.path.join(tmp_dir, "stream_yaml.yml"), "rb") as f:
+            streamed: bytes = f.read()
+        with open(
+            os.path.join(tmp_dir, "stream_jsonl.jsonl"), "r", encoding="utf-8"
+        ) as f:
+            lines: List[str] = [json.loads(line) for line in f]
+        with open(os.path.join(tmp_dir, "simple.yml"), "rb") as f:
+            test_res.append(f.read() == streamed)
+
+        test_res.append(simple == expected)
+        test_res.append(lines == expected)
+
+        # the per-item stages are streamed without keeping the outputs
+        head_stream: OutputStream = OutputStream(
+            os.path.join(tmp_dir, "head.yml"),
+            fn=ConverterPipeline.from_config([{"filter": r"/\d+$"}]),
+        )
+        head_stream.write("漢字/2")
+        test_res.append((head_stream.tail is None) and (head_stream.count == 1))
+        head_stream.close()
+
+    if not all(test_res):
+        raise AssertionError(f"all of test must be True. But {test_res}")
 
-    _out: List[str] = []
+    print("Test has be run successfully.")
 
-    for out in output:
-        if _is_valid_data(out):
-            _out.append(out)
 
-    return _out
+if __name__ == "__main__":
+    test()
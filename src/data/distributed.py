@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+PENDING: str = "pending"
+LEASED: str = "leased"
+DONE: str = "done"
+FAILED: str = "failed"
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class Task(NamedTuple):
+    task_id: int
+    filename: str
+    inputs: Dict[str, Any]
+    attempts: int
+
+
+class TaskQueue:
+    def __init__(
+        self, path: str, lease_time: float = 300.0, max_attempts: int = 3
+    ) -> None:
+        """
+        A work queue of the pages kept in a SQLite file. A task is leased to
+        one worker for `lease_time` seconds, and a worker renews the lease while
+        it is working. A task whose lease has expired, because its worker died,
+        is issued again to another worker, which counts as a failed attempt.
+        The queue is finished only once the coordinator has sealed it, so the
+        workers started before the tasks are added wait for them.
+
+        SQLite locks the whole file on writes, so the queue can be shared by
+        the worker processes of one machine, or of many machines through a
+        file system with working locks.
+
+        Args:
+            path (str): The path of the queue file.
+            lease_time (float): The seconds a task is leased for.
+                Defaults to 300
+            max_attempts (int): The number of failures after which a task is
+                given up. Defaults to 3
+        """
+        self.path: str = path
+        self.lease_time: float = lease_time
+        self.max_attempts: int = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        self._lock: threading.Lock = threading.Lock()
+        self.db: sqlite3.Connection = sqlite3.connect(
+            path, timeout=60.0, isolation_level=None, check_same_thread=False
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "id INTEGER PRIMARY KEY, filename TEXT UNIQUE NOT NULL, "
+            "inputs TEXT NOT NULL, state TEXT NOT NULL, worker TEXT, "
+            "lease_until REAL, attempts INTEGER NOT NULL DEFAULT 0, error TEXT)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+
+    def _transaction(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """
+        > It runs `fn` in a transaction holding the write lock of the file, so
+        that no two workers lease the same task
+
+        Args:
+            fn (Callable[[sqlite3.Connection], Any]): The function of the
+                transaction.
+
+        Returns:
+            The return value of `fn`.
+        """
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                result: Any = fn(self.db)
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+            self.db.execute("COMMIT")
+        return result
+
+    def add_tasks(self, pages: List[Tuple[Dict[str, Any], str]]) -> int:
+        """
+        It adds the pages which are not in the queue yet
+
+        Args:
+            pages (List[Tuple[Dict[str, Any], str]]): Pairs of inputs and
+                filename. The filename identifies the task.
+
+        Returns:
+            The number of the tasks added.
+        """
+
+        def _add(db: sqlite3.Connection) -> int:
+            before: int = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO tasks (filename, inputs, state) "
+                "VALUES (?, ?, ?)",
+                [
+                    (filename, json.dumps(inputs, ensure_ascii=False), PENDING)
+                    for inputs, filename in pages
+                ],
+            )
+            return db.total_changes - before
+
+        return self._transaction(_add)
+
+    def seal(self, sealed: bool = True) -> None:
+        """
+        It marks that every task has been added, so that the workers exit once
+        the queue is empty. The coordinator unseals the queue before adding
+        the tasks of a new crawl.
+
+        Args:
+            sealed (bool): Whether the queue is sealed. Defaults to True
+        """
+        self._transaction(
+            lambda db: db.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('sealed', ?)",
+                (str(int(sealed)),),
+            )
+        )
+
+    def is_sealed(self) -> bool:
+        """
+        > It returns `True` if the coordinator has added every task
+        """
+        with self._lock:
+            row: Optional[Tuple[str]] = self.db.execute(
+                "SELECT value FROM meta WHERE key = 'sealed'"
+            ).fetchone()
+        return (row is not None) and (row[0] == "1")
+
+    def lease(self, worker: str) -> Optional[Task]:
+        """
+        > It leases the oldest pending task, or a task whose lease has expired.
+        An expired lease counts as an attempt, so a task which kills its
+        workers is given up after `max_attempts` leases.
+
+        Args:
+            worker (str): The id of the worker.
+
+        Returns:
+            The task, or None if no task can be leased now.
+        """
+
+        def _lease(db: sqlite3.Connection) -> Optional[Task]:
+            now: float = time.time()
+
+            while True:
+                row: Optional[Tuple[Any, ...]] = db.execute(
+                    "SELECT id, filename, inputs, attempts, state FROM tasks "
+                    "WHERE state = ? OR (state = ? AND lease_until < ?) "
+                    "ORDER BY id LIMIT 1",
+                    (PENDING, LEASED, now),
+                ).fetchone()
+                if row is None:
+                    return None
+
+                task_id, filename, inputs, attempts, state = row
+                if state == LEASED:
+                    attempts += 1
+                if attempts < self.max_attempts:
+                    break
+
+                db.execute(
+                    "UPDATE tasks SET state = ?, lease_until = NULL, attempts = ?, "
+                    "error = ? WHERE id = ?",
+                    (FAILED, attempts, "lease expired", task_id),
+                )
+
+            db.execute(
+                "UPDATE tasks SET state = ?, worker = ?, lease_until = ?, "
+                "attempts = ? WHERE id = ?",
+                (LEASED, worker, now + self.lease_time, attempts, task_id),
+            )
+            return Task(task_id, filename, json.loads(inputs), attempts)
+
+        return self._transaction(_lease)
+
+    def renew(self, task: Task, worker: str) -> bool:
+        """
+        > It extends the lease of a task
+
+        Args:
+            task (Task): The leased task.
+            worker (str): The id of the worker.
+
+        Returns:
+            `False` if the task has been issued to another worker.
+        """
+
+        def _renew(db: sqlite3.Connection) -> bool:
+            cursor: sqlite3.Cursor = db.execute(
+                "UPDATE tasks SET lease_until = ? "
+                "WHERE id = ? AND state = ? AND worker = ?",
+                (time.time() + self.lease_time, task.task_id, LEASED, worker),
+            )
+            return cursor.rowcount > 0
+
+        return self._transaction(_renew)
+
+    def complete(self, task: Task, worker: str) -> None:
+        """
+        It marks a task as done. A task is done once, even if its lease had
+        expired and another worker has done it too.
+
+        Args:
+            task (Task): The leased task.
+            worker (str): The id of the worker.
+        """
+        self._transaction(
+            lambda db: db.execute(
+                "UPDATE tasks SET state = ?, worker = ?, lease_until = NULL "
+                "WHERE id = ?",
+                (DONE, worker, task.task_id),
+            )
+        )
+
+    def fail(self, task: Task, worker: str, error: str) -> None:
+        """
+        It returns a failed task to the queue, or gives it up after
+        `max_attempts` failures. Nothing is changed if the lease has been
+        issued to another worker in the meantime.
+
+        Args:
+            task (Task): The leased task.
+            worker (str): The id of the worker.
+            error (str): The description of the error.
+        """
+        attempts: int = task.attempts + 1
+        state: str = FAILED if attempts >= self.max_attempts else PENDING
+        self._transaction(
+            lambda db: db.execute(
+                "UPDATE tasks SET state = ?, worker = ?, lease_until = NULL, "
+                "attempts = ?, error = ? WHERE id = ? AND state = ? AND worker = ?",
+                (state, worker, attempts, error, task.task_id, LEASED, worker),
+            )
+        )
+
+    def counts(self) -> Dict[str, int]:
+        """
+        > It returns the number of the tasks in each state
+
+        Returns:
+            The numbers of the pending, leased, done and failed tasks.
+        """
+        with self._lock:
+            rows: List[Tuple[str, int]] = self.db.execute(
+                "SELECT state, COUNT(*) FROM tasks GROUP BY state"
+            ).fetchall()
+
+        counts: Dict[str, int] = {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update(rows)
+        return counts
+
+    def is_finished(self) -> bool:
+        """
+        > It returns `True` if the queue is sealed and every task is done or
+        given up
+        """
+        counts: Dict[str, int] = self.counts()
+        return (counts[PENDING] + counts[LEASED] == 0) and self.is_sealed()
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def get_worker_id() -> str:
+    """
+    > It returns an id of this process unique in a cluster
+
+    Returns:
+        The host name and the process id.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class _Heartbeat(threading.Thread):
+    def __init__(self, queue: TaskQueue, task: Task, worker: str) -> None:
+        """
+        It renews the lease of a task every third of the lease time until it
+        is stopped.
+
+        Args:
+            queue (TaskQueue): The queue of the task.
+            task (Task): The leased task.
+            worker (str): The id of the worker.
+        """
+        super().__init__(daemon=True)
+        self.queue: TaskQueue = queue
+        self.task: Task = task
+        self.worker: str = worker
+        self.stopped: threading.Event = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.queue.lease_time / 3):
+            if not self.queue.renew(self.task, self.worker):
+                return
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.join()
+
+
+def run_worker(
+    queue: TaskQueue,
+    collect_fn: Callable[[Dict[str, Any], str], None],
+    worker: Optional[str] = None,
+    poll_interval: float = 5.0,
+    exit_when_finished: bool = True,
+) -> int:
+    """
+    It leases the tasks one by one and runs `collect_fn` on each of them,
+    until the queue is finished. A worker started before the coordinator has
+    sealed the queue polls until the tasks are added.
+
+    Args:
+        queue (TaskQueue): The queue of the tasks.
+        collect_fn (Callable[[Dict[str, Any], str], None]): The function which
+            collects a page from its inputs and filename.
+        worker (Optional[str]): The id of the worker. If None, it is made from
+            the host name and the process id.
+        poll_interval (float): The seconds to wait when no task can be leased.
+            Defaults to 5
+        exit_when_finished (bool): If False, it keeps polling for new tasks.
+            Defaults to True
+
+    Returns:
+        The number of the tasks done by this worker.
+    """
+    worker = worker or get_worker_id()
+    num_done: int = 0
+
+    while True:
+        task: Optional[Task] = queue.lease(worker)
+
+        if task is None:
+            if exit_when_finished and queue.is_finished():
+                return num_done
+            time.sleep(poll_interval)
+            continue
+
+        heartbeat: _Heartbeat = _Heartbeat(queue, task, worker)
+        heartbeat.start()
+        try:
+            collect_fn(task.inputs, task.filename)
+        except Exception as e:
+            heartbeat.stop()
+            queue.fail(task, worker, repr(e))
+            logger.warning(f"{worker} failed {task.filename}: {e!r}")
+            continue
+
+        heartbeat.stop()
+        queue.complete(task, worker)
+        num_done += 1
+
+
+def wait_for_tasks(queue: TaskQueue, poll_interval: float = 5.0) -> Dict[str, int]:
+    """
+    It waits until every task of the queue is done or given up, and prints the
+    progress on the way
+
+    Args:
+        queue (TaskQueue): The queue of the tasks.
+        poll_interval (float): The seconds between the checks. Defaults to 5
+
+    Returns:
+        The number of the tasks in each state.
+    """
+    while True:
+        counts: Dict[str, int] = queue.counts()
+        logger.info(", ".join(f"{state}: {count}" for state, count in counts.items()))
+
+        if counts[PENDING] + counts[LEASED] == 0:
+            return counts
+        time.sleep(poll_interval)
+
+
+def test():
+    """
+    > The function `test()` runs the leases of a queue in a temporary SQLite
+    > file: the seal, an expired lease, a stale worker and the attempts.
+    """
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        queue: TaskQueue = TaskQueue(
+            os.path.join(tmp_dir, "tasks.sqlite"), lease_time=0.05, max_attempts=2
+        )
+        # an empty queue is not finished until the coordinator seals it
+        test_res: List[bool] = [not queue.is_finished()]
+        test_res.append(
+            queue.add_tasks([({"url": "a"}, "a.yml"), ({"url": "b"}, "b.yml")]) == 2
+        )
+        queue.seal()
+
+        task: Optional[Task] = queue.lease("w1")
+        test_res.append((task.filename == "a.yml") and (task.attempts == 0))
+
+        # the lease of w1 expires and is counted as an attempt of w2
+        time.sleep(0.1)
+        task_2: Optional[Task] = queue.lease("w2")
+        test_res.append((task_2.task_id == task.task_id) and (task_2.attempts == 1))
+        test_res.append(not queue.renew(task, "w1"))
+
+        # the stale worker cannot give back the lease of w2
+        queue.fail(task, "w1", "stale")
+        test_res.append(queue.counts()[LEASED] == 1)
+
+        # the second expiry reaches max_attempts, so b is leased instead
+        time.sleep(0.1)
+        task_3: Optional[Task] = queue.lease("w3")
+        test_res.append(task_3.filename == "b.yml")
+        test_res.append(queue.counts()[FAILED] == 1)
+
+        queue.complete(task_3, "w3")
+        test_res.append(queue.lease("w3") is None)
+        test_res.append(queue.counts() == {PENDING: 0, LEASED: 0, DONE: 1, FAILED: 1})
+        test_res.append(queue.is_finished())
+
+        queue.seal(False)
+        test_res.append(not queue.is_finished())
+        queue.close()
+
+    if not all(test_res):
+        raise AssertionError(f"all of test must be True. But {test_res}")
+
+    print("Test has be run successfully.")
+
+
+if __name__ == "__main__":
+    test()
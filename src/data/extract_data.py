@@ -1,19 +1,8 @@
 # -*- coding: utf-8 -*-
-from typing import Any, List
+import re
+from typing import Any, List, Pattern
 
-
-def _has_num_at_last(data: str):
-    """
-    It takes a string, splits it on the forward slash, and checks if the last
-    element is a number
-
-    Args:
-        data (str): The data to be processed.
-
-    Returns:
-        The last part of the string is being returned.
-    """
-    return data.split("/")[-1].isdigit()
+NUM_AT_LAST: Pattern = re.compile(r"(?:^|/)\d+\Z")
 
 
 def identity_fn(output: Any) -> Any:
@@ -40,10 +29,6 @@ def sieve_fn(output: List[str]) -> List[str]:
     Args:
         output (List[str]): List[str] -> The output of the previous function.
     """
-    _out: List[str] = []
-
-    for out in output:
-        if _has_num_at_last(out):
-            _out.append(out)
-
-    return _out
+    # the pattern tests that the last part of the path is a number, without a
+    # Python call per output
+    return list(filter(NUM_AT_LAST.search, output))
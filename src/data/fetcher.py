@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import os
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+src_dir, *res = os.getcwd().split("/src")
+
+if len(res) > 0:
+    import sys
+
+    sys.path.append(src_dir + "/src")
+
+try:
+    from data.metrics import CrawlMetrics
+except ImportError:
+    raise
+
+# anything called with a URL which returns its HTML text, such as a
+# `SessionFetcher` or a `CachedFetcher` of data/response_cache.py
+Fetcher = Callable[[str], str]
+
+
+class SessionFetcher:
+    def __init__(
+        self,
+        pool_size: int = 10,
+        timeout: Tuple[float, float] = (5.0, 30.0),
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        status_forcelist: Sequence[int] = (500, 502, 503, 504),
+        headers: Optional[Dict[str, str]] = None,
+        metrics: Optional[CrawlMetrics] = None,
+    ) -> None:
+        """
+        It keeps one `requests.Session` whose connections are reused across
+        pages, and retries failed requests with an exponential backoff.
+
+        Args:
+            pool_size (int): The number of keep-alive connections per host.
+                Defaults to 10
+            timeout (Tuple[float, float]): The connect and read timeouts in
+                seconds. Defaults to (5.0, 30.0)
+            retries (int): The number of retries on connection errors and on
+                `status_forcelist`. Defaults to 3
+            backoff_factor (float): The backoff factor between retries.
+                Defaults to 0.5
+            status_forcelist (Sequence[int]): The status codes to be retried.
+                Defaults to (500, 502, 503, 504)
+            headers (Optional[Dict[str, str]]): Extra headers of every request.
+            metrics (Optional[CrawlMetrics]): The metrics to which the requests,
+                bytes and retries are counted.
+        """
+        self.timeout: Tuple[float, float] = timeout
+        self.metrics: CrawlMetrics = metrics or CrawlMetrics()
+        self.retry: Retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=status_forcelist,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            raise_on_status=False,
+        )
+        self.adapter: HTTPAdapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size, max_retries=self.retry
+        )
+
+        self.session: requests.Session = requests.Session()
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        # gzip and deflate are always decoded, br only when brotli is installed
+        self.session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        self.session.headers.update(headers or {})
+
+    def fetch(
+        self, url: str, headers: Optional[Dict[str, str]] = None
+    ) -> requests.Response:
+        """
+        > It sends a GET request through the pooled session
+
+        Args:
+            url (str): The URL to be requested.
+            headers (Optional[Dict[str, str]]): Extra headers of this request.
+
+        Returns:
+            The response of the last attempt.
+        """
+        res: requests.Response = self.session.get(
+            url, headers=headers, timeout=self.timeout
+        )
+
+        self.metrics.incr("requests")
+        self.metrics.incr("bytes", len(res.content))
+        retries: Optional[Retry] = getattr(res.raw, "retries", None)
+        if (retries is not None) and (len(retries.history) > 0):
+            self.metrics.incr("retries", len(retries.history))
+        return res
+
+    def add_response_hook(self, hook: Callable[..., Any]) -> None:
+        """
+        It calls `hook` with every response received by the session
+
+        Args:
+            hook (Callable[..., Any]): A response hook of `requests`.
+        """
+        self.session.hooks["response"].append(hook)
+
+    def exclude_retry_statuses(self, statuses: Iterable[int]) -> None:
+        """
+        It stops retrying `statuses` and waiting for Retry-After in the
+        session, so that a scheduler sees every throttled response and paces
+        its retries alone, instead of both retrying on top of each other
+
+        Args:
+            statuses (Iterable[int]): The status codes not to be retried.
+        """
+        excluded: frozenset = frozenset(statuses)
+        self.retry = self.retry.new(
+            status_forcelist=[
+                status
+                for status in self.retry.status_forcelist or ()
+                if status not in excluded
+            ],
+            respect_retry_after_header=False,
+        )
+        self.adapter.max_retries = self.retry
+
+    def __call__(self, url: str) -> str:
+        """
+        > It returns the decoded HTML text of `url`
+
+        Args:
+            url (str): The URL to be requested.
+
+        Returns:
+            The HTML text.
+        """
+        return self.fetch(url).text
+
+    def close(self) -> None:
+        """
+        It closes all the pooled connections
+        """
+        self.session.close()
+
+    def __enter__(self) -> "SessionFetcher":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+import heapq
+import itertools
+from collections import deque
+from typing import Callable, Deque, Iterable, List, NamedTuple, Optional
+
+
+class WorkItem(NamedTuple):
+    url: str
+    depth: int
+    output: Optional[str] = None
+
+
+class Frontier:
+    def __init__(
+        self,
+        order: str = "dfs",
+        max_size: Optional[int] = None,
+        priority_fn: Optional[Callable[[WorkItem], float]] = None,
+    ) -> None:
+        """
+        The work items waiting to be visited. With "dfs", items pushed
+        together are popped in the order they were pushed, so a traversal
+        visits the pages in the same pre-order as `dig_recursively`.
+
+        While the frontier holds `max_size` items or more, the most recently
+        pushed item is popped first whatever the order is. It drains the
+        deepest items, which push few or no children, so the frontier does not
+        grow much beyond `max_size`.
+
+        Args:
+            order (str): "dfs", "bfs" or "priority". Defaults to "dfs"
+            max_size (Optional[int]): The soft limit of the items.
+            priority_fn (Optional[Callable[[WorkItem], float]]): The key of the
+                "priority" order. The smallest one is popped first.
+        """
+        if order not in ("dfs", "bfs", "priority"):
+            raise ValueError(f"order; {order} must be dfs, bfs or priority.")
+        if (order == "priority") and (priority_fn is None):
+            raise ValueError("priority_fn must be set for the priority order.")
+
+        self.order: str = order
+        self.max_size: Optional[int] = max_size
+        self.priority_fn: Optional[Callable[[WorkItem], float]] = priority_fn
+        self._items: Deque[list] = deque()
+        self._heap: List[list] = []
+        self._counter: Iterable[int] = itertools.count()
+        self._size: int = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def full(self) -> bool:
+        """
+        > It returns `True` if the frontier holds `max_size` items or more
+        """
+        return (self.max_size is not None) and (self._size >= self.max_size)
+
+    def push_many(self, items: List[WorkItem]) -> None:
+        """
+        It pushes the children of a page, in document order
+
+        Args:
+            items (List[WorkItem]): The items to be visited.
+        """
+        # each entry is [key, sequence, item]; a popped entry gets None as item
+        entries: List[list] = []
+        for item in items:
+            key: float = 0.0
+            if self.priority_fn is not None:
+                key = self.priority_fn(item)
+            entries.append([key, next(self._counter), item])
+
+        if self.order == "dfs":
+            entries.reverse()
+        for entry in entries:
+            self._items.append(entry)
+            if self.order == "priority":
+                heapq.heappush(self._heap, entry)
+        self._size += len(entries)
+
+    def push(self, item: WorkItem) -> None:
+        """
+        It pushes one item
+
+        Args:
+            item (WorkItem): The item to be visited.
+        """
+        self.push_many([item])
+
+    def pop(self) -> WorkItem:
+        """
+        > It pops the next item to be visited
+
+        Returns:
+            The work item.
+        """
+        if self._size == 0:
+            raise IndexError("pop from an empty frontier")
+
+        while True:
+            if (self.order == "dfs") or self.full:
+                entry: list = self._items.pop()
+            elif self.order == "bfs":
+                entry = self._items.popleft()
+            else:
+                entry = heapq.heappop(self._heap)
+
+            if entry[2] is not None:
+                break
+
+        item: WorkItem = entry[2]
+        entry[2] = None
+        self._size -= 1
+        self._compact()
+        return item
+
+    def _compact(self) -> None:
+        """
+        It drops the popped entries left at both ends of the lazy containers.
+        Every live item is in both of them with "priority", so the popped
+        entries in the middle are their lengths beyond `_size`, and a container
+        is rebuilt once they are more than half of it.
+        """
+        while (len(self._items) > 0) and (self._items[-1][2] is None):
+            self._items.pop()
+        while (len(self._items) > 0) and (self._items[0][2] is None):
+            self._items.popleft()
+        while (len(self._heap) > 0) and (self._heap[0][2] is None):
+            heapq.heappop(self._heap)
+
+        if len(self._items) > 2 * self._size:
+            self._items = deque(entry for entry in self._items if entry[2] is not None)
+        if len(self._heap) > 2 * self._size:
+            self._heap = [entry for entry in self._heap if entry[2] is not None]
+            heapq.heapify(self._heap)
+
+
+def test():
+    """
+    > The function `test()` checks the orders of the frontier, and that the
+    > popped entries do not pile up with "priority".
+    """
+    items: List[WorkItem] = [WorkItem(str(i), 1) for i in range(5)]
+    test_res: List[bool] = []
+
+    for order, expected in (("dfs", "01234"), ("bfs", "01234")):
+        frontier: Frontier = Frontier(order=order)
+        frontier.push_many(items)
+        test_res.append("".join(frontier.pop().url for _ in items) == expected)
+
+    frontier = Frontier(order="priority", priority_fn=lambda item: -int(item.url))
+    frontier.push_many(items)
+    test_res.append("".join(frontier.pop().url for _ in items) == "43210")
+
+    # push two and pop one 20000 times, the last of them by the LIFO fallback
+    frontier = Frontier(
+        order="priority", max_size=19990, priority_fn=lambda item: item.depth
+    )
+    for i in range(20000):
+        frontier.push_many([WorkItem(str(i), i % 97), WorkItem(str(i), (i * 7) % 89)])
+        frontier.pop()
+    test_res.append(len(frontier) == 20000)
+    test_res.append(len(frontier._items) <= 2 * len(frontier) + 2)
+    test_res.append(len(frontier._heap) <= 2 * len(frontier) + 2)
+
+    num_fallback: int = len(frontier) - frontier.max_size + 1
+    rest: List[int] = [frontier.pop().depth for _ in range(20000)]
+    test_res.append(rest[num_fallback:] == sorted(rest[num_fallback:]))
+    test_res.append((len(frontier._items) == 0) and (len(frontier._heap) == 0))
+
+    if not all(test_res):
+        raise AssertionError(f"all of test must be True. But {test_res}")
+
+    print("Test has be run successfully.")
+
+
+if __name__ == "__main__":
+    test()
@@ -1,44 +1,88 @@
 # -*- coding: utf-8 -*-
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional
 
 
 class BasicTree:
+    __slots__ = ("name", "children", "parent", "index")
+
     def __init__(self, name: Optional[str] = None):
         """
         > The `__init__` function is called when a new instance of the class is created
 
+        All the nodes of a tree share one index from the names to the nodes,
+        which `set_child` and `set_parent` keep up to date, so a node is looked
+        up without a search. If a name is given to many nodes, the first one
+        linked to the tree is indexed.
+
         Args:
             name (Optional[str]): The name of the node.
         """
         self.name: Optional[str] = name
         self.children: List["BasicTree"] = []
         self.parent: Optional["BasicTree"] = None
+        self.index: Dict[str, "BasicTree"] = {} if name is None else {name: self}
 
     def set_parent(self, parent: "BasicTree") -> None:
         """
         "Set the parent of this node to the given node."
 
-        The first line is a docstring. It's a string that describes what the
-        function does. It's good practice to include docstrings in your
-        functions
+        The node is added to the children of `parent`, and moved out of the
+        children of its former parent.
 
         Args:
             parent ("BasicTree"): The parent of the node.
         """
-        self.parent = parent
+        parent.set_child(self)
 
     def set_child(self, child: "BasicTree") -> None:
         """
         "Add a child to the list of children."
 
-        The first line is a comment. It's not necessary, but it's good practice
-        to include a comment at the top of each function that describes what the
-        function does
+        The parent of the child is set to this node, and the names of its
+        subtree are added to the index of this tree. It takes the time of the
+        size of the subtree, which is one for a new leaf.
 
         Args:
             child ("BasicTree"): The child node to be added to the current node.
         """
+        # only a node with children can be an ancestor, so a new leaf is linked
+        # without walking up the tree
+        if (child is self) or (
+            (child.num_children > 0) and any(node is child for node in self.ancestors())
+        ):
+            raise ValueError(f"child; {child.name} is an ancestor of {self.name}.")
+        if child.parent is not None:
+            child._detach()
+
         self.children.append(child)
+        child.parent = self
+
+        if child.index is not self.index:
+            index: Dict[str, "BasicTree"] = self.index
+            nodes: Iterator[BasicTree] = (
+                iter((child,)) if child.num_children == 0 else child.iter_subtree()
+            )
+            for node in nodes:
+                node.index = index
+                if node.name is not None:
+                    index.setdefault(node.name, node)
+
+    def _detach(self) -> None:
+        """
+        It moves this node out of the children of its parent, and its subtree
+        into an index of its own
+        """
+        self.parent.children.remove(self)
+        self.parent = None
+
+        old_index: Dict[str, "BasicTree"] = self.index
+        index: Dict[str, "BasicTree"] = {}
+        for node in self.iter_subtree():
+            node.index = index
+            if node.name is not None:
+                if old_index.get(node.name) is node:
+                    del old_index[node.name]
+                index.setdefault(node.name, node)
 
     @property
     def num_children(self) -> int:
@@ -54,11 +98,84 @@ class BasicTree:
         """
         return len(self.children)
 
+    @property
+    def root(self) -> "BasicTree":
+        """
+        > It returns the root of the tree of this node
+        """
+        node: BasicTree = self
+        while node.parent is not None:
+            node = node.parent
+        return node
+
+    def ancestors(self) -> Iterator["BasicTree"]:
+        """
+        > It yields the parent, the grandparent and so on up to the root
+
+        Returns:
+            The ancestors from the nearest one.
+        """
+        node: Optional[BasicTree] = self.parent
+        while node is not None:
+            yield node
+            node = node.parent
+
+    def path(self) -> List[Optional[str]]:
+        """
+        > It returns the names from the root down to this node, e.g. the site,
+        the kana, the page and the jukugo of a crawl
+
+        Returns:
+            The names of the path.
+        """
+        names: List[Optional[str]] = [node.name for node in self.ancestors()]
+        names.reverse()
+        names.append(self.name)
+        return names
+
+    def iter_subtree(self) -> Iterator["BasicTree"]:
+        """
+        > It yields the nodes of the subtree of this node in pre-order, with a
+        stack instead of recursion so the depth is not limited
+
+        Returns:
+            The nodes, starting from this one.
+        """
+        stack: List[BasicTree] = [self]
+        while len(stack) > 0:
+            node: BasicTree = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def find(self, key: str) -> Optional["BasicTree"]:
+        """
+        > It returns the node named `key` in the subtree of this node
+
+        Args:
+            key (str): The name of the node.
+
+        Returns:
+            The node, or None if it is not in the subtree.
+        """
+        node: Optional[BasicTree] = self.index.get(key)
+
+        if node is None:
+            return None
+        if (node is self) or (self.parent is None):
+            return node
+        if any(ancestor is self for ancestor in node.ancestors()):
+            return node
+        # a node of another branch has the name, so the subtree is searched
+        for node in self.iter_subtree():
+            if node.name == key:
+                return node
+        return None
+
     def get_tree(self, key: str) -> "BasicTree":
         """
         If the current node is the node we're looking for, return it. Otherwise,
-        if the current node has children, search through them. If we find the
-        node we're looking for, return it. Otherwise, return an empty tree
+        search the index of the tree for it. If we find the node we're looking
+        for, return it. Otherwise, return an empty tree
 
         Args:
             key (str): The name of the tree you want to find.
@@ -66,16 +183,8 @@ class BasicTree:
         Returns:
             A tree with the name of the node that matches the key.
         """
-        if self.name == key:
-            return self
-
-        elif self.num_children > 0:
-            for child in self.children:
-                val = child.get_tree(key)
-                if val.name is not None:
-                    return val
-
-        return BasicTree()
+        node: Optional[BasicTree] = self.find(key)
+        return node if node is not None else BasicTree()
 
 
 def test():
@@ -109,6 +218,16 @@ def test():
     for alp in "abcdefghi":
         test_res.append(alp == a_tree.get_tree(alp).name)
 
+    test_res.append(a_tree.get_tree("x").name is None)
+    test_res.append(b_tree.find("i") is None)
+    test_res.append(i_tree.path() == list("agh") + ["i"])
+    test_res.append([node.name for node in a_tree.iter_subtree()] == list("abcdefghi"))
+    test_res.append(f_tree.root is a_tree)
+
+    g_tree.set_parent(b_tree)
+    test_res.append(b_tree.find("i") is i_tree)
+    test_res.append(i_tree.path() == list("abghi"))
+
     if not all(test_res):
         raise AssertionError(f"all of test must be True. But {test_res}")
 
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+import glob
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+MANIFEST_FILE: str = "manifest.json"
+
+
+class ManifestEntry(NamedTuple):
+    digest: str
+    size: int
+    mtime_ns: int
+
+
+def new_hash() -> hashlib.blake2b:
+    """
+    > It returns an empty hash of the content of a file, which is updated
+    while the file is written in parts
+    """
+    return hashlib.blake2b(digest_size=16)
+
+
+def hash_bytes(data: bytes) -> str:
+    """
+    > It returns the content hash of the bytes of a file
+    """
+    digest: hashlib.blake2b = new_hash()
+    digest.update(data)
+    return digest.hexdigest()
+
+
+def hash_file(filename: str) -> str:
+    """
+    > It returns the content hash of a file
+
+    Args:
+        filename (str): The file.
+
+    Returns:
+        The hex digest.
+    """
+    with open(filename, "rb") as f:
+        return hash_bytes(f.read())
+
+
+class PageManifest:
+    def __init__(self, path: str, resume: bool = True) -> None:
+        """
+        The content hash of every file written by a saver, keyed by its path
+        relative to the directory of the manifest. The size and modification
+        time of the file are kept with the hash, so a reader can tell by a
+        `stat` whether the entry still describes the file on disk.
+
+        Args:
+            path (str): The manifest file.
+            resume (bool): If True, the existing manifest is loaded and
+                updated. Otherwise, a new manifest is started. Defaults to True
+        """
+        self.path: str = path
+        self.root: str = os.path.dirname(os.path.abspath(path))
+        self.entries: Dict[str, ManifestEntry] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+        if resume and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = {
+                    filename: ManifestEntry(*entry)
+                    for filename, entry in json.load(f).items()
+                }
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def record(self, filename: str, digest: str) -> None:
+        """
+        It records the hash of a file which has just been written
+
+        Args:
+            filename (str): The path of the file.
+            digest (str): The hash of its content.
+        """
+        stat: os.stat_result = os.stat(filename)
+        key: str = os.path.relpath(os.path.abspath(filename), self.root)
+
+        with self._lock:
+            self.entries[key] = ManifestEntry(digest, stat.st_size, stat.st_mtime_ns)
+
+    def get(self, filename: str) -> Optional[ManifestEntry]:
+        return self.entries.get(filename)
+
+    def save(self) -> None:
+        """
+        It writes the manifest to its path atomically
+        """
+        with self._lock:
+            entries: Dict[str, ManifestEntry] = dict(sorted(self.entries.items()))
+
+        tmp_path: str = f"{self.path}.part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def load_manifests(savedir: str) -> Dict[str, ManifestEntry]:
+    """
+    > It merges `manifest.json` and the `manifest.<worker>.json` of the workers
+    under `savedir`
+
+    Args:
+        savedir (str): The directory of the collected data.
+
+    Returns:
+        The entries by relative path. The latest write wins if several
+        manifests have the same file.
+    """
+    entries: Dict[str, ManifestEntry] = {}
+
+    for path in sorted(glob.glob(os.path.join(savedir, "manifest*.json"))):
+        for filename, entry in PageManifest(path).entries.items():
+            if (filename not in entries) or (entry.mtime_ns > entries[filename][2]):
+                entries[filename] = entry
+    return entries
+
+
+def get_hashes(savedir: str, filenames: Iterable[str]) -> Dict[str, str]:
+    """
+    > It returns the content hashes of the files. The hash in the manifests is
+    taken when the size and modification time of the file are unchanged, and
+    the others are hashed from disk, so a file edited by hand or written
+    without a manifest is still detected.
+
+    Args:
+        savedir (str): The directory of the collected data.
+        filenames (Iterable[str]): The paths of the files.
+
+    Returns:
+        The hashes by path relative to `savedir`.
+    """
+    entries: Dict[str, ManifestEntry] = load_manifests(savedir)
+    hashes: Dict[str, str] = {}
+    missing: List[str] = []
+
+    for filename in filenames:
+        key: str = os.path.relpath(filename, savedir)
+        entry: Optional[ManifestEntry] = entries.get(key)
+        stat: os.stat_result = os.stat(filename)
+
+        if (
+            (entry is not None)
+            and (entry.size == stat.st_size)
+            and (entry.mtime_ns == stat.st_mtime_ns)
+        ):
+            hashes[key] = entry.digest
+        else:
+            missing.append(key)
+
+    for key in missing:
+        hashes[key] = hash_file(os.path.join(savedir, key))
+    return hashes
@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+
+class PhaseTimer:
+    def __init__(self, window: int = 1024) -> None:
+        """
+        The durations of one phase. The count, the total and the maximum cover
+        the whole crawl, and the percentiles the last `window` durations.
+
+        Args:
+            window (int): The number of durations kept for the percentiles.
+                Defaults to 1024
+        """
+        self.count: int = 0
+        self.total: float = 0.0
+        self.max: float = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        """
+        It records one duration of the phase
+
+        Args:
+            seconds (float): The duration.
+        """
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.recent.append(seconds)
+
+    def summary(self) -> Dict[str, float]:
+        """
+        > It returns the statistics of the phase in seconds
+
+        Returns:
+            The count, total, mean, max, p50, p95 and p99.
+        """
+        recent: List[float] = sorted(self.recent)
+        summary: Dict[str, float] = {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count > 0 else 0.0,
+            "max": self.max,
+        }
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            summary[name] = recent[int(q * (len(recent) - 1))] if recent else 0.0
+        return summary
+
+
+class CrawlMetrics:
+    def __init__(self, window: int = 1024) -> None:
+        """
+        The counters, gauges and phase timers of a crawl. It may be shared by
+        the collectors, savers and fetchers of all the pages, from any thread.
+
+        The phases are "fetch", "sleep", "parse", "select" and "save". The
+        counters include "pages", "outputs", "requests", "bytes", "retries",
+        "cache_hits" and "cache_misses".
+
+        Args:
+            window (int): The number of durations kept per phase for the
+                percentiles. Defaults to 1024
+        """
+        self.window: int = window
+        self.started: float = time.monotonic()
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.gauges: Dict[str, float] = {}
+        self.timers: Dict[str, PhaseTimer] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, phase: str) -> Iterator[None]:
+        """
+        It measures the duration of the block as `phase`
+
+        Args:
+            phase (str): The name of the phase.
+        """
+        start: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - start)
+
+    def observe(self, phase: str, seconds: float) -> None:
+        """
+        It records a duration of `phase`
+
+        Args:
+            phase (str): The name of the phase.
+            seconds (float): The duration.
+        """
+        with self._lock:
+            timer: Optional[PhaseTimer] = self.timers.get(phase)
+            if timer is None:
+                timer = self.timers[phase] = PhaseTimer(self.window)
+            timer.observe(seconds)
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """
+        It adds `value` to a counter
+
+        Args:
+            name (str): The name of the counter.
+            value (float): The increment. Defaults to 1
+        """
+        with self._lock:
+            self.counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """
+        It sets the current value of a gauge, such as the depth of a queue.
+        Unlike a counter, the last value wins.
+
+        Args:
+            name (str): The name of the gauge.
+            value (float): The value.
+        """
+        with self._lock:
+            self.gauges[name] = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        > It returns all the metrics and the rates derived from them
+
+        Returns:
+            A JSON serializable dictionary.
+        """
+        with self._lock:
+            elapsed: float = time.monotonic() - self.started
+            counters: Dict[str, float] = dict(self.counters)
+            gauges: Dict[str, float] = dict(self.gauges)
+            timers: Dict[str, Dict[str, float]] = {
+                phase: timer.summary() for phase, timer in self.timers.items()
+            }
+        lookups: float = counters.get("cache_hits", 0) + counters.get("cache_misses", 0)
+
+        return {
+            "elapsed": elapsed,
+            "counters": counters,
+            "gauges": gauges,
+            "timers": timers,
+            "rates": {
+                "pages_per_second": counters.get("pages", 0) / max(elapsed, 1e-9),
+                "bytes_per_second": counters.get("bytes", 0) / max(elapsed, 1e-9),
+                "cache_hit_rate": (
+                    counters.get("cache_hits", 0) / lookups if lookups > 0 else 0.0
+                ),
+            },
+        }
+
+    def progress_line(self) -> str:
+        """
+        > It returns a one line summary of the crawl
+
+        Returns:
+            The progress line.
+        """
+        snapshot: Dict[str, Any] = self.snapshot()
+        counters: Dict[str, float] = snapshot["counters"]
+        rates: Dict[str, float] = snapshot["rates"]
+        line: str = (
+            f"{snapshot['elapsed']:.0f}s pages={counters.get('pages', 0):.0f} "
+            f"({rates['pages_per_second']:.2f}/s) "
+            f"outputs={counters.get('outputs', 0):.0f} "
+            f"MiB={counters.get('bytes', 0) / (1 << 20):.1f} "
+            f"retries={counters.get('retries', 0):.0f} "
+            f"cache_hit={100 * rates['cache_hit_rate']:.0f}%"
+        )
+        for name, value in sorted(snapshot["gauges"].items()):
+            line += f" {name}={value:g}"
+        return line
+
+    def dump(self, filename: str) -> None:
+        """
+        It writes the snapshot to `filename` as JSON atomically
+
+        Args:
+            filename (str): The metrics file.
+        """
+        tmp_filename: str = f"{filename}.part"
+
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_filename, filename)
+
+    def to_prometheus(self, prefix: str = "crawl") -> str:
+        """
+        > It returns the snapshot in the Prometheus text format
+
+        Args:
+            prefix (str): The prefix of the metric names. Defaults to "crawl"
+
+        Returns:
+            The text of the metrics.
+        """
+        snapshot: Dict[str, Any] = self.snapshot()
+        lines: List[str] = [f"{prefix}_elapsed_seconds {snapshot['elapsed']}"]
+
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+
+        lines.append(f"# TYPE {prefix}_phase_seconds summary")
+        for phase, summary in sorted(snapshot["timers"].items()):
+            for name, q in (("p50", "0.5"), ("p95", "0.95"), ("p99", "0.99")):
+                lines.append(
+                    f'{prefix}_phase_seconds{{phase="{phase}",quantile="{q}"}} '
+                    f"{summary[name]}"
+                )
+            lines.append(
+                f'{prefix}_phase_seconds_sum{{phase="{phase}"}} {summary["total"]}'
+            )
+            lines.append(
+                f'{prefix}_phase_seconds_count{{phase="{phase}"}} {summary["count"]}'
+            )
+        return "\n".join(lines) + "\n"
+
+
+class MetricsReporter(threading.Thread):
+    def __init__(
+        self,
+        metrics: CrawlMetrics,
+        interval: float = 10.0,
+        filename: Optional[str] = None,
+    ) -> None:
+        """
+        It logs the progress line and writes the metrics file every `interval`
+        seconds, and once more when it is stopped.
+
+        Args:
+            metrics (CrawlMetrics): The metrics of the crawl.
+            interval (float): The seconds between reports. Defaults to 10
+            filename (Optional[str]): The JSON metrics file. If None, it is not
+                written.
+        """
+        super().__init__(daemon=True)
+        self.metrics: CrawlMetrics = metrics
+        self.interval: float = interval
+        self.filename: Optional[str] = filename
+        self.stopped: threading.Event = threading.Event()
+
+    def report(self) -> None:
+        """
+        It logs the progress line, and writes the metrics file if it is set
+        """
+        logger.info(self.metrics.progress_line())
+
+        if self.filename is not None:
+            self.metrics.dump(self.filename)
+
+    def run(self) -> None:
+        """
+        It reports every `interval` seconds until `stop` is called
+        """
+        while not self.stopped.wait(self.interval):
+            self.report()
+
+    def stop(self) -> None:
+        """
+        It stops the thread and reports once more, so the metrics file has the
+        final values of the crawl
+        """
+        self.stopped.set()
+        self.join()
+        self.report()
+
+
+def serve_metrics(
+    metrics: CrawlMetrics, port: int, host: str = "127.0.0.1"
+) -> ThreadingHTTPServer:
+    """
+    It serves the metrics in the Prometheus text format at `/metrics` from a
+    daemon thread
+
+    Args:
+        metrics (CrawlMetrics): The metrics of the crawl.
+        port (int): The port. If 0, a free port is chosen.
+        host (str): The address to bind. Defaults to "127.0.0.1"
+
+    Returns:
+        The server. `shutdown` stops it.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+
+            body: bytes = metrics.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server: ThreadingHTTPServer = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test():
+    """
+    > The function `test()` records a few metrics, and checks the snapshot, its
+    > rates and percentiles, the Prometheus text, the metrics file, the final
+    > report of `MetricsReporter` and the `/metrics` endpoint.
+    """
+    import tempfile
+    from urllib.error import HTTPError
+    from urllib.request import urlopen
+
+    metrics: CrawlMetrics = CrawlMetrics(window=100)
+    for i in range(1, 201):
+        metrics.observe("fetch", i / 1000)
+    metrics.incr("pages", 4)
+    metrics.incr("bytes", 2048)
+    metrics.incr("cache_hits", 3)
+    metrics.incr("cache_misses")
+    metrics.set_gauge("frontier", 7)
+    metrics.set_gauge("frontier", 5)
+    with metrics.timer("save"):
+        pass
+
+    snapshot: Dict[str, Any] = metrics.snapshot()
+    fetch: Dict[str, float] = snapshot["timers"]["fetch"]
+    elapsed: float = snapshot["elapsed"]
+    test_res: List[bool] = [
+        snapshot["counters"]
+        == {"pages": 4, "bytes": 2048, "cache_hits": 3, "cache_misses": 1},
+        snapshot["gauges"] == {"frontier": 5},
+        (fetch["count"], fetch["max"]) == (200, 0.2),
+        abs(fetch["total"] - 20.1) < 1e-9,
+        abs(fetch["mean"] - 0.1005) < 1e-9,
+        # the percentiles cover the last 100 durations, 0.101 to 0.2
+        (fetch["p50"], fetch["p95"], fetch["p99"]) == (0.15, 0.195, 0.199),
+        snapshot["timers"]["save"]["count"] == 1,
+        snapshot["rates"]["cache_hit_rate"] == 0.75,
+        snapshot["rates"]["pages_per_second"] == 4 / elapsed,
+        snapshot["rates"]["bytes_per_second"] == 2048 / elapsed,
+        CrawlMetrics().snapshot()["rates"]["cache_hit_rate"] == 0.0,
+        "frontier=5" in metrics.progress_line(),
+    ]
+
+    lines: List[str] = metrics.to_prometheus(prefix="test").splitlines()
+    test_res += [
+        lines[0].startswith("test_elapsed_seconds "),
+        "# TYPE test_pages_total counter" in lines,
+        "test_pages_total 4.0" in lines,
+        "# TYPE test_frontier gauge" in lines,
+        "test_frontier 5" in lines,
+        "# TYPE test_phase_seconds summary" in lines,
+        'test_phase_seconds{phase="fetch",quantile="0.5"} 0.15' in lines,
+        'test_phase_seconds{phase="fetch",quantile="0.99"} 0.199' in lines,
+        'test_phase_seconds_count{phase="fetch"} 200' in lines,
+        all(line.startswith("test_") or line.startswith("# TYPE") for line in lines),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename: str = os.path.join(tmp_dir, "metrics.json")
+        metrics.dump(filename)
+        with open(filename, "r", encoding="utf-8") as f:
+            dumped: Dict[str, Any] = json.load(f)
+        test_res += [
+            dumped["counters"] == snapshot["counters"],
+            dumped["timers"]["fetch"]["p95"] == 0.195,
+            not os.path.exists(f"{filename}.part"),
+        ]
+
+        # the reporter is stopped before its first interval, and still writes
+        # the final values
+        os.remove(filename)
+        reporter: MetricsReporter = MetricsReporter(
+            metrics, interval=3600, filename=filename
+        )
+        reporter.start()
+        metrics.incr("pages")
+        reporter.stop()
+        with open(filename, "r", encoding="utf-8") as f:
+            test_res += [
+                json.load(f)["counters"]["pages"] == 5,
+                not reporter.is_alive(),
+            ]
+
+    server: ThreadingHTTPServer = serve_metrics(metrics, 0)
+    base_url: str = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urlopen(f"{base_url}/metrics") as res:
+            test_res += [
+                res.status == 200,
+                res.headers["Content-Type"] == "text/plain; version=0.0.4",
+                "crawl_pages_total 5.0" in res.read().decode("utf-8").splitlines(),
+            ]
+        try:
+            urlopen(f"{base_url}/other")
+            test_res.append(False)
+        except HTTPError as e:
+            test_res.append(e.code == 404)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    if not all(test_res):
+        raise AssertionError(f"all of test must be True. But {test_res}")
+    print("Test has be run successfully.")
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, List, Optional, Tuple
+from urllib.parse import urljoin
+
+src_dir, *res = os.getcwd().split("/src")
+
+if len(res) > 0:
+    import sys
+
+    sys.path.append(src_dir + "/src")
+
+try:
+    from data.parser_backend import AbstractParserBackend, get_backend
+    from data.text_normalizer import TextNormalizer
+except ImportError:
+    raise
+
+
+def parse_outputs(
+    text: str,
+    selector: str,
+    page_url: str,
+    output_style: str,
+    normalizer: TextNormalizer,
+    parser: str = "html.parser",
+) -> List[str]:
+    """
+    It parses the HTML text and returns the output of every element matching
+    `selector`, in the same way as `SimpleDataCollector._get_output`. Only
+    strings are returned, so it can be run in another process.
+
+    Args:
+        text (str): The HTML text of the page.
+        selector (str): The CSS selector to use to extract the elements.
+        page_url (str): The URL of the page, to which the hrefs are resolved.
+        output_style (str): "url" or "word".
+        normalizer (TextNormalizer): The cleanup of the words. The rejected
+            words are left out.
+        parser (str): The name of the parser backend. Defaults to "html.parser"
+
+    Returns:
+        A list of outputs in document order.
+    """
+    backend: AbstractParserBackend = get_backend(parser)
+    document: Any = backend.parse(text)
+    exist_next: bool = selector.endswith("a[href]")
+    elements: List[Any] = backend.select(document, selector)
+
+    if (output_style == "url") or exist_next:
+        return [urljoin(page_url, backend.get_href(element)) for element in elements]
+    elif output_style == "word":
+        words: List[Optional[str]] = normalizer.normalize_all(
+            [backend.get_text(element) for element in elements]
+        )
+        return [word for word in words if word is not None]
+    return [""] * len(elements)
+
+
+class ParsePipeline:
+    def __init__(self, max_workers: Optional[int] = None, queue_size: int = 64):
+        """
+        Fetchers put raw HTML into a bounded queue, and dispatchers hand it to
+        a pool of parser processes. A fetcher waits while the queue is full,
+        so the HTML held in memory is bounded by `queue_size`.
+
+        Args:
+            max_workers (Optional[int]): The number of parser processes.
+                Defaults to the number of CPUs.
+            queue_size (int): The number of pages waiting to be parsed.
+                Defaults to 64
+        """
+        self.max_workers: int = max_workers or os.cpu_count() or 1
+        self.queue_size: int = queue_size
+        self.queue: Optional[asyncio.Queue] = None
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """
+        It starts the parser processes and the dispatchers
+        """
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._tasks = [
+            asyncio.create_task(self._dispatch()) for _ in range(self.max_workers)
+        ]
+
+    async def _dispatch(self) -> None:
+        """
+        It parses the queued pages one by one in the pool
+        """
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+
+        while True:
+            args, future = await self.queue.get()
+            try:
+                outputs: List[str] = await loop.run_in_executor(
+                    self.executor, parse_outputs, *args
+                )
+                if not future.cancelled():
+                    future.set_result(outputs)
+            except Exception as e:
+                if not future.cancelled():
+                    future.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    async def parse(self, *args: Tuple[str]) -> List[str]:
+        """
+        > It queues a page and waits for its outputs
+
+        Args:
+            *args: The arguments of `parse_outputs`.
+
+        Returns:
+            A list of outputs in document order.
+        """
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        await self.queue.put((args, future))
+        return await future
+
+    async def close(self) -> None:
+        """
+        It stops the dispatchers and the parser processes
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    async def __aenter__(self) -> "ParsePipeline":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+from typing import Any, Dict, List, Optional, Type
+
+from bs4 import BeautifulSoup
+
+
+class AbstractParserBackend:
+    name: str = ""
+
+    def __init__(self) -> None:
+        """
+        A parser backend parses HTML text and runs CSS selectors. Selectors are
+        compiled on the first use and kept for the rest of the run.
+        """
+        self._compiled: Dict[str, Any] = {}
+
+    def _compile(self, selector: str) -> Any:
+        """
+        It compiles a selector for this backend
+
+        Args:
+            selector (str): The CSS selector.
+        """
+        raise NotImplementedError
+
+    def compile(self, selector: str) -> Any:
+        """
+        > It returns the compiled selector, compiling it only once
+
+        Args:
+            selector (str): The CSS selector.
+
+        Returns:
+            The compiled selector.
+        """
+        compiled: Optional[Any] = self._compiled.get(selector)
+
+        if compiled is None:
+            compiled = self._compiled[selector] = self._compile(selector)
+        return compiled
+
+    def parse(self, text: str) -> Any:
+        """
+        It parses the HTML text into a document
+
+        Args:
+            text (str): The HTML text.
+        """
+        raise NotImplementedError
+
+    def select(self, document: Any, selector: str) -> List[Any]:
+        """
+        It returns the elements of the document matching `selector`
+
+        Args:
+            document (Any): The document returned by `parse`.
+            selector (str): The CSS selector.
+        """
+        raise NotImplementedError
+
+    def get_href(self, element: Any) -> Optional[str]:
+        """
+        It returns the href attribute of the element
+
+        Args:
+            element (Any): An element returned by `select`.
+        """
+        raise NotImplementedError
+
+    def get_text(self, element: Any) -> str:
+        """
+        It returns the text of the element and its descendants
+
+        Args:
+            element (Any): An element returned by `select`.
+        """
+        raise NotImplementedError
+
+
+class SoupBackend(AbstractParserBackend):
+    def __init__(self, features: str = "html.parser") -> None:
+        """
+        It parses with BeautifulSoup and selects with precompiled soupsieve
+        selectors.
+
+        Args:
+            features (str): The tree builder of BeautifulSoup, such as
+                "html.parser" or "lxml". Defaults to "html.parser"
+        """
+        super().__init__()
+        import soupsieve
+
+        if features == "lxml":
+            import lxml  # noqa: F401  # raises ImportError when not installed
+
+        self.name = features
+        self.features: str = features
+        self._soupsieve = soupsieve
+
+    def _compile(self, selector: str) -> Any:
+        """
+        > It returns the selector compiled by soupsieve
+        """
+        return self._soupsieve.compile(selector)
+
+    def parse(self, text: str) -> BeautifulSoup:
+        """
+        > It returns the soup of the HTML text built by `features`
+        """
+        return BeautifulSoup(text, self.features)
+
+    def select(self, document: BeautifulSoup, selector: str) -> List[Any]:
+        """
+        > It returns the tags of the soup matching `selector` in document order
+        """
+        return self.compile(selector).select(document)
+
+    def get_href(self, element: Any) -> Optional[str]:
+        """
+        > It returns the href attribute of the tag, or None if it has none
+        """
+        return element.get("href")
+
+    def get_text(self, element: Any) -> str:
+        """
+        > It returns the text of the tag and its descendants
+        """
+        return element.text
+
+
+class LexborBackend(AbstractParserBackend):
+    name: str = "lexbor"
+
+    def __init__(self) -> None:
+        """
+        It parses and selects with the lexbor engine of selectolax, which has
+        to be installed separately.
+        """
+        super().__init__()
+        from selectolax.lexbor import LexborHTMLParser
+
+        self._parser_cls = LexborHTMLParser
+
+    def _compile(self, selector: str) -> str:
+        """
+        > It returns the selector as it is, since selectolax takes selectors as
+        strings and caches them by itself
+        """
+        return selector
+
+    def parse(self, text: str) -> Any:
+        """
+        > It returns the `LexborHTMLParser` of the HTML text
+        """
+        return self._parser_cls(text)
+
+    def select(self, document: Any, selector: str) -> List[Any]:
+        """
+        > It returns the nodes of the document matching `selector` in document
+        order
+        """
+        return document.css(self.compile(selector))
+
+    def get_href(self, element: Any) -> Optional[str]:
+        """
+        > It returns the href attribute of the node, or None if it has none
+        """
+        return element.attributes.get("href")
+
+    def get_text(self, element: Any) -> str:
+        """
+        > It returns the text of the node and its descendants
+        """
+        return element.text(deep=True)
+
+
+PARSER_BACKENDS: Dict[str, Type[AbstractParserBackend]] = {
+    "html.parser": SoupBackend,
+    "lxml": SoupBackend,
+    "lexbor": LexborBackend,
+}
+
+_backends: Dict[str, AbstractParserBackend] = {}
+
+
+def get_backend(name: str = "html.parser") -> AbstractParserBackend:
+    """
+    > It returns the backend of `name`, shared in the process so that the
+    selectors are compiled once per run
+
+    Args:
+        name (str): One of "html.parser", "lxml" and "lexbor".
+            Defaults to "html.parser"
+
+    Returns:
+        The parser backend.
+    """
+    if name not in _backends:
+        if name not in PARSER_BACKENDS:
+            raise ValueError(
+                f"parser; {name} must be one of {list(PARSER_BACKENDS.keys())}."
+            )
+
+        backend_cls: Type[AbstractParserBackend] = PARSER_BACKENDS[name]
+        if backend_cls is SoupBackend:
+            _backends[name] = SoupBackend(features=name)
+        else:
+            _backends[name] = backend_cls()
+    return _backends[name]
+
+
+def available_backends() -> List[str]:
+    """
+    > It returns the names of the backends whose libraries are installed
+
+    Returns:
+        A list of names of the backends.
+    """
+    names: List[str] = []
+
+    for name in PARSER_BACKENDS:
+        try:
+            get_backend(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def test():
+    """
+    > The function `test()` parses a page with every installed backend, and
+    > checks that they select the same elements with the same text and href as
+    > html.parser. lexbor is skipped when selectolax is not installed.
+    """
+    text: str = (
+        "<html><body>"
+        '<div class="kana"><a href="/a">あ</a><a href="/i?p=1&amp;q=2">い</a></div>'
+        '<ul><li class="page"><a href="/a/1">1</a></li>'
+        '<li class="page"><a>2</a></li></ul>'
+        '<p class="word">〈<b>亜</b>〉鉛</p>'
+        '<p class="word">&lt;電&gt; 鈴</p>'
+        '<div><p class="word extra">水 <span>力</span></p></div>'
+        "</body></html>"
+    )
+    selectors: List[str] = [
+        "div.kana a[href]",
+        "li.page a",
+        "li.page a[href]",
+        "p.word",
+        "div > p.word",
+        "p.missing",
+    ]
+
+    def _extract(backend: AbstractParserBackend) -> List[List[Any]]:
+        document: Any = backend.parse(text)
+        return [
+            [
+                (backend.get_text(element), backend.get_href(element))
+                for element in backend.select(document, selector)
+            ]
+            for selector in selectors
+        ]
+
+    names: List[str] = available_backends()
+    expected: List[List[Any]] = _extract(get_backend("html.parser"))
+    test_res: List[bool] = [
+        "html.parser" in names,
+        expected[0] == [("あ", "/a"), ("い", "/i?p=1&q=2")],
+        expected[1] == [("1", "/a/1"), ("2", None)],
+        expected[2] == [("1", "/a/1")],
+        [text for text, _ in expected[3]] == ["〈亜〉鉛", "<電> 鈴", "水 力"],
+        expected[4] == [("水 力", None)],
+        expected[5] == [],
+    ]
+
+    for name in names:
+        backend: AbstractParserBackend = get_backend(name)
+        test_res += [
+            backend.name == name,
+            _extract(backend) == expected,
+            get_backend(name) is backend,
+            backend.compile("p.word") is backend.compile("p.word"),
+        ]
+
+    try:
+        get_backend("html5lib")
+        test_res.append(False)
+    except ValueError:
+        test_res.append(True)
+
+    if not all(test_res):
+        raise AssertionError(f"all of test must be True. But {test_res}")
+    print("Test has be run successfully.")
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,536 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+src_dir, *res = os.getcwd().split("/src")
+
+if len(res) > 0:
+    import sys
+
+    sys.path.append(src_dir + "/src")
+
+try:
+    from data.metrics import CrawlMetrics
+except ImportError:
+    raise
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+THROTTLE_STATUSES: FrozenSet[int] = frozenset([429, 503])
+
+
+class ThrottledError(Exception):
+    """
+    The server kept throttling a request after all the retries
+    """
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    > It returns the seconds of a Retry-After header, which is either a number
+    of seconds or an HTTP date
+
+    Args:
+        value (Optional[str]): The value of the header.
+
+    Returns:
+        The seconds to wait, or None if the header is missing or invalid.
+    """
+    if value is None:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_crawl_delay(text: str, user_agent: str = "*") -> Optional[float]:
+    """
+    > It returns the Crawl-delay of `user_agent` in a robots.txt. Unlike
+    `urllib.robotparser`, fractional delays are read too.
+
+    Args:
+        text (str): The text of robots.txt.
+        user_agent (str): The user agent. Defaults to "*"
+
+    Returns:
+        The delay of the group of `user_agent`, or of "*" if it has no group.
+    """
+    delays: Dict[str, float] = {}
+    agents: List[str] = []
+    in_rules: bool = False
+
+    for line in text.splitlines():
+        key, _, value = line.split("#", 1)[0].partition(":")
+        key, value = key.strip().lower(), value.strip()
+
+        if key == "user-agent":
+            if in_rules:
+                agents, in_rules = [], False
+            agents.append(value.lower())
+        elif key:
+            in_rules = True
+            if key == "crawl-delay":
+                try:
+                    for agent in agents:
+                        delays.setdefault(agent, float(value))
+                except ValueError:
+                    pass
+
+    return delays.get(user_agent.lower(), delays.get("*"))
+
+
+class HostState:
+    def __init__(self, delay: float) -> None:
+        """
+        The pacing of one host.
+
+        Args:
+            delay (float): The current interval between two requests.
+        """
+        self.delay: float = delay
+        self.floor: float = 0.0
+        self.next_allowed: float = 0.0
+        self.latency: Optional[float] = None
+        self.robots_checked: bool = False
+
+
+class AbstractScheduler:
+    def __init__(
+        self,
+        delay: float = 1.0,
+        max_retries: int = 3,
+        metrics: Optional[CrawlMetrics] = None,
+    ) -> None:
+        """
+        It paces the requests of each host. `call` waits until the host may be
+        requested, runs the request, and waits and retries when the server
+        answers 429 or 503, honouring Retry-After. It must be shared by all the
+        collectors of a crawl to pace them together.
+
+        The statuses and headers are seen through a response hook, so the
+        scheduler must be attached to a fetcher with `attach` to notice them.
+        A request still throttled after `max_retries` raises `ThrottledError`,
+        so the error page is never parsed as a page.
+
+        Args:
+            delay (float): The initial interval between two requests to a host.
+                Defaults to 1
+            max_retries (int): The number of retries of a throttled request.
+                Defaults to 3
+            metrics (Optional[CrawlMetrics]): The metrics to which the waits
+                are recorded as "sleep".
+        """
+        self.initial_delay: float = delay
+        self.max_retries: int = max_retries
+        self.metrics: CrawlMetrics = metrics or CrawlMetrics()
+        self.hosts: Dict[str, HostState] = {}
+        self.fetcher: Optional[Callable[[str], str]] = None
+        self._lock: threading.Lock = threading.Lock()
+        self._local: threading.local = threading.local()
+
+    def attach(self, fetcher: Any) -> None:
+        """
+        It registers the response hook on a fetcher, and takes the retries of
+        the throttled requests over from it
+
+        Args:
+            fetcher (Any): A `SessionFetcher` or a `CachedFetcher`.
+        """
+        fetcher.add_response_hook(self._on_response)
+        fetcher.exclude_retry_statuses(THROTTLE_STATUSES)
+        self.fetcher = fetcher
+
+    def _on_response(self, response: Any, *args, **kwargs) -> None:
+        """
+        It keeps the status and the headers of the response of this thread
+        """
+        self._local.response = (response.status_code, response.headers)
+
+    def _get_host(self, url: str) -> HostState:
+        """
+        > It returns the state of the host of `url`
+        """
+        host: str = urlsplit(url).netloc
+
+        with self._lock:
+            state: Optional[HostState] = self.hosts.get(host)
+            if state is None:
+                state = self.hosts[host] = HostState(self.initial_delay)
+        return state
+
+    def _check_robots(self, url: str, state: HostState) -> None:
+        """
+        It is called once per host before the first request
+        """
+        state.robots_checked = True
+
+    def wait(self, url: str) -> None:
+        """
+        It sleeps until the host of `url` may be requested
+
+        Args:
+            url (str): The URL to be requested.
+        """
+        state: HostState = self._get_host(url)
+        if not state.robots_checked:
+            self._check_robots(url, state)
+
+        seconds: float = state.next_allowed - time.monotonic()
+        if seconds > 0:
+            with self.metrics.timer("sleep"):
+                time.sleep(seconds)
+
+    def on_success(self, state: HostState, latency: float) -> None:
+        """
+        It is called after a request which was not throttled
+
+        Args:
+            state (HostState): The state of the host.
+            latency (float): The seconds the request took.
+        """
+        pass
+
+    def on_throttled(self, state: HostState) -> None:
+        """
+        It is called after a request answered with 429 or 503
+
+        Args:
+            state (HostState): The state of the host.
+        """
+        pass
+
+    def call(self, url: str, fn: Callable[[], str]) -> str:
+        """
+        > It runs a request to `url` at the pace of its host
+
+        Args:
+            url (str): The URL to be requested.
+            fn (Callable[[], str]): The function sending the request.
+
+        Returns:
+            The return value of `fn`.
+
+        Raises:
+            ThrottledError: The request was throttled `max_retries + 1` times.
+        """
+        state: HostState = self._get_host(url)
+
+        for attempt in range(self.max_retries + 1):
+            self.wait(url)
+            self._local.response = None
+            start: float = time.monotonic()
+            try:
+                text: str = fn()
+            finally:
+                end: float = time.monotonic()
+                state.next_allowed = end + state.delay
+
+            response: Optional[Tuple[int, Any]] = self._local.response
+            if response is None:
+                if self.fetcher is not None:
+                    # nothing was sent, as the page came from the cache
+                    state.next_allowed = end
+                    return text
+                response = (200, {})
+            status, headers = response
+
+            if status not in THROTTLE_STATUSES:
+                self.on_success(state, end - start)
+                # the delay may be changed by the response, so it is set again
+                state.next_allowed = end + state.delay
+                return text
+
+            self.on_throttled(state)
+            self.metrics.incr("throttled")
+            retry_after: Optional[float] = parse_retry_after(headers.get("Retry-After"))
+            state.next_allowed = end + max(state.delay, retry_after or 0.0)
+
+            if attempt == self.max_retries:
+                break
+            logger.warning(
+                f"{url} answered {status}, retrying in "
+                f"{state.next_allowed - end:.1f} s ({attempt + 1}/{self.max_retries})"
+            )
+        raise ThrottledError(f"{url} answered {status} {self.max_retries + 1} times.")
+
+
+class FixedDelayScheduler(AbstractScheduler):
+    """
+    It sleeps the same `delay` after every request, as the crawl always did
+    with `sleep_time`. Nothing is kept between two requests, so a new one per
+    collector paces the crawl as well as a shared one.
+    """
+
+    def call(self, url: str, fn: Callable[[], str]) -> str:
+        """
+        > It runs a request and sleeps `delay` after it
+
+        Args:
+            url (str): The URL to be requested.
+            fn (Callable[[], str]): The function sending the request.
+
+        Returns:
+            The return value of `fn`.
+        """
+        text: str = fn()
+
+        with self.metrics.timer("sleep"):
+            time.sleep(self.initial_delay)
+        return text
+
+
+class AdaptiveScheduler(AbstractScheduler):
+    def __init__(
+        self,
+        delay: float = 1.0,
+        min_delay: float = 0.5,
+        max_delay: float = 30.0,
+        step: float = 0.05,
+        backoff: float = 2.0,
+        slow_factor: float = 2.0,
+        smoothing: float = 0.2,
+        robots: bool = True,
+        user_agent: str = "*",
+        max_retries: int = 3,
+        metrics: Optional[CrawlMetrics] = None,
+    ) -> None:
+        """
+        It narrows the delay of a host by `step` after every fast response, and
+        widens it by `backoff` when the server throttles or by half when a
+        response is `slow_factor` times slower than usual, within
+        [`min_delay`, `max_delay`]. The Crawl-delay of robots.txt raises the
+        lower bound of its host.
+
+        Args:
+            delay (float): The initial delay. Defaults to 1
+            min_delay (float): The lower bound of the delay. Defaults to 0.5
+            max_delay (float): The upper bound of the delay. Defaults to 30
+            step (float): The seconds removed after a fast response.
+                Defaults to 0.05
+            backoff (float): The factor applied on 429 and 503. Defaults to 2
+            slow_factor (float): The ratio to the usual latency above which a
+                response is slow. Defaults to 2
+            smoothing (float): The weight of a new latency in the moving
+                average. Defaults to 0.2
+            robots (bool): If True, robots.txt is read once per host.
+                Defaults to True
+            user_agent (str): The user agent looked up in robots.txt.
+                Defaults to "*"
+            max_retries (int): The number of retries of a throttled request.
+                Defaults to 3
+            metrics (Optional[CrawlMetrics]): The metrics of the crawl.
+        """
+        super().__init__(
+            delay=min(max(delay, min_delay), max_delay),
+            max_retries=max_retries,
+            metrics=metrics,
+        )
+        self.min_delay: float = min_delay
+        self.max_delay: float = max_delay
+        self.step: float = step
+        self.backoff: float = backoff
+        self.slow_factor: float = slow_factor
+        self.smoothing: float = smoothing
+        self.robots: bool = robots
+        self.user_agent: str = user_agent
+
+    def _check_robots(self, url: str, state: HostState) -> None:
+        """
+        It raises the lower bound of the host to the Crawl-delay of robots.txt
+        """
+        super()._check_robots(url, state)
+        state.floor = self.min_delay
+        if (not self.robots) or (self.fetcher is None):
+            return
+
+        parts = urlsplit(url)
+        try:
+            text: str = self.fetcher(f"{parts.scheme}://{parts.netloc}/robots.txt")
+        except Exception as e:
+            logger.info(f"robots.txt of {parts.netloc} is not read: {e!r}")
+            return
+
+        crawl_delay: Optional[float] = parse_crawl_delay(text, self.user_agent)
+        if crawl_delay is not None:
+            state.floor = min(max(self.min_delay, float(crawl_delay)), self.max_delay)
+            state.delay = max(state.delay, state.floor)
+            logger.info(f"Crawl-delay of {parts.netloc} is {crawl_delay} s")
+
+    def on_success(self, state: HostState, latency: float) -> None:
+        """
+        It widens the delay by half after a slow response and narrows it by
+        `step` otherwise, and updates the moving average of the latency
+
+        Args:
+            state (HostState): The state of the host.
+            latency (float): The seconds the request took.
+        """
+        if (state.latency is not None) and (latency > self.slow_factor * state.latency):
+            state.delay = min(self.max_delay, state.delay * 1.5)
+        else:
+            state.delay = max(state.floor, state.delay - self.step)
+
+        if state.latency is None:
+            state.latency = latency
+        else:
+            state.latency += self.smoothing * (latency - state.latency)
+        self.metrics.set_gauge("delay", state.delay)
+
+    def on_throttled(self, state: HostState) -> None:
+        """
+        It widens the delay by `backoff`, to at least 1 second and the lower
+        bound of the host
+
+        Args:
+            state (HostState): The state of the host.
+        """
+        state.delay = min(
+            self.max_delay, max(state.delay * self.backoff, state.floor, 1.0)
+        )
+        self.metrics.set_gauge("delay", state.delay)
+
+
+def test():
+    """
+    > The function `test()` serves a host which throttles, and checks that the
+    > scheduler waits for Retry-After and gives up with `ThrottledError`, and
+    > that the adaptive scheduler follows the responses and robots.txt.
+    """
+    from functools import partial
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    from data.fetcher import SessionFetcher
+
+    requests_count: Dict[str, int] = {"/flaky": 0, "/down": 0, "/robots.txt": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            requests_count[self.path] = requests_count.get(self.path, 0) + 1
+            throttled: bool = (self.path == "/down") or (
+                (self.path == "/flaky") and (requests_count[self.path] <= 2)
+            )
+            body: bytes = b"busy" if throttled else b"ok"
+            if self.path == "/robots.txt":
+                body = b"User-agent: *\nDisallow: /private\nCrawl-delay: 0.25\n"
+            self.send_response(503 if throttled else 200)
+            if self.path == "/flaky":
+                self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server: ThreadingHTTPServer = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url: str = f"http://127.0.0.1:{server.server_address[1]}"
+    fetcher: SessionFetcher = SessionFetcher(retries=3, backoff_factor=0)
+    scheduler: AbstractScheduler = AbstractScheduler(delay=0, max_retries=2)
+    scheduler.attach(fetcher)
+    test_res: List[bool] = []
+
+    try:
+        start: float = time.monotonic()
+        text: str = scheduler.call(
+            base_url + "/flaky", partial(fetcher, base_url + "/flaky")
+        )
+        test_res.append(text == "ok")
+        # the two Retry-After of 1 s are waited, and the fetcher does not retry
+        test_res.append(time.monotonic() - start >= 2.0)
+        test_res.append(requests_count["/flaky"] == 3)
+
+        try:
+            scheduler.call(base_url + "/down", partial(fetcher, base_url + "/down"))
+            test_res.append(False)
+        except ThrottledError:
+            test_res.append(requests_count["/down"] == 3)
+
+        # robots.txt is read once, and its Crawl-delay is the lower bound. The
+        # latencies of a local server vary too much to tell a slow response
+        adaptive: AdaptiveScheduler = AdaptiveScheduler(
+            delay=0.375,
+            min_delay=0.125,
+            max_delay=2.0,
+            step=0.0625,
+            max_retries=0,
+            slow_factor=1000.0,
+        )
+        adaptive.attach(fetcher)
+        for _ in range(3):
+            adaptive.call(base_url + "/ok", partial(fetcher, base_url + "/ok"))
+        state: HostState = adaptive._get_host(base_url)
+        test_res += [
+            requests_count["/robots.txt"] == 1,
+            state.floor == 0.25,
+            state.delay == 0.25,
+        ]
+        try:
+            adaptive.call(base_url + "/down", partial(fetcher, base_url + "/down"))
+            test_res.append(False)
+        except ThrottledError:
+            test_res.append(state.delay == 1.0)
+    finally:
+        server.shutdown()
+        fetcher.close()
+
+    # a fast response narrows the delay to the lower bound, and a slow one or
+    # a throttled one widens it up to the upper bound
+    adaptive = AdaptiveScheduler(
+        delay=1.0, min_delay=0.5, max_delay=4.0, step=0.25, robots=False
+    )
+    state = HostState(1.0)
+    state.floor = adaptive.min_delay
+    delays: List[float] = []
+    for latency in (0.125, 0.125, 0.125, 1.0):
+        adaptive.on_success(state, latency)
+        delays.append(state.delay)
+    test_res += [
+        delays == [0.75, 0.5, 0.5, 0.75],
+        abs(state.latency - (0.125 + 0.2 * 0.875)) < 1e-9,
+    ]
+    delays = []
+    for _ in range(3):
+        adaptive.on_throttled(state)
+        delays.append(state.delay)
+    test_res.append(delays == [1.5, 3.0, 4.0])
+
+    robots: str = """
+User-agent: *
+Crawl-delay: 2
+
+User-agent: Kanji-Bot
+User-agent: other
+Disallow: /private  # not the delay
+Crawl-delay: 0.5
+
+User-agent: broken
+Crawl-delay: soon
+"""
+    test_res += [
+        parse_crawl_delay(robots) == 2.0,
+        parse_crawl_delay(robots, "kanji-bot") == 0.5,
+        parse_crawl_delay(robots, "other") == 0.5,
+        parse_crawl_delay(robots, "broken") == 2.0,
+        parse_crawl_delay(robots, "unknown") == 2.0,
+        parse_crawl_delay("User-agent: *\nDisallow: /") is None,
+    ]
+
+    if not all(test_res):
+        raise AssertionError(f"all of test must be True. But {test_res}")
+
+    print("Test has be run successfully.")
+
+
+if __name__ == "__main__":
+    test()
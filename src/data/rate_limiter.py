@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from typing import Dict
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    def __init__(self, rate: float = 1.0, capacity: float = 1.0) -> None:
+        """
+        A token bucket which refills `rate` tokens per second up to `capacity`.
+
+        Args:
+            rate (float): The number of requests allowed per second.
+                Defaults to 1.0
+            capacity (float): The maximum burst size. Defaults to 1.0
+        """
+        if rate <= 0:
+            raise ValueError(f"rate; {rate} must be a positive number.")
+
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self.tokens: float = capacity
+        self.updated_at: float = time.monotonic()
+        self._lock: asyncio.Lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        """
+        It adds the tokens accumulated since the last update
+        """
+        now: float = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    async def acquire(self) -> None:
+        """
+        > It waits until a token is available and then consumes it
+        """
+        async with self._lock:
+            self._refill()
+
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+
+            self.tokens -= 1
+
+
+class HostRateLimiter:
+    def __init__(self, rate: float = 1.0, capacity: float = 1.0) -> None:
+        """
+        It keeps one `TokenBucket` per host so that each host is paced
+        independently.
+
+        Args:
+            rate (float): The number of requests allowed per second and host.
+                Defaults to 1.0
+            capacity (float): The maximum burst size per host. Defaults to 1.0
+        """
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self.buckets: Dict[str, TokenBucket] = {}
+
+    def get_bucket(self, url: str) -> TokenBucket:
+        """
+        It returns the bucket of the host of `url`, creating it if needed
+
+        Args:
+            url (str): The URL to be requested.
+
+        Returns:
+            The token bucket of the host.
+        """
+        host: str = urlsplit(url).netloc
+
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(rate=self.rate, capacity=self.capacity)
+        return self.buckets[host]
+
+    async def acquire(self, url: str) -> None:
+        """
+        > It waits until the host of `url` may be requested again
+
+        Args:
+            url (str): The URL to be requested.
+        """
+        await self.get_bucket(url).acquire()
@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+src_dir, *res = os.getcwd().split("/src")
+
+if len(res) > 0:
+    import sys
+
+    sys.path.append(src_dir + "/src")
+
+try:
+    from data.fetcher import SessionFetcher
+    from data.metrics import CrawlMetrics
+except ImportError:
+    raise
+
+
+class CacheEntry(NamedTuple):
+    text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+class ResponseCache:
+    def __init__(self, cachedir: str, max_bytes: int = 1 << 30) -> None:
+        """
+        It stores the bodies under `cachedir/objects` addressed by their
+        SHA-256, and an index from URL to body, validators and last access time
+        in `cachedir/index.sqlite`.
+
+        Args:
+            cachedir (str): The directory of the cache.
+            max_bytes (int): The size cap of the bodies. The least recently used
+                entries are evicted beyond it. Defaults to 1 GiB
+        """
+        self.cachedir: str = cachedir
+        self.max_bytes: int = max_bytes
+        os.makedirs(os.path.join(cachedir, "objects"), exist_ok=True)
+
+        self._lock: threading.Lock = threading.Lock()
+        self.db: sqlite3.Connection = sqlite3.connect(
+            os.path.join(cachedir, "index.sqlite"), check_same_thread=False
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "url TEXT PRIMARY KEY, digest TEXT NOT NULL, etag TEXT, "
+            "last_modified TEXT, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)"
+        )
+        self.db.commit()
+
+    def _object_path(self, digest: str) -> str:
+        """
+        It returns the path of the body whose SHA-256 is `digest`
+
+        Args:
+            digest (str): The hex digest of the body.
+
+        Returns:
+            The path of the body.
+        """
+        return os.path.join(self.cachedir, "objects", digest[:2], digest[2:])
+
+    def get(self, url: str) -> Optional[CacheEntry]:
+        """
+        > It returns the cached response of `url` and marks it as recently used
+
+        Args:
+            url (str): The URL of the response.
+
+        Returns:
+            The cached entry, or None if `url` is not cached.
+        """
+        with self._lock:
+            row = self.db.execute(
+                "SELECT digest, etag, last_modified FROM entries WHERE url = ?",
+                (url,),
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            digest, etag, last_modified = row
+            try:
+                with open(self._object_path(digest), "r", encoding="utf-8") as f:
+                    text: str = f.read()
+            except FileNotFoundError:
+                self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                self.db.commit()
+                return None
+
+            self.db.execute(
+                "UPDATE entries SET accessed = ? WHERE url = ?", (time.time(), url)
+            )
+            self.db.commit()
+        return CacheEntry(text, etag, last_modified)
+
+    def put(
+        self,
+        url: str,
+        text: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        """
+        It stores the response of `url` and evicts old entries beyond the cap
+
+        Args:
+            url (str): The URL of the response.
+            text (str): The body of the response.
+            etag (Optional[str]): The ETag header of the response.
+            last_modified (Optional[str]): The Last-Modified header.
+        """
+        body: bytes = text.encode("utf-8")
+        digest: str = hashlib.sha256(body).hexdigest()
+        path: str = self._object_path(digest)
+
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path: str = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(body)
+                os.replace(tmp_path, path)
+
+            old = self.db.execute(
+                "SELECT digest FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                (url, digest, etag, last_modified, len(body), time.time()),
+            )
+            if (old is not None) and (old[0] != digest):
+                self._remove_object(old[0])
+            self._evict()
+            self.db.commit()
+
+    def _remove_object(self, digest: str) -> None:
+        """
+        It removes the body of `digest` unless another URL still refers to it
+
+        Args:
+            digest (str): The hex digest of the body.
+        """
+        row = self.db.execute(
+            "SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)
+        ).fetchone()
+
+        if row is None:
+            try:
+                os.remove(self._object_path(digest))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self) -> None:
+        """
+        It removes the least recently used entries until the cap is satisfied
+        """
+        (total,) = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+
+        if total <= self.max_bytes:
+            return
+
+        rows = self.db.execute(
+            "SELECT url, digest, size FROM entries ORDER BY accessed"
+        ).fetchall()
+        for url, digest, size in rows:
+            if total <= self.max_bytes:
+                break
+            self.db.execute("DELETE FROM entries WHERE url = ?", (url,))
+            self._remove_object(digest)
+            total -= size
+
+    def close(self) -> None:
+        """
+        It closes the index
+        """
+        with self._lock:
+            self.db.close()
+
+
+class CachedFetcher:
+    def __init__(
+        self,
+        cache: ResponseCache,
+        fetcher: Optional[SessionFetcher] = None,
+        offline: bool = False,
+        metrics: Optional[CrawlMetrics] = None,
+    ) -> None:
+        """
+        It answers from `cache` when the server says the page is not modified,
+        and never touches the network in the offline mode.
+
+        Args:
+            cache (ResponseCache): The cache of the responses.
+            fetcher (Optional[SessionFetcher]): The fetcher for the network.
+                If None, a new one is made unless `offline` is True.
+            offline (bool): If True, only cached responses are returned.
+                Defaults to False
+            metrics (Optional[CrawlMetrics]): The metrics to which the cache
+                hits and misses are counted. If None, those of `fetcher`.
+        """
+        if (fetcher is None) and (not offline):
+            fetcher = SessionFetcher(metrics=metrics)
+        if metrics is None:
+            metrics = CrawlMetrics() if fetcher is None else fetcher.metrics
+
+        self.cache: ResponseCache = cache
+        self.fetcher: Optional[SessionFetcher] = fetcher
+        self.offline: bool = offline
+        self.metrics: CrawlMetrics = metrics
+
+    def __call__(self, url: str) -> str:
+        """
+        > It returns the HTML text of `url`, revalidating the cached one with
+        If-None-Match / If-Modified-Since
+
+        Args:
+            url (str): The URL to be requested.
+
+        Returns:
+            The HTML text.
+        """
+        entry: Optional[CacheEntry] = self.cache.get(url)
+
+        if self.offline:
+            if entry is None:
+                self.metrics.incr("cache_misses")
+                raise LookupError(f"{url} is not cached and offline mode is set.")
+            self.metrics.incr("cache_hits")
+            return entry.text
+
+        headers: Dict[str, str] = {}
+        if entry is not None:
+            if entry.etag is not None:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified is not None:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        res = self.fetcher.fetch(url, headers=headers)
+
+        if (res.status_code == 304) and (entry is not None):
+            self.metrics.incr("cache_hits")
+            return entry.text
+
+        self.metrics.incr("cache_misses")
+
+        text: str = res.text
+        if res.status_code == 200:
+            self.cache.put(
+                url,
+                text,
+                etag=res.headers.get("ETag"),
+                last_modified=res.headers.get("Last-Modified"),
+            )
+        return text
+
+    def add_response_hook(self, hook: Callable[..., Any]) -> None:
+        """
+        It calls `hook` with every response from the network
+
+        Args:
+            hook (Callable[..., Any]): A response hook of `requests`.
+        """
+        if self.fetcher is not None:
+            self.fetcher.add_response_hook(hook)
+
+    def exclude_retry_statuses(self, statuses: Iterable[int]) -> None:
+        """
+        It stops the fetcher retrying `statuses`, as in `SessionFetcher`
+        """
+        if self.fetcher is not None:
+            self.fetcher.exclude_retry_statuses(statuses)
+
+    def close(self) -> None:
+        """
+        It closes the cache and the fetcher
+        """
+        self.cache.close()
+
+        if self.fetcher is not None:
+            self.fetcher.close()
+
+
+def test():
+    """
+    > The function `test()` serves a page with validators, and checks that the
+    > cached page is revalidated and served on 304, that the cache keeps the
+    > least recently used entries within its cap, and that the offline mode
+    > never goes to the network.
+    """
+    import tempfile
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    page: Dict[str, str] = {"etag": '"v1"', "text": "<p>亜鉛</p>"}
+    last_modified: str = "Wed, 21 Oct 2015 07:28:00 GMT"
+    received: List[Dict[str, Optional[str]]] = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            received.append(
+                {
+                    "If-None-Match": self.headers.get("If-None-Match"),
+                    "If-Modified-Since": self.headers.get("If-Modified-Since"),
+                }
+            )
+            if self.headers.get("If-None-Match") == page["etag"]:
+                self.send_response(304)
+                self.send_header("ETag", page["etag"])
+                self.end_headers()
+                return
+
+            body: bytes = page["text"].encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("ETag", page["etag"])
+            self.send_header("Last-Modified", last_modified)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    def _count_objects(cachedir: str) -> int:
+        return sum(
+            len(filenames)
+            for _, _, filenames in os.walk(os.path.join(cachedir, "objects"))
+        )
+
+    server: ThreadingHTTPServer = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url: str = f"http://127.0.0.1:{server.server_address[1]}/page"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache: ResponseCache = ResponseCache(os.path.join(tmp_dir, "http"))
+        fetcher: CachedFetcher = CachedFetcher(cache, fetcher=SessionFetcher(retries=0))
+        try:
+            # the first response is stored with its validators
+            test_res: List[bool] = [
+                fetcher(url) == "<p>亜鉛</p>",
+                received[-1] == {"If-None-Match": None, "If-Modified-Since": None},
+                cache.get(url) == CacheEntry("<p>亜鉛</p>", '"v1"', last_modified),
+            ]
+
+            # the validators are sent back, and the 304 is served from the cache
+            test_res += [
+                fetcher(url) == "<p>亜鉛</p>",
+                received[-1]
+                == {"If-None-Match": '"v1"', "If-Modified-Since": last_modified},
+                len(received) == 2,
+            ]
+
+            # a changed page replaces the entry and its body
+            page.update(etag='"v2"', text="<p>亜鈴</p>")
+            test_res += [
+                fetcher(url) == "<p>亜鈴</p>",
+                cache.get(url) == CacheEntry("<p>亜鈴</p>", '"v2"', last_modified),
+                _count_objects(os.path.join(tmp_dir, "http")) == 1,
+            ]
+            counters: Dict[str, float] = fetcher.metrics.snapshot()["counters"]
+            test_res.append(
+                (counters["cache_hits"], counters["cache_misses"]) == (1, 2)
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
+            fetcher.close()
+
+        # the offline mode answers from the cache, or raises LookupError
+        offline: CachedFetcher = CachedFetcher(
+            ResponseCache(os.path.join(tmp_dir, "http")), offline=True
+        )
+        test_res.append(offline(url) == "<p>亜鈴</p>")
+        try:
+            offline(url + "/missing")
+            test_res.append(False)
+        except LookupError:
+            test_res.append(True)
+        offline.close()
+
+        # the least recently used entry is evicted beyond the cap
+        small: ResponseCache = ResponseCache(os.path.join(tmp_dir, "small"), 9)
+        small.put("http://test/a", "aaaa", etag='"a"')
+        small.put("http://test/b", "bbb")
+        small.get("http://test/a")
+        small.put("http://test/c", "ccc")
+        test_res += [
+            small.get("http://test/b") is None,
+            small.get("http://test/a") == CacheEntry("aaaa", '"a"', None),
+            small.get("http://test/c") == CacheEntry("ccc", None, None),
+        ]
+        small.put("http://test/d", "dddddddd")
+        test_res += [
+            small.get("http://test/a") is None,
+            small.get("http://test/c") is None,
+            small.get("http://test/d") == CacheEntry("dddddddd", None, None),
+            _count_objects(os.path.join(tmp_dir, "small")) == 1,
+        ]
+        small.close()
+
+    if not all(test_res):
+        raise AssertionError(f"all of test must be True. But {test_res}")
+    print("Test has be run successfully.")
+
+
+if __name__ == "__main__":
+    test()
@@ -1,21 +1,53 @@
 # -*- coding: utf-8 -*-
 import os
+from typing import Optional
 
-import requests
+src_dir, *res = os.getcwd().split("/src")
 
+if len(res) > 0:
+    import sys
 
-def get_html(url: str = "https://www.kanjipedia.jp/") -> str:
+    sys.path.append(src_dir + "/src")
+
+try:
+    from data.fetcher import Fetcher, SessionFetcher
+except ImportError:
+    raise
+
+_default_fetcher: Optional[SessionFetcher] = None
+
+
+def get_default_fetcher() -> SessionFetcher:
+    """fetcherが指定されない場合に共有される`SessionFetcher`を返します。
+
+    Returns:
+        SessionFetcher: 既定のfetcher
+    """
+    global _default_fetcher
+
+    if _default_fetcher is None:
+        _default_fetcher = SessionFetcher()
+    return _default_fetcher
+
+
+def get_html(
+    url: str = "https://www.kanjipedia.jp/", fetcher: Optional[Fetcher] = None
+) -> str:
     """URLからソースコードを取り出し、HTMLをテキストとして抽出します。
 
     Args:
         url (str, optional): 保存したいHTMLデータを持つURLを指定します.
             Defaults to "https://www.kanjipedia.jp/".
+        fetcher (Fetcher, optional): 接続を再利用するfetcherを指定します.
+            Defaults to None（共有の既定fetcherを使います）.
 
     Returns:
         str: HTMLのテキストデータ
     """
-    res = requests.get(url)
-    raw_data: str = res.text
+    if fetcher is None:
+        fetcher = get_default_fetcher()
+
+    raw_data: str = fetcher(url)
 
     return raw_data
 
@@ -34,13 +66,15 @@ def save_text(text: str, output: str = "data/kanjipedia.html") -> None:
     if os.path.exists(data_path):
         os.makedirs(data_path, exist_ok=True)
 
-    with open(output, "w") as f:
+    with open(output, "w", encoding="utf-8") as f:
         f.write(text)
         print("Save is done!")
 
 
 def save_html_from_url(
-    url: str = "https://www.kanjipedia.jp/", output: str = "data/kanjipedia.html"
+    url: str = "https://www.kanjipedia.jp/",
+    output: str = "data/kanjipedia.html",
+    fetcher: Optional[Fetcher] = None,
 ) -> None:
     """URLからソースコードを取り出し、HTMLをテキストとして保存します。
 
@@ -49,8 +83,10 @@ def save_html_from_url(
             Defaults to "https://www.kanjipedia.jp/".
         output (str, optional): 作成したHTMLデータの保存先を指定します.
             Defaults to "data/kanjipedia.html".
+        fetcher (Fetcher, optional): 接続を再利用するfetcherを指定します.
+            Defaults to None.
     """
-    raw_text = get_html(url=url)
+    raw_text = get_html(url=url, fetcher=fetcher)
     save_text(raw_text, output=output)
 
 
@@ -70,7 +106,20 @@ if __name__ == "__main__":
         default="data/kanjipedia.html",
         help="Specifies a folder to save created html data.",
     )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=30.0,
+        help="Specifies a read timeout in seconds.",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="Specifies the number of retries on 5xx and connection errors.",
+    )
     args = parser.parse_args()
 
     print(args.url)
-    save_html_from_url(url=args.url, output=args.output)
+    with SessionFetcher(timeout=(5.0, args.timeout), retries=args.retries) as fetcher:
+        save_html_from_url(url=args.url, output=args.output, fetcher=fetcher)
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+import re
+import unicodedata
+from typing import Dict, List, Optional, Pattern
+
+# CJK Unified Ideographs with the extensions A to H, the compatibility
+# ideographs, and the iteration mark 々
+KANJI_PATTERN: Pattern = re.compile(
+    "[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u3005\U00020000-\U000323af]+"
+)
+
+# the texts of a page are joined by it to be cleaned in one pass
+SEPARATOR: str = "\x00"
+
+
+class TextNormalizer:
+    def __init__(
+        self,
+        rf_words: List[str] = ["▲", "△", "〈", "〉"],
+        nfkc: bool = False,
+        kanji_only: bool = False,
+    ) -> None:
+        """
+        It removes every occurrence of `rf_words` from the texts of the
+        elements. The single characters are deleted by a `str.translate`
+        table, and the longer words by one precompiled alternation.
+
+        Args:
+            rf_words (List[str]): The words to be removed from the texts.
+            nfkc (bool): If True, the texts are normalized by NFKC first, so
+                that the full-width and compatibility forms are unified.
+                Defaults to False
+            kanji_only (bool): If True, a text left with anything but kanji is
+                rejected. Defaults to False
+        """
+        if nfkc:
+            rf_words = [unicodedata.normalize("NFKC", word) for word in rf_words]
+
+        self.rf_words: List[str] = list(rf_words)
+        self.nfkc: bool = nfkc
+        self.kanji_only: bool = kanji_only
+        self.table: Dict[int, None] = {
+            ord(word): None for word in rf_words if len(word) == 1
+        }
+        words: List[str] = sorted(
+            set(word for word in rf_words if len(word) > 1), key=len, reverse=True
+        )
+        self.regex: Optional[Pattern] = (
+            re.compile("|".join(map(re.escape, words))) if len(words) > 0 else None
+        )
+        self._joinable: bool = all(SEPARATOR not in word for word in rf_words)
+
+    def _clean(self, text: str) -> str:
+        """
+        > It returns the text normalized and without `rf_words`
+        """
+        if self.nfkc:
+            text = unicodedata.normalize("NFKC", text)
+        if self.regex is not None:
+            text = self.regex.sub("", text)
+        return text.translate(self.table)
+
+    def _validate(self, text: str) -> Optional[str]:
+        """
+        > It returns the text, or None if it is rejected
+        """
+        if self.kanji_only and (KANJI_PATTERN.fullmatch(text) is None):
+            return None
+        return text
+
+    def __call__(self, text: str) -> Optional[str]:
+        """
+        > It returns the cleaned text of one element
+
+        Args:
+            text (str): The text of the element.
+
+        Returns:
+            The cleaned text, or None if it is rejected by `kanji_only`.
+        """
+        return self._validate(self._clean(text))
+
+    def normalize_all(self, texts: List[str]) -> List[Optional[str]]:
+        """
+        > It returns the cleaned texts of all the elements of a page. They are
+        joined and cleaned at once, so the cost per element is a split.
+
+        Args:
+            texts (List[str]): The texts of the elements.
+
+        Returns:
+            The cleaned texts in the same order, with None for the rejected
+            ones.
+        """
+        joined: str = SEPARATOR.join(texts)
+
+        if (not self._joinable) or (joined.count(SEPARATOR) != len(texts) - 1):
+            cleaned: List[str] = [self._clean(text) for text in texts]
+        elif len(texts) > 0:
+            cleaned = self._clean(joined).split(SEPARATOR)
+        else:
+            cleaned = []
+
+        if not self.kanji_only:
+            return cleaned
+        return [self._validate(text) for text in cleaned]
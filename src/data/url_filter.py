@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import math
+import re
+from typing import Dict, Iterator, List, Optional, Set
+from urllib.parse import (
+    parse_qsl,
+    urldefrag,
+    urlencode,
+    urljoin,
+    urlsplit,
+    urlunsplit,
+)
+
+DEFAULT_PORTS: Dict[str, int] = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url: str, base: Optional[str] = None) -> str:
+    """
+    > It returns the canonical form of a URL, so that the URLs of the same page
+    are equal: the URL is resolved against `base`, the fragment is removed, the
+    scheme and the host are lowercased, the default port is removed, the dot
+    segments of the path are resolved and the query is sorted.
+
+    Args:
+        url (str): The URL, which may be relative to `base`.
+        base (Optional[str]): The URL of the page linking to `url`.
+
+    Returns:
+        The canonical URL.
+    """
+    if base is not None:
+        url = urljoin(base, url)
+    url, _ = urldefrag(url)
+
+    parts = urlsplit(url)
+    scheme: str = parts.scheme.lower()
+    netloc: str = (parts.hostname or "").lower()
+    if parts.username is not None:
+        netloc = f"{parts.username}@{netloc}"
+    if (parts.port is not None) and (parts.port != DEFAULT_PORTS.get(scheme)):
+        netloc += f":{parts.port}"
+
+    path: str = parts.path or "/"
+    if ("/." in path) or ("//" in path):
+        # urljoin resolves the dot segments against the root of the host
+        path = urlsplit(urljoin("http://h/", re.sub("/{2,}", "/", path))).path
+    query: str = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def _digest(url: str) -> bytes:
+    """
+    > It returns the 16 byte digest of a URL
+    """
+    return hashlib.blake2b(url.encode("utf-8"), digest_size=16).digest()
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 1e-4) -> None:
+        """
+        A set of fixed size which may answer that a key is in it although it
+        is not, with a probability of about `error_rate` at `capacity` keys,
+        but never the other way around.
+
+        Args:
+            capacity (int): The expected number of keys.
+            error_rate (float): The false positive rate at `capacity` keys.
+                Defaults to 1e-4
+        """
+        num_bits: int = max(
+            8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        )
+        self.num_bits: int = num_bits
+        self.num_hashes: int = max(1, round(num_bits / capacity * math.log(2)))
+        self.bits: bytearray = bytearray((num_bits + 7) // 8)
+
+    def _positions(self, digest: bytes) -> Iterator[int]:
+        """
+        > It yields the bit positions of a key by double hashing its digest
+        """
+        h1: int = int.from_bytes(digest[:8], "little")
+        h2: int = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add_digest(self, digest: bytes) -> bool:
+        """
+        > It adds a key and returns `True` if it was not in the filter
+
+        Args:
+            digest (bytes): The 16 byte digest of the key.
+
+        Returns:
+            Whether the key is new.
+        """
+        new: bool = False
+        for position in self._positions(digest):
+            byte, bit = divmod(position, 8)
+            if not (self.bits[byte] >> bit) & 1:
+                self.bits[byte] |= 1 << bit
+                new = True
+        return new
+
+    def contains_digest(self, digest: bytes) -> bool:
+        """
+        > It returns `True` if the key may be in the filter
+
+        Args:
+            digest (bytes): The 16 byte digest of the key.
+
+        Returns:
+            Whether the key may be in the filter.
+        """
+        return all(
+            (self.bits[position // 8] >> (position % 8)) & 1
+            for position in self._positions(digest)
+        )
+
+
+class SeenSet:
+    def __init__(
+        self,
+        exact_limit: int = 1_000_000,
+        capacity: int = 10_000_000,
+        error_rate: float = 1e-4,
+    ) -> None:
+        """
+        The canonical URLs already fetched or queued by a crawl. Up to
+        `exact_limit` URLs, it keeps an exact set of their 128-bit hashes. Beyond
+        it, the hashes move into a Bloom filter of `capacity` URLs, so the
+        memory stays fixed at the cost of rarely skipping a new URL.
+
+        Args:
+            exact_limit (int): The number of URLs kept exactly.
+                Defaults to 1,000,000
+            capacity (int): The expected number of URLs of the Bloom filter.
+                Defaults to 10,000,000
+            error_rate (float): The false positive rate of the Bloom filter.
+                Defaults to 1e-4
+        """
+        self.exact_limit: int = exact_limit
+        self.capacity: int = capacity
+        self.error_rate: float = error_rate
+        self.exact: Optional[Set[bytes]] = set()
+        self.bloom: Optional[BloomFilter] = None
+        self.size: int = 0
+
+    def _to_bloom(self) -> None:
+        """
+        It moves the exact set into a Bloom filter
+        """
+        self.bloom = BloomFilter(self.capacity, self.error_rate)
+        for digest in self.exact:
+            self.bloom.add_digest(digest)
+        self.exact = None
+
+    def add(self, url: str) -> bool:
+        """
+        > It adds a canonical URL and returns `True` if it had not been seen
+
+        Args:
+            url (str): The canonical URL.
+
+        Returns:
+            Whether the URL is new.
+        """
+        digest: bytes = _digest(url)
+
+        if self.bloom is not None:
+            new: bool = self.bloom.add_digest(digest)
+        else:
+            new = digest not in self.exact
+            self.exact.add(digest)
+            if len(self.exact) > self.exact_limit:
+                self._to_bloom()
+
+        self.size += new
+        return new
+
+    def __contains__(self, url: str) -> bool:
+        digest: bytes = _digest(url)
+
+        if self.bloom is not None:
+            return self.bloom.contains_digest(digest)
+        return digest in self.exact
+
+    def __len__(self) -> int:
+        return self.size
+
+
+def test():
+    """
+    > The function `test()` checks the canonical forms of some URLs, and that
+    > a SeenSet keeps its URLs when it moves into a Bloom filter.
+    """
+    test_res: List[bool] = [
+        canonicalize_url("http://example.com/a#b") == "http://example.com/a",
+        canonicalize_url("HTTP://Example.COM:80/a") == "http://example.com/a",
+        canonicalize_url("https://example.com:443/") == "https://example.com/",
+        canonicalize_url("https://example.com:8443") == "https://example.com:8443/",
+        canonicalize_url("http://example.com/a?b=2&a=1&b=1")
+        == "http://example.com/a?a=1&b=1&b=2",
+        canonicalize_url("http://example.com/a/./b/../c//d")
+        == "http://example.com/a/c/d",
+        canonicalize_url("../c?x=1#y", base="http://example.com/a/b/")
+        == "http://example.com/a/c?x=1",
+        canonicalize_url("/c", base="http://example.com/a/b") == "http://example.com/c",
+    ]
+
+    seen: SeenSet = SeenSet(exact_limit=100, capacity=1000)
+    urls: List[str] = [f"http://example.com/{i}" for i in range(100)]
+    test_res += [
+        all(seen.add(url) for url in urls),
+        not any(seen.add(url) for url in urls),
+        seen.bloom is None,
+        len(seen) == 100,
+    ]
+
+    test_res += [
+        seen.add("http://example.com/100"),
+        (seen.exact is None) and (seen.bloom is not None),
+        all(url in seen for url in urls),
+        not seen.add("http://example.com/100"),
+        "http://example.com/101" not in seen,
+        seen.add("http://example.com/101"),
+        len(seen) == 102,
+    ]
+
+    if not all(test_res):
+        raise AssertionError(f"all of test must be True. But {test_res}")
+    print("Test has be run successfully.")
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,496 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+from array import array
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+src_dir, *res = os.getcwd().split("/src")
+
+if len(res) > 0:
+    import sys
+
+    sys.path.append(src_dir + "/src")
+
+try:
+    from game.corpus import DELETED, JukugoCorpus
+    from game.relay_index import RelayIndex
+except ImportError:
+    raise
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _group_sizes(offsets: Sequence[int]) -> List[int]:
+    """
+    > It returns the sizes of the groups of CSR offsets
+    """
+    if np is not None:
+        return np.diff(np.asarray(offsets, dtype=np.int64)).tolist()
+    return [offsets[i + 1] - offsets[i] for i in range(len(offsets) - 1)]
+
+
+def kanji_frequency(
+    corpus: JukugoCorpus, top: Optional[int] = None
+) -> Dict[str, List[Tuple[str, int]]]:
+    """
+    > It returns the number of the words of each kanji at each position, read
+    from the offsets of the corpus without scanning the words
+
+    Args:
+        corpus (JukugoCorpus): The corpus.
+        top (Optional[int]): The number of the most frequent kanji returned per
+            position. If None, all of them are returned.
+
+    Returns:
+        The kanji and their counts, in descending order, of "first" and
+        "second".
+    """
+    frequency: Dict[str, List[Tuple[str, int]]] = {}
+
+    for position, offsets in (
+        ("first", corpus.first_offsets),
+        ("second", corpus.second_offsets),
+    ):
+        counts: List[Tuple[str, int]] = [
+            (chr(corpus.kanji[kanji_id]), size)
+            for kanji_id, size in enumerate(_group_sizes(offsets))
+            if size > 0
+        ]
+        counts.sort(key=lambda count: (-count[1], count[0]))
+        frequency[position] = counts[:top] if top is not None else counts
+    return frequency
+
+
+def get_degrees(corpus: JukugoCorpus) -> array:
+    """
+    > It returns the number of the neighbors of every word, which is the size
+    of its first kanji group plus the size of its second kanji group, less the
+    word itself twice
+
+    Args:
+        corpus (JukugoCorpus): The corpus.
+
+    Returns:
+        The degrees in the order of the word ids, 0 for the removed ids.
+    """
+    first_sizes: List[int] = _group_sizes(corpus.first_offsets)
+    second_sizes: List[int] = _group_sizes(corpus.second_offsets)
+
+    if np is not None:
+        pairs: "np.ndarray" = np.asarray(corpus.pairs, dtype=np.int64).reshape(-1, 2)
+        live: "np.ndarray" = pairs[:, 0] != DELETED
+        degrees: "np.ndarray" = np.zeros(corpus.num_ids, dtype=np.int64)
+        degrees[live] = (
+            np.asarray(first_sizes, dtype=np.int64)[pairs[live, 0]]
+            + np.asarray(second_sizes, dtype=np.int64)[pairs[live, 1]]
+            - 2
+        )
+        return array("I", degrees.astype(np.uint32).tobytes())
+
+    pairs = corpus.pairs
+    return array(
+        "I",
+        (
+            (
+                first_sizes[pairs[2 * i]] + second_sizes[pairs[2 * i + 1]] - 2
+                if pairs[2 * i] != DELETED
+                else 0
+            )
+            for i in range(corpus.num_ids)
+        ),
+    )
+
+
+def degree_distribution(degrees: Sequence[int]) -> Dict[int, int]:
+    """
+    > It returns the number of the words of each degree
+
+    Args:
+        degrees (Sequence[int]): The degrees of the words.
+
+    Returns:
+        The counts sorted by degree.
+    """
+    if np is not None:
+        counts: List[int] = np.bincount(np.asarray(degrees, dtype=np.int64)).tolist()
+        return {degree: count for degree, count in enumerate(counts) if count > 0}
+    return dict(sorted(Counter(degrees).items()))
+
+
+class UnionFind:
+    def __init__(self, size: int) -> None:
+        """
+        Disjoint sets of `size` elements in two arrays, merged by size and
+        found with path halving.
+
+        Args:
+            size (int): The number of the elements.
+        """
+        self.parent: array = array("I", range(size))
+        self.size: array = array("I", [1]) * size
+
+    def find(self, x: int) -> int:
+        parent: array = self.parent
+
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, x: int, y: int) -> int:
+        """
+        > It merges the sets of `x` and `y` and returns the root of the union
+        """
+        x, y = self.find(x), self.find(y)
+
+        if x == y:
+            return x
+        if self.size[x] < self.size[y]:
+            x, y = y, x
+        self.parent[y] = x
+        self.size[x] += self.size[y]
+        return x
+
+
+def get_components(corpus: JukugoCorpus) -> array:
+    """
+    > It returns the connected component of every word. The words of a kanji
+    group are all neighbors of each other, so each group takes the smallest
+    label of its words at once, and the labels are propagated over the groups
+    of the CSR arrays until they settle. Without NumPy, every group is merged
+    into its first word with a union-find.
+
+    Args:
+        corpus (JukugoCorpus): The corpus.
+
+    Returns:
+        The smallest word id of the component of each word. A removed id is
+        its own component.
+    """
+    if np is not None:
+        return _propagate_labels(corpus)
+
+    sets: UnionFind = UnionFind(corpus.num_ids)
+
+    for offsets, word_ids in (
+        (corpus.first_offsets, corpus.first_ids),
+        (corpus.second_offsets, corpus.second_ids),
+    ):
+        for kanji_id in range(corpus.num_kanji):
+            start, end = offsets[kanji_id], offsets[kanji_id + 1]
+            if end - start < 2:
+                continue
+
+            head: int = word_ids[start]
+            for i in range(start + 1, end):
+                sets.union(head, word_ids[i])
+
+    smallest: Dict[int, int] = {}
+    labels: array = array("I", [0]) * corpus.num_ids
+    for word_id in range(corpus.num_ids):
+        labels[word_id] = smallest.setdefault(sets.find(word_id), word_id)
+    return labels
+
+
+def _propagate_labels(corpus: JukugoCorpus) -> array:
+    """
+    > It returns the components of `get_components` with array operations
+    """
+    labels: "np.ndarray" = np.arange(corpus.num_ids, dtype=np.int64)
+    groups: List[Tuple["np.ndarray", "np.ndarray", "np.ndarray"]] = []
+
+    for offsets, word_ids in (
+        (corpus.first_offsets, corpus.first_ids),
+        (corpus.second_offsets, corpus.second_ids),
+    ):
+        offsets = np.asarray(offsets, dtype=np.int64)
+        sizes: "np.ndarray" = np.diff(offsets)
+        # `reduceat` needs the starts of the groups which are not empty
+        groups.append(
+            (
+                np.asarray(word_ids, dtype=np.int64),
+                offsets[:-1][sizes > 0],
+                sizes[sizes > 0],
+            )
+        )
+
+    changed: bool = corpus.num_words > 0
+    while changed:
+        changed = False
+        for word_ids, starts, sizes in groups:
+            smallest: "np.ndarray" = np.minimum.reduceat(labels[word_ids], starts)
+            updated: "np.ndarray" = np.minimum(
+                labels[word_ids], np.repeat(smallest, sizes)
+            )
+            if np.any(updated != labels[word_ids]):
+                changed = True
+                labels[word_ids] = updated
+        # every label points to a smaller word of the same component
+        labels = labels[labels]
+    return array("I", labels.astype(np.uint32).tobytes())
+
+
+def shortest_chain(
+    index: RelayIndex, source_id: int, target_id: int
+) -> Optional[List[int]]:
+    """
+    > It returns a shortest relay chain of words from `source_id` to
+    `target_id`, in which every word is a legal reply to the two words before
+    it. A reply depends on the last two words, so the breadth-first search
+    visits the pairs of (previous, last) words, each once.
+
+    Args:
+        index (RelayIndex): The index of the legal replies.
+        source_id (int): The id of the first word.
+        target_id (int): The id of the last word.
+
+    Returns:
+        The ids of the chain, or None if no legal chain reaches the target.
+    """
+    if source_id == target_id:
+        return [source_id]
+
+    start: Tuple[Optional[int], int] = (None, source_id)
+    parents: Dict[Tuple[Optional[int], int], Tuple[Optional[int], int]] = {start: start}
+    queue: Deque[Tuple[Optional[int], int]] = deque([start])
+
+    while len(queue) > 0:
+        state: Tuple[Optional[int], int] = queue.popleft()
+        previous_id, word_id = state
+
+        for reply_id in index.reply_ids(word_id, previous_id):
+            next_state: Tuple[Optional[int], int] = (word_id, reply_id)
+            if next_state in parents:
+                continue
+            parents[next_state] = state
+
+            if reply_id == target_id:
+                chain: List[int] = [target_id]
+                while next_state != start:
+                    next_state = parents[next_state]
+                    chain.append(next_state[1])
+                chain.reverse()
+                return chain
+            queue.append(next_state)
+    return None
+
+
+def is_legal_chain(index: RelayIndex, chain: Sequence[str]) -> bool:
+    """
+    > It returns `True` if every word of the chain is a legal reply to the two
+    words before it
+
+    Args:
+        index (RelayIndex): The index of the legal replies.
+        chain (Sequence[str]): The words.
+
+    Returns:
+        Whether the chain can be played.
+    """
+    return all(
+        index.is_legal(chain[i], chain[i - 1], chain[i - 2] if i > 1 else None)
+        for i in range(1, len(chain))
+    )
+
+
+def build_report(
+    index: RelayIndex,
+    top: int = 20,
+    chains: Iterable[Tuple[str, str]] = (),
+) -> Dict[str, Any]:
+    """
+    > It returns the statistics of the relay graph of a corpus
+
+    Args:
+        index (RelayIndex): The index of the corpus.
+        top (int): The number of the kanji, dead ends and components listed.
+            Defaults to 20
+        chains (Iterable[Tuple[str, str]]): The pairs of words whose shortest
+            chains are reported.
+
+    Returns:
+        A JSON serializable report.
+    """
+    corpus: JukugoCorpus = index.corpus
+    degrees: array = get_degrees(corpus)
+    dead_ends: List[int] = [i for i in corpus.ids() if degrees[i] == 0]
+    if corpus.num_ids > corpus.num_words:
+        # the removed ids are left out of the statistics
+        degrees = array("I", (degrees[i] for i in corpus.ids()))
+    labels: array = get_components(corpus)
+    sizes: Counter = Counter(labels[i] for i in corpus.ids())
+    largest: List[Tuple[int, int]] = sizes.most_common(top)
+
+    report: Dict[str, Any] = {
+        "num_words": corpus.num_words,
+        "num_kanji": corpus.num_kanji,
+        "kanji_frequency": kanji_frequency(corpus, top=top),
+        "degree": {
+            "mean": sum(degrees) / max(len(degrees), 1),
+            "max": max(degrees, default=0),
+            "distribution": degree_distribution(degrees),
+        },
+        "dead_ends": {
+            "count": len(dead_ends),
+            "words": [corpus.word(i) for i in dead_ends[:top]],
+        },
+        "components": {
+            "count": len(sizes),
+            "largest": [
+                {"size": size, "word": corpus.word(label)} for label, size in largest
+            ],
+        },
+        "chains": [],
+    }
+
+    for source, target in chains:
+        source_id: Optional[int] = corpus.word_id(source)
+        target_id: Optional[int] = corpus.word_id(target)
+        chain: Optional[List[str]] = None
+
+        if (source_id is not None) and (target_id is not None):
+            chain_ids: Optional[List[int]] = shortest_chain(index, source_id, target_id)
+            if chain_ids is not None:
+                chain = [corpus.word(i) for i in chain_ids]
+        report["chains"].append(
+            {
+                "from": source,
+                "to": target,
+                "chain": chain,
+                "legal": (chain is not None) and is_legal_chain(index, chain),
+            }
+        )
+    return report
+
+
+def write_report(report: Dict[str, Any], filename: str) -> None:
+    """
+    It writes the report to `filename` as JSON atomically
+
+    Args:
+        report (Dict[str, Any]): The report of `build_report`.
+        filename (str): The report file.
+    """
+    tmp_filename: str = f"{filename}.part"
+
+    with open(tmp_filename, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_filename, filename)
+
+
+def test():
+    """
+    > The function `test()` checks the statistics of a small corpus against
+    > values counted by hand, and that the shortest chain keeps to the relay
+    > rule where the shortest path of the graph breaks it.
+    """
+    # 亜鉛 -> 亜鈴 -> 鉛鈴 is shorter, but 鉛鈴 shares 鉛 with 亜鉛
+    words: List[str] = ["亜鉛", "亜鈴", "鉛鈴", "亜電", "水電", "水鈴", "山川"]
+    index: RelayIndex = RelayIndex.from_words(words)
+    corpus: JukugoCorpus = index.corpus
+    ids: Dict[str, int] = {word: corpus.word_id(word) for word in words}
+
+    degrees: array = get_degrees(corpus)
+    labels: array = get_components(corpus)
+    component: int = min(ids[word] for word in words[:6])
+    chain_ids: Optional[List[int]] = shortest_chain(index, ids["亜鉛"], ids["鉛鈴"])
+    chain: List[str] = [corpus.word(i) for i in chain_ids or []]
+
+    test_res: List[bool] = [
+        kanji_frequency(corpus)
+        == {
+            "first": [("亜", 3), ("水", 2), ("山", 1), ("鉛", 1)],
+            "second": [("鈴", 3), ("電", 2), ("川", 1), ("鉛", 1)],
+        },
+        kanji_frequency(corpus, top=1) == {"first": [("亜", 3)], "second": [("鈴", 3)]},
+        {word: degrees[ids[word]] for word in words}
+        == {
+            "亜鉛": 2,
+            "亜鈴": 4,
+            "鉛鈴": 2,
+            "亜電": 3,
+            "水電": 2,
+            "水鈴": 3,
+            "山川": 0,
+        },
+        degree_distribution(degrees) == {0: 1, 2: 3, 3: 2, 4: 1},
+        [word for word in words if degrees[ids[word]] == 0] == ["山川"],
+        all(labels[ids[word]] == component for word in words[:6]),
+        labels[ids["山川"]] == ids["山川"],
+        not is_legal_chain(index, ["亜鉛", "亜鈴", "鉛鈴"]),
+        chain == ["亜鉛", "亜電", "水電", "水鈴", "鉛鈴"],
+        is_legal_chain(index, chain),
+        shortest_chain(index, ids["亜鉛"], ids["山川"]) is None,
+        shortest_chain(index, ids["亜鉛"], ids["亜鈴"]) == [ids["亜鉛"], ids["亜鈴"]],
+    ]
+
+    report: Dict[str, Any] = build_report(
+        index, chains=[("亜鉛", "鉛鈴"), ("亜鉛", "山川")]
+    )
+    test_res += [
+        report["dead_ends"] == {"count": 1, "words": ["山川"]},
+        report["components"]["count"] == 2,
+        report["components"]["largest"][0]
+        == {"size": 6, "word": corpus.word(component)},
+        report["chains"][0]["chain"] == chain,
+        report["chains"][0]["legal"],
+        report["chains"][1]
+        == {"from": "亜鉛", "to": "山川", "chain": None, "legal": False},
+    ]
+
+    if not all(test_res):
+        raise AssertionError(f"all of test must be True. But {test_res}")
+    print("Test has be run successfully.")
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        default="../data/jukugo.bin",
+        help=("Set a file name of the corpus compiled by game/corpus.py."),
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="../data/relay_report.json",
+        help=("Set a file name of the report."),
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=20,
+        help=("Set the number of the kanji, dead ends and components listed."),
+    )
+    parser.add_argument(
+        "--chain",
+        type=str,
+        nargs=2,
+        action="append",
+        default=[],
+        metavar=("FROM", "TO"),
+        help=("Add a pair of jukugo whose shortest chain is reported."),
+    )
+    args = parser.parse_args()
+
+    index: RelayIndex = RelayIndex.load(args.corpus)
+    report: Dict[str, Any] = build_report(index, top=args.top, chains=args.chain)
+    write_report(report, args.output)
+
+    print(
+        f"{report['num_words']} words, {report['dead_ends']['count']} dead ends, "
+        f"{report['components']['count']} components -> {args.output}"
+    )
+    for chain in report["chains"]:
+        print(f"  {chain['from']} -> {chain['to']}: {chain['chain']}")
+
+
+if __name__ == "__main__":
+    main()
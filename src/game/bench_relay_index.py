@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+from typing import List, Optional, Tuple
+
+src_dir, *res = os.getcwd().split("/src")
+
+if len(res) > 0:
+    import sys
+
+    sys.path.append(src_dir + "/src")
+
+try:
+    from game.relay_index import RelayIndex
+except ImportError:
+    raise
+
+
+def naive_replies(words: List[str], word: str, previous: Optional[str]) -> List[str]:
+    """
+    > It scans the whole dictionary for the legal replies, for comparison
+
+    Args:
+        words (List[str]): All the words.
+        word (str): The last word.
+        previous (Optional[str]): The word before `word`.
+
+    Returns:
+        The legal replies.
+    """
+    return [
+        reply
+        for reply in words
+        if ((reply[0] == word[0]) != (reply[1] == word[1]))
+        and ((previous is None) or not (set(reply) & set(previous)))
+    ]
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        default="../data/jukugo.bin",
+        help=("Set a file name of the corpus compiled by game/corpus.py."),
+    )
+    parser.add_argument(
+        "--naive_samples",
+        type=int,
+        default=200,
+        help=("Set the number of queries answered by the full scan."),
+    )
+    args = parser.parse_args()
+
+    start: float = time.perf_counter()
+    index: RelayIndex = RelayIndex.load(args.corpus)
+    load_seconds: float = time.perf_counter() - start
+    words: List[str] = list(index.corpus.words())
+
+    # every word is queried once, after its first neighbor if it has one
+    queries: List[Tuple[str, Optional[str]]] = []
+    id_queries: List[Tuple[int, Optional[int]]] = []
+    for word_id, word in zip(index.corpus.ids(), words):
+        neighbors: List[int] = index.neighbor_ids(word_id)
+        previous_id: Optional[int] = neighbors[0] if len(neighbors) > 0 else None
+        queries.append(
+            (word, None if previous_id is None else index.corpus.word(previous_id))
+        )
+        id_queries.append((word_id, previous_id))
+
+    start = time.perf_counter()
+    for word, previous in queries:
+        index.replies(word, previous)
+    single_seconds: float = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results: List[List[str]] = index.replies_batch(queries)
+    batch_seconds: float = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for word_id, previous_id in id_queries:
+        index.reply_ids(word_id, previous_id)
+    single_ids_seconds: float = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index.reply_ids_batch(id_queries)
+    batch_ids_seconds: float = time.perf_counter() - start
+
+    samples: List[Tuple[str, Optional[str]]] = queries[: args.naive_samples]
+    start = time.perf_counter()
+    for i, (word, previous) in enumerate(samples):
+        if sorted(naive_replies(words, word, previous)) != sorted(results[i]):
+            raise AssertionError(f"The replies to {word} after {previous} differ.")
+    naive_seconds: float = time.perf_counter() - start
+
+    print(f"{len(words)} words, loaded in {1000 * load_seconds:.3f} ms")
+    print(f"  indexed    : {len(queries) / single_seconds:12.1f} queries/s")
+    print(f"  batch      : {len(queries) / batch_seconds:12.1f} queries/s")
+    print(f"  indexed ids: {len(queries) / single_ids_seconds:12.1f} queries/s")
+    print(f"  batch ids  : {len(queries) / batch_ids_seconds:12.1f} queries/s")
+    print(f"  scan       : {len(samples) / naive_seconds:12.1f} queries/s")
+
+
+if __name__ == "__main__":
+    main()
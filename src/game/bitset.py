@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+from typing import Iterable, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# below this number of ids, the pure Python loop is faster than NumPy
+NUMPY_THRESHOLD: int = 64
+
+
+class BitsetPool:
+    def __init__(self, num_words: int, capacity: int = 1024) -> None:
+        """
+        The used words of many games, one bitset per game in one contiguous
+        bytearray. A game is a row of `(num_words + 7) // 8` bytes, and the
+        bit of a word is found from its id in the corpus. The freed rows are
+        reused, and the pool doubles when it is full.
+
+        With NumPy, the large lookups are gathered from a view of the buffer
+        without copying it.
+
+        Args:
+            num_words (int): The number of the words of the corpus.
+            capacity (int): The number of rows allocated at first.
+                Defaults to 1024
+        """
+        self.num_words: int = num_words
+        self.row_size: int = (num_words + 7) // 8
+        self.capacity: int = max(1, capacity)
+        self.bits: bytearray = bytearray(self.row_size * self.capacity)
+        self.free: List[int] = list(range(self.capacity - 1, -1, -1))
+
+    def __len__(self) -> int:
+        """
+        > It returns the number of the rows in use
+        """
+        return self.capacity - len(self.free)
+
+    def allocate(self) -> int:
+        """
+        > It returns an empty row
+
+        Returns:
+            The row.
+        """
+        if len(self.free) == 0:
+            self.free = list(range(2 * self.capacity - 1, self.capacity - 1, -1))
+            self.bits.extend(bytes(self.row_size * self.capacity))
+            self.capacity *= 2
+        return self.free.pop()
+
+    def release(self, row: int) -> None:
+        """
+        It clears a row and returns it to the pool
+
+        Args:
+            row (int): The row.
+        """
+        start: int = row * self.row_size
+        self.bits[start : start + self.row_size] = bytes(self.row_size)
+        self.free.append(row)
+
+    def add(self, row: int, word_id: int) -> None:
+        """
+        It marks a word used in a row
+
+        Args:
+            row (int): The row.
+            word_id (int): The id of the word.
+        """
+        self.bits[row * self.row_size + (word_id >> 3)] |= 1 << (word_id & 7)
+
+    def add_many(self, row: int, word_ids: Iterable[int]) -> None:
+        """
+        It marks many words used in a row
+
+        Args:
+            row (int): The row.
+            word_ids (Iterable[int]): The ids of the words.
+        """
+        for word_id in word_ids:
+            self.add(row, word_id)
+
+    def contains(self, row: int, word_id: int) -> bool:
+        """
+        > It returns `True` if the word is used in the row
+        """
+        return bool(
+            (self.bits[row * self.row_size + (word_id >> 3)] >> (word_id & 7)) & 1
+        )
+
+    def count(self, row: int) -> int:
+        """
+        > It returns the number of the words used in the row
+        """
+        start: int = row * self.row_size
+        return int.from_bytes(
+            self.bits[start : start + self.row_size], "little"
+        ).bit_count()
+
+    def filter(self, row: int, word_ids: Sequence[int]) -> List[int]:
+        """
+        > It returns the words which are not used in the row, i.e. the words
+        AND NOT the bitset
+
+        Args:
+            row (int): The row.
+            word_ids (Sequence[int]): The ids of the candidates.
+
+        Returns:
+            The ids of the unused candidates in order.
+        """
+        return self.filter_batch([row], [word_ids])[0]
+
+    def filter_batch(
+        self, rows: Sequence[int], word_ids: Sequence[Sequence[int]]
+    ) -> List[List[int]]:
+        """
+        > It returns the unused candidates of many rows at once. With NumPy, the
+        candidates of all the rows are looked up by one gather.
+
+        Args:
+            rows (Sequence[int]): The rows.
+            word_ids (Sequence[Sequence[int]]): The ids of the candidates of
+                each row.
+
+        Returns:
+            The ids of the unused candidates of each row in order.
+        """
+        sizes: List[int] = [len(ids) for ids in word_ids]
+
+        if (np is None) or (sum(sizes) < NUMPY_THRESHOLD):
+            bits: bytearray = self.bits
+            row_size: int = self.row_size
+            return [
+                [
+                    word_id
+                    for word_id in ids
+                    if not (bits[row * row_size + (word_id >> 3)] >> (word_id & 7)) & 1
+                ]
+                for row, ids in zip(rows, word_ids)
+            ]
+
+        ids: "np.ndarray" = np.fromiter(
+            (word_id for row_ids in word_ids for word_id in row_ids),
+            dtype=np.int64,
+            count=sum(sizes),
+        )
+        offsets: "np.ndarray" = np.repeat(
+            np.asarray(rows, dtype=np.int64) * self.row_size, sizes
+        )
+        view: "np.ndarray" = np.frombuffer(self.bits, dtype=np.uint8)
+        unused: "np.ndarray" = ((view[offsets + (ids >> 3)] >> (ids & 7)) & 1) == 0
+        del view
+
+        results: List[List[int]] = []
+        start: int = 0
+        for size in sizes:
+            end: int = start + size
+            results.append(ids[start:end][unused[start:end]].tolist())
+            start = end
+        return results
+
+
+class WordBitset:
+    __slots__ = ("pool", "row")
+
+    def __init__(self, pool: BitsetPool, word_ids: Optional[Iterable[int]] = None):
+        """
+        The used words of one game, as a row of a `BitsetPool`. `release` must
+        be called when the game is over, so that the row is reused.
+
+        Args:
+            pool (BitsetPool): The pool of the bitsets.
+            word_ids (Optional[Iterable[int]]): The ids of the words used
+                already.
+        """
+        self.pool: BitsetPool = pool
+        self.row: int = pool.allocate()
+        if word_ids is not None:
+            pool.add_many(self.row, word_ids)
+
+    def add(self, word_id: int) -> None:
+        """
+        It marks a word used
+
+        Args:
+            word_id (int): The id of the word.
+        """
+        self.pool.add(self.row, word_id)
+
+    def __contains__(self, word_id: int) -> bool:
+        """
+        > It returns `True` if the word is used
+        """
+        return self.pool.contains(self.row, word_id)
+
+    def __len__(self) -> int:
+        return self.pool.count(self.row)
+
+    def filter(self, word_ids: Sequence[int]) -> List[int]:
+        """
+        > It returns the ids which are not in the bitset
+
+        Args:
+            word_ids (Sequence[int]): The ids of the candidates.
+
+        Returns:
+            The ids of the unused candidates in order.
+        """
+        return self.pool.filter(self.row, word_ids)
+
+    def release(self) -> None:
+        """
+        It returns the row of the bitset to its pool. The bitset must not be
+        used after it.
+        """
+        self.pool.release(self.row)
+
+
+def filter_batch(
+    bitsets: Sequence[WordBitset], word_ids: Sequence[Sequence[int]]
+) -> List[List[int]]:
+    """
+    > It returns the unused candidates of many games sharing a pool at once
+
+    Args:
+        bitsets (Sequence[WordBitset]): The bitsets of the games.
+        word_ids (Sequence[Sequence[int]]): The ids of the candidates of each
+            game.
+
+    Returns:
+        The ids of the unused candidates of each game in order.
+    """
+    if len(bitsets) == 0:
+        return []
+
+    pool: BitsetPool = bitsets[0].pool
+    if any(bitset.pool is not pool for bitset in bitsets):
+        raise ValueError("bitsets; all of them must share one pool.")
+    return pool.filter_batch([bitset.row for bitset in bitsets], word_ids)
+
+
+def test():
+    """
+    > The function `test()` checks the rows of a pool as they are allocated,
+    > grown and released, and the filters against sets of the used ids, on
+    > both sides of `NUMPY_THRESHOLD`.
+    """
+    import random
+
+    pool: BitsetPool = BitsetPool(200, capacity=2)
+    rows: List[int] = [pool.allocate(), pool.allocate()]
+    test_res: List[bool] = [rows == [0, 1], pool.capacity == 2, len(pool) == 2]
+
+    # the pool is full, so it doubles
+    rows.append(pool.allocate())
+    pool.add_many(rows[0], [0, 7, 8, 199])
+    test_res += [
+        rows[2] == 2,
+        pool.capacity == 4,
+        len(pool.bits) == 4 * pool.row_size,
+        pool.count(rows[0]) == 4,
+        pool.contains(rows[0], 199) and not pool.contains(rows[1], 199),
+    ]
+
+    # a released row is cleared, and it is the next one allocated
+    pool.release(rows[0])
+    row: int = pool.allocate()
+    test_res += [row == rows[0], pool.count(row) == 0, len(pool) == 3]
+
+    random.seed(0)
+    bitsets: List[WordBitset] = []
+    used: List[set] = []
+    for _ in range(8):
+        word_ids: List[int] = random.sample(range(200), random.randrange(100))
+        bitsets.append(WordBitset(pool, word_ids[:-1]))
+        if len(word_ids) > 0:
+            bitsets[-1].add(word_ids[-1])
+        used.append(set(word_ids))
+    test_res += [
+        all(len(bitset) == len(ids) for bitset, ids in zip(bitsets, used)),
+        all(
+            (word_id in bitset) == (word_id in ids)
+            for bitset, ids in zip(bitsets, used)
+            for word_id in range(200)
+        ),
+    ]
+
+    for num_candidates in (3, NUMPY_THRESHOLD // 8, NUMPY_THRESHOLD, 150):
+        candidates: List[List[int]] = [
+            [random.randrange(200) for _ in range(num_candidates)] for _ in bitsets
+        ]
+        expected: List[List[int]] = [
+            [word_id for word_id in row_ids if word_id not in ids]
+            for row_ids, ids in zip(candidates, used)
+        ]
+        test_res += [
+            filter_batch(bitsets, candidates) == expected,
+            [bitset.filter(row_ids) for bitset, row_ids in zip(bitsets, candidates)]
+            == expected,
+        ]
+
+    other: WordBitset = WordBitset(BitsetPool(200), [1])
+    try:
+        filter_batch([bitsets[0], other], [[1], [1]])
+        test_res.append(False)
+    except ValueError:
+        test_res.append(True)
+    test_res.append(filter_batch([], []) == [])
+
+    for bitset in bitsets:
+        bitset.release()
+    test_res.append(len(pool) == 3)
+
+    if not all(test_res):
+        raise AssertionError(f"all of test must be True. But {test_res}")
+    print("Test has be run successfully.")
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,750 @@
+# -*- coding: utf-8 -*-
+import glob
+import json
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+src_dir, *res = os.getcwd().split("/src")
+
+if len(res) > 0:
+    import sys
+
+    sys.path.append(src_dir + "/src")
+
+try:
+    from data.manifest import get_hashes
+except ImportError:
+    raise
+
+MAGIC: bytes = b"JKRC"
+VERSION: int = 2
+# magic, version, number of kanji, number of ids, number of words
+HEADER: struct.Struct = struct.Struct("<4sIIII")
+# the kanji ids of a removed word
+DELETED: int = 0xFFFFFFFF
+# the hashes and the word ids of the pages from which a corpus file is built
+PAGES_SUFFIX: str = ".pages.json"
+
+
+class JukugoCorpus:
+    def __init__(
+        self,
+        kanji: Sequence[int],
+        pairs: Sequence[int],
+        first_offsets: Sequence[int],
+        first_ids: Sequence[int],
+        second_offsets: Sequence[int],
+        second_ids: Sequence[int],
+        buffer: Optional[mmap.mmap] = None,
+    ) -> None:
+        """
+        A corpus of two-kanji jukugo held in fixed-width integer arrays.
+
+        The kanji are kept as sorted code points and a word is the pair of ids
+        of its kanji, at `pairs[2 * word_id]`. The words whose first kanji is
+        `k` are `first_ids[first_offsets[k]:first_offsets[k + 1]]`, sorted by
+        their second kanji, and the words whose second kanji is `k` are
+        `second_ids[second_offsets[k]:second_offsets[k + 1]]`.
+
+        The id of a word is kept by `update`: new words get new ids and the
+        pair of a removed word is set to `DELETED`, so the ids held by the
+        server or the solver stay valid. The ids of a corpus built by
+        `from_words` are in the order of the words, and the kanji ids are
+        not kept by `update`.
+
+        Args:
+            kanji (Sequence[int]): The sorted code points of the kanji.
+            pairs (Sequence[int]): The kanji ids of the words, two per word.
+            first_offsets (Sequence[int]): The offsets of the first kanji.
+            first_ids (Sequence[int]): The word ids sorted by first kanji.
+            second_offsets (Sequence[int]): The offsets of the second kanji.
+            second_ids (Sequence[int]): The word ids sorted by second kanji.
+            buffer (Optional[mmap.mmap]): The mapped file of the arrays.
+        """
+        self.kanji: Sequence[int] = kanji
+        self.pairs: Sequence[int] = pairs
+        self.first_offsets: Sequence[int] = first_offsets
+        self.first_ids: Sequence[int] = first_ids
+        self.second_offsets: Sequence[int] = second_offsets
+        self.second_ids: Sequence[int] = second_ids
+        self._buffer: Optional[mmap.mmap] = buffer
+
+    @classmethod
+    def from_words(cls, words: Iterable[str]) -> "JukugoCorpus":
+        """
+        > It builds a corpus from the two-kanji words in `words`
+
+        Args:
+            words (Iterable[str]): The words. Duplicates and words which are not
+                two characters long are ignored.
+
+        Returns:
+            The corpus, whose ids are in the order of the sorted words.
+        """
+        return cls._from_ids(sorted({word for word in words if len(word) == 2}))
+
+    @classmethod
+    def _from_ids(cls, words: Sequence[Optional[str]]) -> "JukugoCorpus":
+        """
+        > It builds a corpus in which the id of `words[i]` is `i`. The ids of
+        the None items are removed words.
+        """
+        kanji: array = array(
+            "I", sorted({ord(c) for word in words if word is not None for c in word})
+        )
+        kanji_ids = {code: i for i, code in enumerate(kanji)}
+
+        pairs: array = array("I")
+        for word in words:
+            if word is None:
+                pairs.extend((DELETED, DELETED))
+            else:
+                pairs.extend((kanji_ids[ord(word[0])], kanji_ids[ord(word[1])]))
+
+        word_ids: List[int] = [i for i, word in enumerate(words) if word is not None]
+        first_ids: array = array(
+            "I", sorted(word_ids, key=lambda i: (pairs[2 * i], pairs[2 * i + 1]))
+        )
+        first_offsets: array = _offsets((pairs[2 * i] for i in first_ids), len(kanji))
+        second_ids: array = array(
+            "I", sorted(word_ids, key=lambda i: (pairs[2 * i + 1], i))
+        )
+        second_offsets: array = _offsets(
+            (pairs[2 * i + 1] for i in second_ids), len(kanji)
+        )
+        return cls(kanji, pairs, first_offsets, first_ids, second_offsets, second_ids)
+
+    @classmethod
+    def load(cls, filename: str) -> "JukugoCorpus":
+        """
+        > It maps the compiled file read-only. Nothing is parsed or copied, so
+        processes loading the same file share its pages.
+
+        Args:
+            filename (str): The compiled corpus file.
+
+        Returns:
+            The corpus.
+        """
+        with open(filename, "rb") as f:
+            buffer: mmap.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, num_kanji, num_ids, num_words = HEADER.unpack_from(buffer, 0)
+        if (magic != MAGIC) or (version != VERSION):
+            buffer.close()
+            raise ValueError(f"{filename} is not a jukugo corpus of version {VERSION}.")
+
+        view: memoryview = memoryview(buffer)[HEADER.size :].cast("I")
+        sections: List[memoryview] = []
+        start: int = 0
+        for length in _section_lengths(num_kanji, num_ids, num_words):
+            sections.append(view[start : start + length])
+            start += length
+        return cls(*sections, buffer=buffer)
+
+    def update(self, added: Iterable[str], removed: Iterable[str]) -> "JukugoCorpus":
+        """
+        > It returns a new corpus with the words of `added` and without the
+        words of `removed`. The words of the corpus are taken from its arrays,
+        so no page has to be read again. The ids of the kept words do not
+        change, the added words get ids after the last one, and the ids of
+        the removed words are not given again.
+
+        Args:
+            added (Iterable[str]): The words to be added.
+            removed (Iterable[str]): The words to be removed.
+
+        Returns:
+            The updated corpus, held in memory.
+        """
+        removed_ids: Set[int] = {
+            word_id for word_id in map(self.word_id, removed) if word_id is not None
+        }
+        words: List[Optional[str]] = [
+            (
+                self.word(word_id)
+                if self.has_id(word_id) and (word_id not in removed_ids)
+                else None
+            )
+            for word_id in range(self.num_ids)
+        ]
+
+        kept_words: Set[str] = {word for word in words if word is not None}
+        words.extend(
+            sorted(
+                {word for word in added if len(word) == 2} - kept_words,
+            )
+        )
+        return JukugoCorpus._from_ids(words)
+
+    def save(self, filename: str) -> None:
+        """
+        It writes the corpus to `filename` atomically
+
+        Args:
+            filename (str): The compiled corpus file.
+        """
+        tmp_filename: str = f"{filename}.part"
+
+        with open(tmp_filename, "wb") as f:
+            f.write(
+                HEADER.pack(
+                    MAGIC, VERSION, self.num_kanji, self.num_ids, self.num_words
+                )
+            )
+            for section in (
+                self.kanji,
+                self.pairs,
+                self.first_offsets,
+                self.first_ids,
+                self.second_offsets,
+                self.second_ids,
+            ):
+                f.write(array("I", section).tobytes())
+        os.replace(tmp_filename, filename)
+
+    def close(self) -> None:
+        """
+        It unmaps the file of a loaded corpus
+        """
+        if self._buffer is None:
+            return
+
+        for section in (
+            self.kanji,
+            self.pairs,
+            self.first_offsets,
+            self.first_ids,
+            self.second_offsets,
+            self.second_ids,
+        ):
+            section.release()
+        self._buffer.close()
+        self._buffer = None
+
+    @property
+    def num_kanji(self) -> int:
+        """
+        > It returns the number of distinct kanji
+        """
+        return len(self.kanji)
+
+    @property
+    def num_words(self) -> int:
+        """
+        > It returns the number of words
+        """
+        return len(self.first_ids)
+
+    @property
+    def num_ids(self) -> int:
+        """
+        > It returns the number of word ids given so far, which is the size of
+        the arrays indexed by word id. It is more than `num_words` when words
+        have been removed.
+        """
+        return len(self.pairs) // 2
+
+    def has_id(self, word_id: int) -> bool:
+        """
+        > It returns `True` if `word_id` is a word which has not been removed
+        """
+        return (0 <= word_id < self.num_ids) and (self.pairs[2 * word_id] != DELETED)
+
+    def kanji_id(self, kanji: str) -> Optional[int]:
+        """
+        > It returns the id of a kanji by binary search
+
+        Args:
+            kanji (str): A kanji.
+
+        Returns:
+            The id of the kanji, or None if it is not in the corpus.
+        """
+        code: int = ord(kanji)
+        index: int = bisect_left(self.kanji, code)
+
+        if (index < self.num_kanji) and (self.kanji[index] == code):
+            return index
+        return None
+
+    def word(self, word_id: int) -> str:
+        """
+        > It returns the word of `word_id`
+
+        Args:
+            word_id (int): The id of the word.
+
+        Returns:
+            The two-kanji word.
+        """
+        return chr(self.kanji[self.pairs[2 * word_id]]) + chr(
+            self.kanji[self.pairs[2 * word_id + 1]]
+        )
+
+    def word_kanji(self, word_id: int) -> Tuple[int, int]:
+        """
+        > It returns the kanji ids of `word_id`
+
+        Args:
+            word_id (int): The id of the word.
+
+        Returns:
+            The ids of the first and the second kanji.
+        """
+        return self.pairs[2 * word_id], self.pairs[2 * word_id + 1]
+
+    def word_id(self, word: str) -> Optional[int]:
+        """
+        > It returns the id of `word` by binary search in its first kanji range
+
+        Args:
+            word (str): A two-kanji word.
+
+        Returns:
+            The id of the word, or None if it is not in the corpus.
+        """
+        if len(word) != 2:
+            return None
+
+        first: Optional[int] = self.kanji_id(word[0])
+        second: Optional[int] = self.kanji_id(word[1])
+        if (first is None) or (second is None):
+            return None
+
+        low: int = self.first_offsets[first]
+        high: int = self.first_offsets[first + 1]
+        while low < high:
+            middle: int = (low + high) // 2
+            if self.pairs[2 * self.first_ids[middle] + 1] < second:
+                low = middle + 1
+            else:
+                high = middle
+
+        if (low < self.first_offsets[first + 1]) and (
+            self.pairs[2 * self.first_ids[low] + 1] == second
+        ):
+            return self.first_ids[low]
+        return None
+
+    def ids(self) -> Iterator[int]:
+        """
+        > It iterates the ids of all the words in order
+        """
+        for word_id in range(self.num_ids):
+            if self.pairs[2 * word_id] != DELETED:
+                yield word_id
+
+    def words(self) -> Iterator[str]:
+        """
+        > It iterates all the words in the order of their ids
+        """
+        for word_id in self.ids():
+            yield self.word(word_id)
+
+    def __len__(self) -> int:
+        return self.num_words
+
+    def __contains__(self, word: str) -> bool:
+        return self.word_id(word) is not None
+
+
+def _offsets(keys: Iterable[int], size: int) -> array:
+    """
+    > It returns the CSR offsets of sorted `keys` in the range of `size`
+
+    Args:
+        keys (Iterable[int]): The sorted keys.
+        size (int): The number of distinct keys.
+
+    Returns:
+        An array of `size + 1` offsets.
+    """
+    offsets: array = array("I", [0] * (size + 1))
+
+    for key in keys:
+        offsets[key + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+    return offsets
+
+
+def _section_lengths(num_kanji: int, num_ids: int, num_words: int) -> List[int]:
+    """
+    > It returns the lengths of the arrays in the compiled file, in order
+    """
+    return [
+        num_kanji,
+        2 * num_ids,
+        num_kanji + 1,
+        num_words,
+        num_kanji + 1,
+        num_words,
+    ]
+
+
+def get_page_files(savedir: str) -> List[str]:
+    """
+    > It returns the `<kana_dir>/<page>.yml` files written by SimpleDataSaver,
+    and the `<kana_dir>/<page>.jsonl` files streamed with `--stream_format jsonl`
+
+    Args:
+        savedir (str): The directory of the collected data.
+
+    Returns:
+        The sorted list of the files.
+    """
+    return sorted(
+        glob.glob(os.path.join(savedir, "*", "*.yml"))
+        + glob.glob(os.path.join(savedir, "*", "*.jsonl"))
+    )
+
+
+def load_words(filenames: Iterable[str]) -> Iterator[str]:
+    """
+    > It reads the words from the YAML files, or from the JSON lines files
+
+    Args:
+        filenames (Iterable[str]): The YAML or JSON lines files of the pages.
+    """
+    for filename in filenames:
+        with open(filename, "r", encoding="utf-8") as f:
+            words: Optional[List[str]]
+            if filename.endswith(".jsonl"):
+                words = [json.loads(line) for line in f if line.strip()]
+            else:
+                words = yaml.load(f, Loader=SafeLoader)
+
+        for word in words or []:
+            yield word.strip()
+
+
+class CorpusChanges(NamedTuple):
+    added_pages: List[str]
+    changed_pages: List[str]
+    removed_pages: List[str]
+    added_words: List[str]
+    removed_words: List[str]
+
+
+def _page_words(filename: str) -> List[str]:
+    """
+    > It returns the distinct two-kanji words of a page in order
+    """
+    return sorted({word for word in load_words([filename]) if len(word) == 2})
+
+
+def _load_pages(filename: str) -> Optional[Dict[str, Dict[str, object]]]:
+    """
+    > It reads the pages of a corpus, or returns None if there is no file
+    """
+    if not os.path.exists(filename):
+        return None
+
+    with open(filename, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_pages(pages: Dict[str, Dict[str, object]], filename: str) -> None:
+    """
+    It writes the pages of a corpus atomically
+    """
+    tmp_filename: str = f"{filename}.part"
+
+    with open(tmp_filename, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(pages.items())), f, ensure_ascii=False)
+    os.replace(tmp_filename, filename)
+
+
+def compile_corpus(savedir: str, output: str) -> JukugoCorpus:
+    """
+    It compiles the YAML files of the pages into a single corpus file. The
+    hash and the word ids of every page are written next to it, to
+    `output + PAGES_SUFFIX`, so that `update_corpus` can apply later changes.
+    The ids are given from scratch, so the ids of the removed words are
+    dropped but the ones held from an older corpus are no longer valid.
+
+    Args:
+        savedir (str): The directory of the collected data.
+        output (str): The compiled corpus file.
+
+    Returns:
+        The compiled corpus.
+    """
+    hashes: Dict[str, str] = get_hashes(savedir, get_page_files(savedir))
+    page_words: Dict[str, List[str]] = {
+        page: _page_words(os.path.join(savedir, page)) for page in hashes
+    }
+
+    corpus: JukugoCorpus = JukugoCorpus.from_words(
+        word for words in page_words.values() for word in words
+    )
+    corpus.save(output)
+    _save_pages(
+        {
+            page: {"hash": hashes[page], "ids": list(map(corpus.word_id, words))}
+            for page, words in page_words.items()
+        },
+        output + PAGES_SUFFIX,
+    )
+    return corpus
+
+
+def update_corpus(savedir: str, output: str) -> Tuple[JukugoCorpus, CorpusChanges]:
+    """
+    It applies the changes of the pages since the corpus file was built. The
+    hashes of the pages are compared with the ones recorded with the corpus,
+    only the added and changed pages are read, and a word is added or removed
+    when the first page has it or the last page drops it. The ids of the kept
+    words do not change, as `JukugoCorpus.update` keeps them. If the corpus
+    has no record of its pages, it is compiled from scratch.
+
+    Args:
+        savedir (str): The directory of the collected data.
+        output (str): The compiled corpus file.
+
+    Returns:
+        The corpus and the changes applied to it.
+    """
+    pages_file: str = output + PAGES_SUFFIX
+    pages: Optional[Dict[str, Dict[str, object]]] = _load_pages(pages_file)
+
+    if (pages is None) or (not os.path.exists(output)):
+        corpus: JukugoCorpus = compile_corpus(savedir, output)
+        return corpus, CorpusChanges(
+            added_pages=sorted(_load_pages(pages_file)),
+            changed_pages=[],
+            removed_pages=[],
+            added_words=list(corpus.words()),
+            removed_words=[],
+        )
+
+    hashes: Dict[str, str] = get_hashes(savedir, get_page_files(savedir))
+    added_pages: List[str] = sorted(set(hashes) - set(pages))
+    removed_pages: List[str] = sorted(set(pages) - set(hashes))
+    changed_pages: List[str] = sorted(
+        page
+        for page, digest in hashes.items()
+        if (page in pages) and (pages[page]["hash"] != digest)
+    )
+
+    corpus = JukugoCorpus.load(output)
+    # the number of the pages having each word
+    counts: Counter = Counter(
+        word_id for page in pages.values() for word_id in page["ids"]
+    )
+    for page in removed_pages + changed_pages:
+        counts.subtract(pages.pop(page)["ids"])
+
+    page_words: Dict[str, List[str]] = {
+        page: _page_words(os.path.join(savedir, page))
+        for page in added_pages + changed_pages
+    }
+    added_words: Set[str] = set()
+    for words in page_words.values():
+        for word in words:
+            word_id: Optional[int] = corpus.word_id(word)
+            if word_id is None:
+                added_words.add(word)
+            else:
+                counts[word_id] += 1
+
+    changes: CorpusChanges = CorpusChanges(
+        added_pages=added_pages,
+        changed_pages=changed_pages,
+        removed_pages=removed_pages,
+        added_words=sorted(added_words),
+        removed_words=sorted(
+            corpus.word(word_id)
+            for word_id, count in counts.items()
+            if (count <= 0) and corpus.has_id(word_id)
+        ),
+    )
+
+    if (len(changes.added_words) > 0) or (len(changes.removed_words) > 0):
+        updated: JukugoCorpus = corpus.update(
+            changes.added_words, changes.removed_words
+        )
+        corpus.close()
+        updated.save(output)
+        corpus = updated
+    for page, words in page_words.items():
+        pages[page] = {"hash": hashes[page], "ids": list(map(corpus.word_id, words))}
+    # the corpus is written first, and applying the changes again is harmless
+    if len(added_pages) + len(changed_pages) + len(removed_pages) > 0:
+        _save_pages(pages, pages_file)
+    return corpus, changes
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--savedir",
+        type=str,
+        default="../data/",
+        help=("Set the directory to which collect_jukugo saved the pages."),
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="../data/jukugo.bin",
+        help=("Set a file name of the compiled corpus."),
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "When you set --incremental, only the pages changed since the last "
+            "build are read, and their words are added to or removed from the "
+            "corpus."
+        ),
+    )
+    args = parser.parse_args()
+
+    if args.incremental:
+        corpus, changes = update_corpus(args.savedir, args.output)
+        print(
+            f"{len(changes.added_pages)} added, {len(changes.changed_pages)} "
+            f"changed and {len(changes.removed_pages)} removed pages: "
+            f"+{len(changes.added_words)} -{len(changes.removed_words)} words"
+        )
+    else:
+        corpus = compile_corpus(args.savedir, args.output)
+    print(f"{corpus.num_words} words of {corpus.num_kanji} kanji -> {args.output}")
+
+
+def test():
+    """
+    > The function `test()` builds a corpus from pages, then adds, changes and
+    > removes pages, and checks that `update_corpus` keeps the ids of the kept
+    > words and matches a corpus compiled from scratch.
+    """
+    import tempfile
+
+    def _write_page(savedir: str, page: str, words: List[str]) -> None:
+        os.makedirs(os.path.dirname(os.path.join(savedir, page)), exist_ok=True)
+        with open(os.path.join(savedir, page), "w", encoding="utf-8") as f:
+            yaml.dump(words, f, allow_unicode=True)
+
+    def _groups(corpus: JukugoCorpus) -> List[List[str]]:
+        return sorted(
+            sorted(map(corpus.word, word_ids[offsets[k] : offsets[k + 1]]))
+            for offsets, word_ids in (
+                (corpus.first_offsets, corpus.first_ids),
+                (corpus.second_offsets, corpus.second_ids),
+            )
+            for k in range(corpus.num_kanji)
+        )
+
+    with tempfile.TemporaryDirectory() as savedir:
+        output: str = os.path.join(savedir, "jukugo.bin")
+        _write_page(savedir, "a/1.yml", ["亜鉛", "亜鈴", "電鈴"])
+        _write_page(savedir, "a/2.yml", ["電鈴", "電力"])
+        _write_page(savedir, "i/1.yml", ["水力", "水道 ", "x"])
+
+        corpus, changes = update_corpus(savedir, output)
+        ids: Dict[str, int] = {word: corpus.word_id(word) for word in corpus.words()}
+        test_res: List[bool] = [
+            changes.added_pages == ["a/1.yml", "a/2.yml", "i/1.yml"],
+            list(corpus.words()) == sorted(ids),
+            list(ids.values()) == list(range(6)),
+        ]
+
+        # unchanged
+        corpus.close()
+        corpus, changes = update_corpus(savedir, output)
+        test_res.append(
+            changes == CorpusChanges([], [], [], [], [])
+            and all(corpus.word_id(word) == i for word, i in ids.items())
+        )
+        corpus.close()
+
+        # a word of two pages is kept, one of a single page is removed, and
+        # new words are appended
+        _write_page(savedir, "a/2.yml", ["電力", "車道", "亜流"])
+        os.remove(os.path.join(savedir, "a/1.yml"))
+        _write_page(savedir, "u/1.yml", ["水道", "電車"])
+        corpus, changes = update_corpus(savedir, output)
+        test_res += [
+            changes.added_pages == ["u/1.yml"],
+            changes.changed_pages == ["a/2.yml"],
+            changes.removed_pages == ["a/1.yml"],
+            changes.added_words == ["亜流", "車道", "電車"],
+            changes.removed_words == ["亜鈴", "亜鉛", "電鈴"],
+            all(
+                corpus.word_id(word) == i
+                for word, i in ids.items()
+                if word not in changes.removed_words
+            ),
+            [corpus.word_id(word) for word in changes.added_words] == [6, 7, 8],
+            [corpus.has_id(ids[word]) for word in changes.removed_words] == [False] * 3,
+            (corpus.num_words, corpus.num_ids) == (6, 9),
+        ]
+        corpus.close()
+
+        # the ids survive saving and loading, and the words match a corpus
+        # compiled from scratch
+        corpus = JukugoCorpus.load(output)
+        compiled: JukugoCorpus = compile_corpus(savedir, output + ".full")
+        test_res += [
+            _groups(corpus) == _groups(compiled),
+            all(
+                corpus.word_id(word) == i
+                for i, word in zip(corpus.ids(), corpus.words())
+            ),
+            "亜鉛" not in corpus,
+        ]
+
+        # a word removed and added again gets a new id
+        _write_page(savedir, "a/1.yml", ["亜鉛"])
+        corpus.close()
+        corpus, changes = update_corpus(savedir, output)
+        test_res += [
+            changes.added_words == ["亜鉛"],
+            corpus.word_id("亜鉛") == 9,
+        ]
+        corpus.close()
+
+        # the pages streamed as JSON lines are read too
+        os.makedirs(os.path.join(savedir, "e"))
+        with open(os.path.join(savedir, "e/1.jsonl"), "w", encoding="utf-8") as f:
+            f.write('"電池"\n"亜鉛"\n')
+        corpus, changes = update_corpus(savedir, output)
+        test_res += [
+            changes.added_pages == ["e/1.jsonl"],
+            changes.added_words == ["電池"],
+            corpus.word_id("電池") == 10,
+        ]
+        corpus.close()
+
+    if not all(test_res):
+        raise AssertionError(f"all of test must be True. But {test_res}")
+    print("Test has be run successfully.")
+
+
+if __name__ == "__main__":
+    main()
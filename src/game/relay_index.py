@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+import os
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+src_dir, *res = os.getcwd().split("/src")
+
+if len(res) > 0:
+    import sys
+
+    sys.path.append(src_dir + "/src")
+
+try:
+    from game.corpus import JukugoCorpus
+except ImportError:
+    raise
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class RelayIndex:
+    def __init__(self, corpus: JukugoCorpus) -> None:
+        """
+        It answers the legal replies of the jukugo relay in O(degree) with the
+        position-keyed indexes of the corpus: first kanji -> words and second
+        kanji -> words.
+
+        A reply to `word` must differ from it by exactly one kanji at the same
+        position, and must share no kanji with the `previous` word.
+
+        Args:
+            corpus (JukugoCorpus): The corpus of the two-kanji words.
+        """
+        self.corpus: JukugoCorpus = corpus
+        self._arrays: Optional[Tuple["np.ndarray", ...]] = None
+
+    @classmethod
+    def from_words(cls, words: Iterable[str]) -> "RelayIndex":
+        """
+        > It builds an index from the words
+
+        Args:
+            words (Iterable[str]): The two-kanji words.
+
+        Returns:
+            The index.
+        """
+        return cls(JukugoCorpus.from_words(words))
+
+    @classmethod
+    def load(cls, filename: str) -> "RelayIndex":
+        """
+        > It builds an index on a compiled corpus file
+
+        Args:
+            filename (str): The compiled corpus file.
+
+        Returns:
+            The index.
+        """
+        return cls(JukugoCorpus.load(filename))
+
+    def neighbor_ids(self, word_id: int) -> List[int]:
+        """
+        > It returns the ids of the words differing from `word_id` by one kanji
+
+        Args:
+            word_id (int): The id of the word.
+
+        Returns:
+            The ids of the neighbors, the same first kanji ones first.
+        """
+        corpus: JukugoCorpus = self.corpus
+        first, second = corpus.word_kanji(word_id)
+
+        neighbors: List[int] = [
+            neighbor
+            for neighbor in corpus.first_ids[
+                corpus.first_offsets[first] : corpus.first_offsets[first + 1]
+            ]
+            if neighbor != word_id
+        ]
+        neighbors.extend(
+            neighbor
+            for neighbor in corpus.second_ids[
+                corpus.second_offsets[second] : corpus.second_offsets[second + 1]
+            ]
+            if neighbor != word_id
+        )
+        return neighbors
+
+    def degree(self, word_id: int) -> int:
+        """
+        > It returns the number of the neighbors of `word_id` without listing
+        them
+
+        Args:
+            word_id (int): The id of the word.
+
+        Returns:
+            The number of the neighbors.
+        """
+        corpus: JukugoCorpus = self.corpus
+        first, second = corpus.word_kanji(word_id)
+        return (
+            corpus.first_offsets[first + 1]
+            - corpus.first_offsets[first]
+            + corpus.second_offsets[second + 1]
+            - corpus.second_offsets[second]
+            - 2
+        )
+
+    def reply_ids(self, word_id: int, previous_id: Optional[int] = None) -> List[int]:
+        """
+        > It returns the ids of the legal replies to `word_id`
+
+        Args:
+            word_id (int): The id of the last word.
+            previous_id (Optional[int]): The id of the word before it.
+
+        Returns:
+            The ids of the legal replies.
+        """
+        neighbors: List[int] = self.neighbor_ids(word_id)
+
+        if previous_id is None:
+            return neighbors
+
+        pairs: Sequence[int] = self.corpus.pairs
+        banned: Tuple[int, int] = self.corpus.word_kanji(previous_id)
+        return [
+            neighbor
+            for neighbor in neighbors
+            if (pairs[2 * neighbor] not in banned)
+            and (pairs[2 * neighbor + 1] not in banned)
+        ]
+
+    def is_legal(self, reply: str, word: str, previous: Optional[str] = None) -> bool:
+        """
+        > It returns `True` if `reply` is a legal reply to `word`
+
+        Args:
+            reply (str): The reply.
+            word (str): The last word.
+            previous (Optional[str]): The word before `word`.
+
+        Returns:
+            Whether the reply is legal.
+        """
+        if reply not in self.corpus:
+            return False
+        if (reply[0] == word[0]) == (reply[1] == word[1]):
+            return False
+        return (previous is None) or (
+            (reply[0] not in previous) and (reply[1] not in previous)
+        )
+
+    def replies(self, word: str, previous: Optional[str] = None) -> List[str]:
+        """
+        > It returns the legal replies to `word`
+
+        Args:
+            word (str): The last word.
+            previous (Optional[str]): The word before `word`.
+
+        Returns:
+            The legal replies. It is empty if `word` is not in the corpus.
+        """
+        word_id: Optional[int] = self.corpus.word_id(word)
+
+        if word_id is None:
+            return []
+
+        previous_id: Optional[int] = None
+        if previous is not None:
+            previous_id = self.corpus.word_id(previous)
+
+        if (previous is not None) and (previous_id is None):
+            return [
+                reply
+                for reply in map(self.corpus.word, self.neighbor_ids(word_id))
+                if (reply[0] not in previous) and (reply[1] not in previous)
+            ]
+        return [self.corpus.word(i) for i in self.reply_ids(word_id, previous_id)]
+
+    def _get_arrays(self) -> Tuple["np.ndarray", ...]:
+        """
+        > It returns the kanji, the pairs and the groups of the corpus as NumPy
+        arrays of int64, copied once for all the batches
+        """
+        if self._arrays is None:
+            corpus: JukugoCorpus = self.corpus
+            self._arrays = tuple(
+                np.frombuffer(section, dtype=np.uint32).astype(np.int64)
+                for section in (
+                    corpus.kanji,
+                    corpus.pairs,
+                    corpus.first_offsets,
+                    corpus.first_ids,
+                    corpus.second_offsets,
+                    corpus.second_ids,
+                )
+            )
+        return self._arrays
+
+    def _reply_ids_arrays(
+        self, word_ids: "np.ndarray", previous_ids: "np.ndarray"
+    ) -> Tuple["np.ndarray", List[int]]:
+        """
+        > It gathers the neighbor groups of all the queries from the arrays of
+        the corpus and filters them at once
+
+        Args:
+            word_ids (np.ndarray): The ids of the last words.
+            previous_ids (np.ndarray): The ids of the words before them, or -1.
+
+        Returns:
+            The ids of the legal replies of all the queries, one after another
+            in the order of `reply_ids`, and the bounds of each query in them.
+        """
+        _, pairs, first_offsets, first_ids, second_offsets, second_ids = (
+            self._get_arrays()
+        )
+        num_queries: int = len(word_ids)
+
+        candidates: List["np.ndarray"] = []
+        owners: List["np.ndarray"] = []
+        for kanji, offsets, group_ids in (
+            (pairs[2 * word_ids], first_offsets, first_ids),
+            (pairs[2 * word_ids + 1], second_offsets, second_ids),
+        ):
+            starts: "np.ndarray" = offsets[kanji]
+            sizes: "np.ndarray" = offsets[kanji + 1] - starts
+            # the position of every member of every group in `group_ids`
+            ends: "np.ndarray" = np.cumsum(sizes)
+            positions: "np.ndarray" = np.arange(ends[-1]) + np.repeat(
+                starts - (ends - sizes), sizes
+            )
+            candidates.append(group_ids[positions])
+            owners.append(np.repeat(np.arange(num_queries), sizes))
+
+        # the first kanji group of a query stays before its second one
+        order: "np.ndarray" = np.argsort(np.concatenate(owners), kind="stable")
+        replies: "np.ndarray" = np.concatenate(candidates)[order]
+        owner: "np.ndarray" = np.concatenate(owners)[order]
+
+        legal: "np.ndarray" = replies != word_ids[owner]
+        has_previous: "np.ndarray" = previous_ids[owner] >= 0
+        banned: "np.ndarray" = 2 * np.maximum(previous_ids[owner], 0)
+        for reply_kanji in (pairs[2 * replies], pairs[2 * replies + 1]):
+            legal &= ~has_previous | (
+                (reply_kanji != pairs[banned]) & (reply_kanji != pairs[banned + 1])
+            )
+
+        counts: "np.ndarray" = np.bincount(owner[legal], minlength=num_queries)
+        bounds: List[int] = np.concatenate(([0], np.cumsum(counts))).tolist()
+        return replies[legal], bounds
+
+    def replies_batch(
+        self, queries: Sequence[Tuple[str, Optional[str]]]
+    ) -> List[List[str]]:
+        """
+        > It returns the legal replies of many (word, previous) queries at once.
+        With NumPy, the replies are found by `reply_ids_batch` and their words
+        are built from the code points of their kanji in one go.
+
+        Args:
+            queries (Sequence[Tuple[str, Optional[str]]]): The pairs of the last
+                word and the word before it.
+
+        Returns:
+            The legal replies of each query.
+        """
+        if np is None:
+            replies = self.replies
+            return [replies(word, previous) for word, previous in queries]
+
+        corpus: JukugoCorpus = self.corpus
+        known: List[int] = []
+        word_ids: List[int] = []
+        previous_ids: List[int] = []
+        for i, (word, previous) in enumerate(queries):
+            word_id: Optional[int] = corpus.word_id(word)
+            if word_id is None:
+                continue
+
+            previous_id: Optional[int] = None
+            if previous is not None:
+                previous_id = corpus.word_id(previous)
+            known.append(i)
+            word_ids.append(word_id)
+            previous_ids.append(-1 if previous_id is None else previous_id)
+
+        results: List[List[str]] = [[] for _ in queries]
+        if len(known) == 0:
+            return results
+
+        reply_ids, bounds = self._reply_ids_arrays(
+            np.array(word_ids, dtype=np.int64), np.array(previous_ids, dtype=np.int64)
+        )
+        kanji, pairs = self._get_arrays()[:2]
+        codes: "np.ndarray" = np.stack(
+            (kanji[pairs[2 * reply_ids]], kanji[pairs[2 * reply_ids + 1]]), axis=1
+        )
+        words: List[str] = codes.astype("<u4").view("<U2").ravel().tolist()
+
+        for j, i in enumerate(known):
+            replies: List[str] = words[bounds[j] : bounds[j + 1]]
+            previous: Optional[str] = queries[i][1]
+            if (previous is not None) and (previous_ids[j] < 0):
+                # a previous word out of the corpus is checked by its kanji
+                replies = [
+                    reply
+                    for reply in replies
+                    if (reply[0] not in previous) and (reply[1] not in previous)
+                ]
+            results[i] = replies
+        return results
+
+    def reply_ids_batch(
+        self, queries: Sequence[Tuple[int, Optional[int]]]
+    ) -> List[List[int]]:
+        """
+        > It is the same as `replies_batch` on word ids. With NumPy, the
+        neighbor groups of all the queries are gathered from the arrays of the
+        corpus and filtered at once, instead of one query at a time.
+
+        Args:
+            queries (Sequence[Tuple[int, Optional[int]]]): The pairs of the ids
+                of the last word and the word before it.
+
+        Returns:
+            The ids of the legal replies of each query, in the order of
+            `reply_ids`.
+        """
+        if (np is None) or (len(queries) == 0):
+            reply_ids = self.reply_ids
+            return [reply_ids(word_id, previous_id) for word_id, previous_id in queries]
+
+        replies, bounds = self._reply_ids_arrays(
+            np.array([word_id for word_id, _ in queries], dtype=np.int64),
+            np.array(
+                [
+                    -1 if previous_id is None else previous_id
+                    for _, previous_id in queries
+                ],
+                dtype=np.int64,
+            ),
+        )
+        flat: List[int] = replies.tolist()
+        return [flat[bounds[i] : bounds[i + 1]] for i in range(len(queries))]
+
+
+def test():
+    """
+    > The function `test()` checks the replies of a small corpus, and that the
+    > batches answer the same as the queries one at a time.
+    """
+    words: List[str] = ["亜鉛", "亜鈴", "電鈴", "電力", "水力", "水道", "車道"]
+    index: RelayIndex = RelayIndex.from_words(words)
+    test_res: List[bool] = [
+        sorted(index.replies("亜鈴")) == ["亜鉛", "電鈴"],
+        index.replies("亜鈴", previous="亜鉛") == ["電鈴"],
+        index.replies("電鈴", previous="亜鈴") == ["電力"],
+        index.replies("電鈴", previous="鈴木") == ["電力"],
+        index.replies("鈴木") == [],
+        index.is_legal("水道", "水力", "電力"),
+        not index.is_legal("水力", "電力", "水道"),
+    ]
+
+    queries: List[Tuple[str, Optional[str]]] = [
+        (word, previous) for word in words + ["鈴木"] for previous in words + [None]
+    ]
+    queries.append(("電鈴", "鈴木"))
+    test_res.append(
+        index.replies_batch(queries)
+        == [index.replies(word, previous) for word, previous in queries]
+    )
+
+    id_queries: List[Tuple[int, Optional[int]]] = [
+        (word_id, previous_id)
+        for word_id in index.corpus.ids()
+        for previous_id in list(index.corpus.ids()) + [None]
+    ]
+    test_res.append(
+        index.reply_ids_batch(id_queries)
+        == [
+            index.reply_ids(word_id, previous_id) for word_id, previous_id in id_queries
+        ]
+    )
+    test_res.append(index.replies_batch([]) == index.reply_ids_batch([]) == [])
+
+    if not all(test_res):
+        raise AssertionError(f"all of test must be True. But {test_res}")
+    print("Test has be run successfully.")
+
+
+if __name__ == "__main__":
+    test()
@@ -0,0 +1,565 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import socket
+from typing import Any, Dict, List, Optional
+
+src_dir, *res = os.getcwd().split("/src")
+
+if len(res) > 0:
+    import sys
+
+    sys.path.append(src_dir + "/src")
+
+try:
+    from game.bitset import BitsetPool, WordBitset, filter_batch
+    from game.relay_index import RelayIndex
+except ImportError:
+    raise
+
+logger: logging.Logger = logging.getLogger(__name__)
+
+SERVER: str = "server"
+CLIENT: str = "client"
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class GameSession:
+    __slots__ = ("word_id", "previous_id", "used", "num_moves")
+
+    def __init__(self, pool: BitsetPool, word_id: int) -> None:
+        """
+        A game between a client and the server. Only the last two words and a
+        bitset of the used words are kept, one bit per word of the corpus in a
+        row of the pool shared by the games.
+
+        Args:
+            pool (BitsetPool): The pool of the used words of the games.
+            word_id (int): The id of the first word.
+        """
+        self.word_id: int = word_id
+        self.previous_id: Optional[int] = None
+        self.used: WordBitset = WordBitset(pool)
+        self.num_moves: int = 0
+        self.play(word_id)
+
+    def is_used(self, word_id: int) -> bool:
+        return word_id in self.used
+
+    def play(self, word_id: int) -> None:
+        """
+        It makes `word_id` the last word and marks it used
+
+        Args:
+            word_id (int): The id of the word.
+        """
+        if self.num_moves > 0:
+            self.previous_id, self.word_id = self.word_id, word_id
+        self.used.add(word_id)
+        self.num_moves += 1
+
+    def close(self) -> None:
+        """
+        It returns the bitset of the game to the pool
+        """
+        self.used.release()
+
+
+class RelayServer:
+    def __init__(
+        self,
+        index: RelayIndex,
+        idle_timeout: float = 300.0,
+        max_games: int = 16,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        It serves the jukugo relay over TCP. A client sends one JSON object per
+        line and receives one JSON object per line:
+
+        - {"op": "new", "word": optional} starts a game with `word`, or with a
+          word chosen by the server, and returns its "game" id.
+        - {"op": "move", "game": id, "word": reply} plays the reply of the
+          client. The server answers with its own reply in "word", or with
+          "winner" when the game is over.
+        - {"op": "end", "game": id} ends a game. {"op": "ping"} answers pong.
+
+        A request may carry an "id", which is echoed in the response. The games
+        live as long as their connection.
+
+        Args:
+            index (RelayIndex): The index of the legal replies.
+            idle_timeout (float): The seconds after which a silent connection
+                is closed. Defaults to 300
+            max_games (int): The number of games open at once per connection.
+                Defaults to 16
+            seed (Optional[int]): The seed of the first words chosen by the
+                server.
+        """
+        self.index: RelayIndex = index
+        self.idle_timeout: float = idle_timeout
+        self.max_games: int = max_games
+        self.random: random.Random = random.Random(seed)
+        self.pool: BitsetPool = BitsetPool(index.corpus.num_ids)
+        self.num_connections: int = 0
+        self.num_games: int = 0
+
+    async def start(
+        self, host: str = "127.0.0.1", port: int = 8765, reuse_port: bool = False
+    ) -> asyncio.AbstractServer:
+        """
+        > It starts listening
+
+        Args:
+            host (str): The address to bind. Defaults to "127.0.0.1"
+            port (int): The port. If 0, a free port is chosen. Defaults to 8765
+            reuse_port (bool): If True, the port is bound with SO_REUSEPORT, so
+                that many processes accept on it. Defaults to False
+
+        Returns:
+            The server.
+        """
+        return await asyncio.start_server(
+            self.handle, host=host, port=port, reuse_port=reuse_port or None
+        )
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        It answers the requests of one connection until it is closed
+        """
+        games: Dict[int, GameSession] = {}
+        game_ids: itertools.count = itertools.count(1)
+        self.num_connections += 1
+
+        try:
+            while True:
+                try:
+                    line: bytes = await asyncio.wait_for(
+                        reader.readline(), self.idle_timeout
+                    )
+                except asyncio.TimeoutError:
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+
+                response: Dict[str, Any] = self.respond(line, games, game_ids)
+                writer.write(json.dumps(response, ensure_ascii=False).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            logger.info(f"connection closed: {e!r}")
+        finally:
+            self.num_connections -= 1
+            for game_id in list(games):
+                self.end_game(games, game_id)
+            writer.close()
+
+    def respond(
+        self, line: bytes, games: Dict[int, GameSession], game_ids: itertools.count
+    ) -> Dict[str, Any]:
+        """
+        > It returns the response to one request line
+
+        Args:
+            line (bytes): The JSON request.
+            games (Dict[int, GameSession]): The games of the connection.
+            game_ids (itertools.count): The ids of the new games.
+
+        Returns:
+            The response, with "ok" false and an "error" on failure.
+        """
+        request_id: Any = None
+        try:
+            request: Any = json.loads(line)
+            if not isinstance(request, dict):
+                raise ProtocolError("a request must be an object")
+            request_id = request.get("id")
+
+            op: Any = request.get("op")
+            if op == "new":
+                response: Dict[str, Any] = self.new_game(request, games, game_ids)
+            elif op == "move":
+                response = self.move(request, games)
+            elif op == "end":
+                self.end_game(games, request.get("game"))
+                response = {}
+            elif op == "ping":
+                response = {"pong": True}
+            else:
+                raise ProtocolError(f"unknown op {op!r}")
+        except ProtocolError as e:
+            response = {"ok": False, "error": str(e)}
+        except (TypeError, ValueError):
+            response = {"ok": False, "error": "a request must be a JSON line"}
+
+        response.setdefault("ok", True)
+        if request_id is not None:
+            response["id"] = request_id
+        return response
+
+    def new_game(
+        self,
+        request: Dict[str, Any],
+        games: Dict[int, GameSession],
+        game_ids: itertools.count,
+    ) -> Dict[str, Any]:
+        """
+        > It starts a game with the word of the request or a random one
+        """
+        if len(games) >= self.max_games:
+            raise ProtocolError(f"at most {self.max_games} games per connection")
+
+        corpus = self.index.corpus
+        word: Optional[str] = request.get("word")
+        if word is None:
+            word_id: Optional[int] = corpus.first_ids[
+                self.random.randrange(corpus.num_words)
+            ]
+        else:
+            word_id = corpus.word_id(word) if isinstance(word, str) else None
+            if word_id is None:
+                raise ProtocolError(f"{word!r} is not in the corpus")
+
+        game_id: int = next(game_ids)
+        games[game_id] = GameSession(self.pool, word_id)
+        self.num_games += 1
+        return {"game": game_id, "word": corpus.word(word_id)}
+
+    def end_game(self, games: Dict[int, GameSession], game_id: Any) -> None:
+        """
+        It removes a game of a connection, if it exists
+        """
+        session: Optional[GameSession] = games.pop(game_id, None)
+
+        if session is not None:
+            session.close()
+            self.num_games -= 1
+
+    def legal_moves(self, session: GameSession) -> List[int]:
+        """
+        > It returns the ids of the legal replies which have not been used
+        """
+        return session.used.filter(
+            self.index.reply_ids(session.word_id, session.previous_id)
+        )
+
+    def legal_moves_batch(self, sessions: List[GameSession]) -> List[List[int]]:
+        """
+        > It returns the legal moves of many games at once, looking the
+        candidates of all of them up in the bitsets together
+
+        Args:
+            sessions (List[GameSession]): The games.
+
+        Returns:
+            The ids of the legal replies of each game.
+        """
+        reply_ids = self.index.reply_ids
+        return filter_batch(
+            [session.used for session in sessions],
+            [reply_ids(session.word_id, session.previous_id) for session in sessions],
+        )
+
+    def move(
+        self, request: Dict[str, Any], games: Dict[int, GameSession]
+    ) -> Dict[str, Any]:
+        """
+        > It validates the reply of the client and plays the reply of the server
+        """
+        session: Optional[GameSession] = games.get(request.get("game"))
+        if session is None:
+            raise ProtocolError(f"no game {request.get('game')!r}")
+
+        corpus = self.index.corpus
+        word: Any = request.get("word")
+        word_id: Optional[int] = corpus.word_id(word) if isinstance(word, str) else None
+        if word_id is None:
+            return {"legal": False, "error": f"{word!r} is not in the corpus"}
+
+        last: str = corpus.word(session.word_id)
+        previous: Optional[str] = None
+        if session.previous_id is not None:
+            previous = corpus.word(session.previous_id)
+        if not self.index.is_legal(word, last, previous):
+            return {"legal": False, "error": f"{word} is not a reply to {last}"}
+        if session.is_used(word_id):
+            return {"legal": False, "error": f"{word} has been used"}
+        session.play(word_id)
+
+        moves: List[int] = self.legal_moves(session)
+        if len(moves) == 0:
+            self.end_game(games, request["game"])
+            return {"legal": True, "word": None, "winner": CLIENT}
+
+        # the reply leaving the fewest replies to the client is chosen
+        reply: int = min(moves, key=self.index.degree)
+        session.play(reply)
+        response: Dict[str, Any] = {"legal": True, "word": corpus.word(reply)}
+
+        if len(self.legal_moves(session)) == 0:
+            self.end_game(games, request["game"])
+            response["winner"] = SERVER
+        return response
+
+
+class RelayClient:
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765) -> None:
+        """
+        A client of `RelayServer`, which sends one request at a time.
+
+        Args:
+            host (str): The address of the server. Defaults to "127.0.0.1"
+            port (int): The port of the server. Defaults to 8765
+        """
+        self.host: str = host
+        self.port: int = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self._request_ids: itertools.count = itertools.count(1)
+
+    async def connect(self) -> "RelayClient":
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def request(self, op: str, **kwargs: Any) -> Dict[str, Any]:
+        """
+        > It sends a request and returns its response
+
+        Args:
+            op (str): The operation.
+            **kwargs: The fields of the request.
+
+        Returns:
+            The response.
+        """
+        request_id: int = next(self._request_ids)
+        line: bytes = json.dumps({"op": op, "id": request_id, **kwargs}).encode()
+        self.writer.write(line + b"\n")
+        await self.writer.drain()
+
+        response: Dict[str, Any] = json.loads(await self.reader.readline())
+        if response.get("id") != request_id:
+            raise ProtocolError(f"the response {response} is not for {request_id}")
+        return response
+
+    async def new_game(self, word: Optional[str] = None) -> Dict[str, Any]:
+        return await self.request("new", word=word)
+
+    async def move(self, game: int, word: str) -> Dict[str, Any]:
+        return await self.request("move", game=game, word=word)
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+            self.writer = None
+
+    async def __aenter__(self) -> "RelayClient":
+        return await self.connect()
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+
+async def _serve_forever(
+    index: RelayIndex, host: str, port: int, reuse_port: bool, idle_timeout: float
+) -> None:
+    server: asyncio.AbstractServer = await RelayServer(
+        index, idle_timeout=idle_timeout
+    ).start(host, port, reuse_port=reuse_port)
+    logger.info(f"worker {os.getpid()} listening on {host}:{port}")
+
+    async with server:
+        await server.serve_forever()
+
+
+def _run_worker(
+    corpus_file: str, host: str, port: int, reuse_port: bool, idle_timeout: float
+) -> None:
+    """
+    It serves in one process. Every worker maps the same corpus file, so the
+    pages of the dictionary are shared by all of them.
+    """
+    logging.basicConfig(level=logging.INFO)
+    index: RelayIndex = RelayIndex.load(corpus_file)
+    try:
+        asyncio.run(_serve_forever(index, host, port, reuse_port, idle_timeout))
+    except KeyboardInterrupt:
+        pass
+
+
+def serve(
+    corpus_file: str,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    workers: int = 1,
+    idle_timeout: float = 300.0,
+) -> None:
+    """
+    It serves the relay with `workers` processes accepting on the same port
+    with SO_REUSEPORT, so the kernel spreads the connections among them
+
+    Args:
+        corpus_file (str): The corpus compiled by game/corpus.py.
+        host (str): The address to bind. Defaults to "127.0.0.1"
+        port (int): The port. Defaults to 8765
+        workers (int): The number of the processes. Defaults to 1
+        idle_timeout (float): The seconds after which a silent connection is
+            closed. Defaults to 300
+    """
+    if workers <= 1:
+        _run_worker(corpus_file, host, port, False, idle_timeout)
+        return
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise OSError("SO_REUSEPORT is not supported, so set workers to 1.")
+
+    processes: List[multiprocessing.Process] = [
+        multiprocessing.Process(
+            target=_run_worker,
+            args=(corpus_file, host, port, True, idle_timeout),
+            daemon=True,
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+def test():
+    """
+    > The function `test()` plays a game with the server through a loopback
+    client, and checks the legal moves of many games looked up at once
+    against the moves of each game
+    """
+    import random
+
+    async def _play() -> None:
+        words: List[str] = ["亜鉛", "亜鈴", "電鈴", "電力", "水力", "水道", "車道"]
+        server: asyncio.AbstractServer = await RelayServer(
+            RelayIndex.from_words(words)
+        ).start(port=0)
+        port: int = server.sockets[0].getsockname()[1]
+
+        async with server, RelayClient(port=port) as client:
+            game: Dict[str, Any] = await client.new_game("亜鉛")
+            test_res: List[bool] = [game["ok"], game["word"] == "亜鉛"]
+
+            response: Dict[str, Any] = await client.move(game["game"], "電力")
+            test_res.append(response["legal"] is False)
+
+            response = await client.move(game["game"], "亜鈴")
+            test_res.append(response["legal"] and (response["word"] == "電鈴"))
+
+            response = await client.move(game["game"], "電力")
+            test_res.append(response["word"] == "水力")
+
+            response = await client.move(game["game"], "水道")
+            test_res.append(response["word"] == "車道")
+            test_res.append(response["winner"] == SERVER)
+
+            response = await client.request("move", game=game["game"], word="車道")
+            test_res.append(response["ok"] is False)
+
+        if not all(test_res):
+            raise AssertionError(f"all of test must be True. But {test_res}")
+
+    asyncio.run(_play())
+
+    random.seed(0)
+    kanji: List[str] = [chr(0x4E00 + i) for i in range(12)]
+    relay: RelayServer = RelayServer(
+        RelayIndex.from_words([first + second for first in kanji for second in kanji])
+    )
+    sessions: List[GameSession] = []
+    for _ in range(16):
+        sessions.append(
+            GameSession(relay.pool, random.choice(list(relay.index.corpus.ids())))
+        )
+        for _ in range(random.randrange(6)):
+            moves: List[int] = relay.legal_moves(sessions[-1])
+            if len(moves) > 0:
+                sessions[-1].play(random.choice(moves))
+
+    expected: List[List[int]] = [relay.legal_moves(session) for session in sessions]
+    test_res: List[bool] = [
+        relay.legal_moves_batch(sessions) == expected,
+        relay.legal_moves_batch(sessions[:1]) == expected[:1],
+        all(
+            not session.is_used(word_id)
+            for session, moves in zip(sessions, expected)
+            for word_id in moves
+        ),
+    ]
+    for session in sessions:
+        session.close()
+    test_res.append(len(relay.pool) == 0)
+
+    if not all(test_res):
+        raise AssertionError(f"all of test must be True. But {test_res}")
+    print("Test has be run successfully.")
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        default="../data/jukugo.bin",
+        help=("Set a file name of the corpus compiled by game/corpus.py."),
+    )
+    parser.add_argument(
+        "--host",
+        type=str,
+        default="127.0.0.1",
+        help=("Set the address to bind."),
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8765,
+        help=("Set the port of the server."),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=("Set the number of the processes sharing the port."),
+    )
+    parser.add_argument(
+        "--idle_timeout",
+        type=float,
+        default=300.0,
+        help=("Set the seconds after which a silent connection is closed."),
+    )
+    args = parser.parse_args()
+
+    serve(
+        args.corpus,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        idle_timeout=args.idle_timeout,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+from collections import OrderedDict
+from typing import FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+src_dir, *res = os.getcwd().split("/src")
+
+if len(res) > 0:
+    import sys
+
+    sys.path.append(src_dir + "/src")
+
+try:
+    from game.relay_index import RelayIndex
+except ImportError:
+    raise
+
+WIN: int = 1
+LOSS: int = -1
+UNKNOWN: int = 0
+
+# word id, previous word id, used word ids
+Position = Tuple[int, Optional[int], FrozenSet[int]]
+
+
+class SolverResult(NamedTuple):
+    outcome: int
+    move: Optional[str]
+    depth: int
+    nodes: int
+
+
+class _Timeout(Exception):
+    pass
+
+
+class TranspositionTable:
+    def __init__(self, max_entries: int = 1_000_000) -> None:
+        """
+        A bounded table of evaluated positions. When it is full, the least
+        recently used position is evicted.
+
+        Args:
+            max_entries (int): The maximum number of positions.
+                Defaults to 1,000,000
+        """
+        self.max_entries: int = max_entries
+        self.entries: "OrderedDict[Position, Tuple[int, int, Optional[int]]]" = (
+            OrderedDict()
+        )
+
+    def get(self, key: Position) -> Optional[Tuple[int, int, Optional[int]]]:
+        """
+        > It returns the outcome, the searched depth and the best move of a
+        position
+
+        Args:
+            key (Position): The position.
+
+        Returns:
+            The entry, or None if it is not in the table.
+        """
+        entry: Optional[Tuple[int, int, Optional[int]]] = self.entries.get(key)
+
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(
+        self, key: Position, outcome: int, depth: int, move: Optional[int] = None
+    ) -> None:
+        """
+        It stores a position and evicts the oldest one beyond the limit
+
+        Args:
+            key (Position): The position.
+            outcome (int): WIN, LOSS or UNKNOWN for the side to move.
+            depth (int): The depth searched. A proven outcome holds at any depth.
+            move (Optional[int]): The id of the best move.
+        """
+        self.entries[key] = (outcome, depth, move)
+        self.entries.move_to_end(key)
+
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class RelaySolver:
+    def __init__(
+        self, index: RelayIndex, max_entries: int = 1_000_000, check_every: int = 4
+    ) -> None:
+        """
+        It decides whether the side to move can force a win, by a depth-first
+        search deepened iteratively until a deadline. The side which has no
+        legal reply loses.
+
+        Args:
+            index (RelayIndex): The index of the legal replies.
+            max_entries (int): The size of the transposition table.
+                Defaults to 1,000,000
+            check_every (int): The number of nodes between deadline checks.
+                Defaults to 4
+        """
+        self.index: RelayIndex = index
+        self.table: TranspositionTable = TranspositionTable(max_entries=max_entries)
+        self.check_every: int = check_every
+        self.nodes: int = 0
+        self._deadline: float = float("inf")
+
+    def legal_moves(
+        self, word_id: int, previous_id: Optional[int], used: FrozenSet[int]
+    ) -> List[int]:
+        """
+        > It returns the replies which have not been used in the game
+
+        Args:
+            word_id (int): The id of the last word.
+            previous_id (Optional[int]): The id of the word before it.
+            used (FrozenSet[int]): The ids of the words used in the game.
+
+        Returns:
+            The ids of the legal moves.
+        """
+        return [
+            move
+            for move in self.index.reply_ids(word_id, previous_id)
+            if move not in used
+        ]
+
+    def order_moves(
+        self, moves: List[int], word_id: int, used: FrozenSet[int]
+    ) -> List[int]:
+        """
+        > It sorts the moves by the number of replies left to the opponent, so
+        that the moves most likely to win are searched first. The used words
+        are not subtracted from the counts, which keeps the ordering O(degree)
+        per move.
+
+        Args:
+            moves (List[int]): The ids of the legal moves.
+            word_id (int): The id of the last word.
+            used (FrozenSet[int]): The ids of the words used in the game.
+
+        Returns:
+            The sorted moves.
+        """
+        return sorted(
+            moves,
+            key=lambda move: len(self.index.reply_ids(move, word_id)),
+        )
+
+    def _search(
+        self, word_id: int, previous_id: Optional[int], used: FrozenSet[int], depth: int
+    ) -> int:
+        """
+        > It returns the outcome of a position for the side to move within
+        `depth` plies
+
+        Args:
+            word_id (int): The id of the last word.
+            previous_id (Optional[int]): The id of the word before it.
+            used (FrozenSet[int]): The ids of the words used in the game.
+            depth (int): The number of plies left.
+
+        Returns:
+            WIN, LOSS, or UNKNOWN if it is not decided within `depth`.
+        """
+        self.nodes += 1
+        if (self.nodes % self.check_every == 0) and (time.monotonic() > self._deadline):
+            raise _Timeout()
+
+        key: Position = (word_id, previous_id, used)
+        entry: Optional[Tuple[int, int, Optional[int]]] = self.table.get(key)
+        if (entry is not None) and ((entry[0] != UNKNOWN) or (entry[1] >= depth)):
+            return entry[0]
+
+        moves: List[int] = self.legal_moves(word_id, previous_id, used)
+        if len(moves) == 0:
+            self.table.put(key, LOSS, depth)
+            return LOSS
+        if depth == 0:
+            return UNKNOWN
+
+        outcome: int = LOSS
+        for move in self.order_moves(moves, word_id, used):
+            reply: int = -self._search(move, word_id, used | {move}, depth - 1)
+
+            if reply == WIN:
+                self.table.put(key, WIN, depth, move)
+                return WIN
+            if reply == UNKNOWN:
+                outcome = UNKNOWN
+
+        self.table.put(key, outcome, depth)
+        return outcome
+
+    def solve_ids(
+        self,
+        word_id: int,
+        previous_id: Optional[int] = None,
+        used: Iterable[int] = (),
+        time_budget: Optional[float] = None,
+        deadline: Optional[float] = None,
+        max_depth: int = 64,
+    ) -> Tuple[int, Optional[int], int]:
+        """
+        It deepens the search until the outcome is proven, `max_depth` is
+        reached, or the deadline passes.
+
+        Args:
+            word_id (int): The id of the last word.
+            previous_id (Optional[int]): The id of the word before it.
+            used (Iterable[int]): The ids of the words used in the game.
+                `word_id` and `previous_id` are always added.
+            time_budget (Optional[float]): The seconds allowed for this move.
+            deadline (Optional[float]): The `time.monotonic()` time at which the
+                search must stop. The earlier of the two is used.
+            max_depth (int): The maximum number of plies. Defaults to 64
+
+        Returns:
+            The outcome, the id of the best move and the depth completed.
+        """
+        self._deadline = float("inf") if deadline is None else deadline
+        if time_budget is not None:
+            self._deadline = min(self._deadline, time.monotonic() + time_budget)
+        self.nodes = 0
+
+        used_ids: FrozenSet[int] = frozenset(used) | {word_id}
+        if previous_id is not None:
+            used_ids |= {previous_id}
+
+        moves: List[int] = self.order_moves(
+            self.legal_moves(word_id, previous_id, used_ids), word_id, used_ids
+        )
+        if len(moves) == 0:
+            return LOSS, None, 0
+
+        best: Tuple[int, Optional[int], int] = (UNKNOWN, moves[0], 0)
+        for depth in range(1, max_depth + 1):
+            try:
+                outcome: int = LOSS
+                best_move: Optional[int] = None
+
+                for move in moves:
+                    reply: int = -self._search(
+                        move, word_id, used_ids | {move}, depth - 1
+                    )
+
+                    if reply == WIN:
+                        return WIN, move, depth
+                    if (reply == UNKNOWN) and (best_move is None):
+                        outcome, best_move = UNKNOWN, move
+            except _Timeout:
+                break
+
+            if outcome == LOSS:
+                # every move loses, so the one leaving most replies is chosen
+                return LOSS, moves[-1], depth
+            best = (outcome, best_move, depth)
+        return best
+
+    def solve(
+        self,
+        word: str,
+        previous: Optional[str] = None,
+        used: Iterable[str] = (),
+        time_budget: Optional[float] = None,
+        deadline: Optional[float] = None,
+        max_depth: int = 64,
+    ) -> SolverResult:
+        """
+        > It is the same as `solve_ids` on words
+
+        Args:
+            word (str): The last word.
+            previous (Optional[str]): The word before it.
+            used (Iterable[str]): The words used in the game.
+            time_budget (Optional[float]): The seconds allowed for this move.
+            deadline (Optional[float]): The `time.monotonic()` deadline.
+            max_depth (int): The maximum number of plies. Defaults to 64
+
+        Returns:
+            The outcome for the side to move, the best reply, the depth
+            completed and the number of nodes searched.
+
+        Raises:
+            KeyError: If `word` or `previous` is not in the corpus.
+        """
+        corpus = self.index.corpus
+        word_id: Optional[int] = corpus.word_id(word)
+        if word_id is None:
+            raise KeyError(f"{word} is not in the corpus.")
+
+        previous_id: Optional[int] = None
+        if previous is not None:
+            previous_id = corpus.word_id(previous)
+            if previous_id is None:
+                raise KeyError(f"{previous} is not in the corpus.")
+        used_ids: List[int] = [i for i in map(corpus.word_id, used) if i is not None]
+
+        outcome, move, depth = self.solve_ids(
+            word_id,
+            previous_id,
+            used_ids,
+            time_budget=time_budget,
+            deadline=deadline,
+            max_depth=max_depth,
+        )
+        return SolverResult(
+            outcome, None if move is None else corpus.word(move), depth, self.nodes
+        )
+
+
+def test():
+    """
+    > The function `test()` solves small relays whose outcomes are known, and
+    > checks the transposition table and the deadline.
+    """
+    # 亜鉛 -> 亜鈴 leaves no reply, as 電鈴 is not there
+    result: SolverResult = RelaySolver(RelayIndex.from_words(["亜鉛", "亜鈴"])).solve(
+        "亜鉛"
+    )
+    test_res: List[bool] = [result[:3] == (WIN, "亜鈴", 1)]
+
+    # 亜鉛 -> 亜鈴 -> 電鈴 leaves no reply to the side to move
+    result = RelaySolver(RelayIndex.from_words(["亜鉛", "亜鈴", "電鈴"])).solve("亜鉛")
+    test_res.append(result[:3] == (LOSS, "亜鈴", 2))
+    result = RelaySolver(RelayIndex.from_words(["亜鉛", "電力"])).solve("亜鉛")
+    test_res.append(result[:3] == (LOSS, None, 0))
+
+    index: RelayIndex = RelayIndex.from_words(
+        [first + second for first in "一二三四" for second in "六七八九"]
+    )
+    solver: RelaySolver = RelaySolver(index)
+    result = solver.solve("一六")
+    # the opponent loses after the best reply
+    reply: SolverResult = RelaySolver(index).solve(
+        result.move, previous="一六", used=["一六"]
+    )
+    test_res += [result.outcome == WIN, reply.outcome == LOSS]
+
+    # the proven outcomes are reused by the next search
+    again: SolverResult = solver.solve("一六")
+    test_res.append((again.outcome, again.move) == (WIN, result.move))
+    test_res.append(again.nodes < result.nodes)
+
+    # the least recently used position is evicted
+    table: TranspositionTable = TranspositionTable(max_entries=2)
+    table.put((0, None, frozenset()), WIN, 1)
+    table.put((1, None, frozenset()), LOSS, 1)
+    table.get((0, None, frozenset()))
+    table.put((2, None, frozenset()), LOSS, 1)
+    test_res += [
+        len(table) == 2,
+        table.get((1, None, frozenset())) is None,
+        table.get((0, None, frozenset())) == (WIN, 1, None),
+    ]
+    small: RelaySolver = RelaySolver(index, max_entries=16)
+    test_res.append(small.solve("一六").outcome == WIN)
+    test_res.append(len(small.table) == 16)
+
+    # a passed deadline stops the first iteration
+    solver = RelaySolver(index, check_every=1)
+    used: FrozenSet[int] = frozenset([0])
+    moves: List[int] = solver.order_moves(solver.legal_moves(0, None, used), 0, used)
+    test_res.append(
+        solver.solve_ids(0, deadline=time.monotonic() - 1.0) == (UNKNOWN, moves[0], 0)
+    )
+
+    # an unknown word is rejected, as the word before the last one
+    for word, previous in (("鈴木", None), ("一六", "鈴木")):
+        try:
+            solver.solve(word, previous=previous)
+            test_res.append(False)
+        except KeyError:
+            test_res.append(True)
+
+    if not all(test_res):
+        raise AssertionError(f"all of test must be True. But {test_res}")
+    print("Test has be run successfully.")
+
+
+if __name__ == "__main__":
+    test()